@@ -0,0 +1,174 @@
+"""
+Benchmark of the storage backends.
+
+Runs the same workload through the `modules` API on the in-memory storage and on PostgreSQL:
+creation of a hierarchy, replay of the same payloads (no-op upserts), gets by id and searches
+by parent. The time on memory is the Python overhead of the modules (conversions, filters,
+serialization), the remainder on PostgreSQL the time spent in the driver and the database.
+Writes a sport to the database of the settings, deleted at the end.
+
+Usage:
+    python -m benchmarks.backends --events 1000
+"""
+
+import time
+from argparse import ArgumentParser
+from collections.abc import Callable
+from uuid import UUID
+
+from modules import Event, Market, Selection, Sport
+from settings.base import STORAGE
+from utils.helper import Helper
+from utils.memory import MemoryStorage
+
+# Children per parent, as with the generator defaults
+MARKETS_PER_EVENT = 2
+SELECTIONS_PER_MARKET = 3
+
+
+def build_workload(events: int) -> list[tuple[str, UUID, dict]]:
+    """
+    Builds the payloads of a sport with its events, markets and selections.
+
+    Args:
+        events (int): The number of events.
+
+    Returns:
+        list[tuple[str, UUID, dict]]: The type, id and data of each resource, parents first.
+    """
+    # The end of an id is random, its beginning being the timestamp of a uuid7
+    suffix = Helper.new_id().hex[-8:]
+    sport_id = Helper.new_id()
+    workload = [
+        ("sport", sport_id, {"name": f"Benchmark {suffix}", "display_name": "Benchmark", "order": 1, "is_active": True})
+    ]
+    for event in range(events):
+        event_id = Helper.new_id()
+        workload.append(
+            (
+                "event",
+                event_id,
+                {
+                    "sport_id": str(sport_id),
+                    "name": f"Benchmark {suffix} event {event}",
+                    "display_name": f"Event {event}",
+                    "type": "PREPLAY",
+                    "status": "PREPLAY",
+                    "is_active": True,
+                },
+            )
+        )
+        for market in range(MARKETS_PER_EVENT):
+            market_id = Helper.new_id()
+            workload.append(
+                (
+                    "market",
+                    market_id,
+                    {
+                        "event_id": str(event_id),
+                        "name": f"Benchmark {suffix} event {event} market {market}",
+                        "display_name": f"Market {market}",
+                        "order": market,
+                        "schema": 1,
+                        "columns": SELECTIONS_PER_MARKET,
+                        "is_active": True,
+                    },
+                )
+            )
+            for selection in range(SELECTIONS_PER_MARKET):
+                workload.append(
+                    (
+                        "selection",
+                        Helper.new_id(),
+                        {
+                            "market_id": str(market_id),
+                            "name": f"Benchmark {suffix} event {event} market {market} selection {selection}",
+                            "display_name": f"Selection {selection}",
+                            "price": 1.5 + selection,
+                            "outcome": "UNSETTLED",
+                            "is_active": True,
+                        },
+                    )
+                )
+    return workload
+
+
+def measure(operations: list[Callable[[], object]]) -> float:
+    """
+    Runs operations one after the other.
+
+    Args:
+        operations (list[Callable[[], object]]): The operations.
+
+    Returns:
+        float: The time spent, in seconds.
+    """
+    started_at = time.perf_counter()
+    for operation in operations:
+        operation()
+    return time.perf_counter() - started_at
+
+
+def run(workload: list[tuple[str, UUID, dict]]) -> dict[str, tuple[int, float]]:
+    """
+    Runs the phases of the workload on the storage backend of the settings.
+
+    Args:
+        workload (list[tuple[str, UUID, dict]]): The payloads, as returned by `build_workload`.
+
+    Returns:
+        dict[str, tuple[int, float]]: The number of operations and the time spent, per phase.
+    """
+    modules = {"sport": Sport(), "event": Event(), "market": Market(), "selection": Selection()}
+    upserts = [
+        (lambda module=modules[arg_type], uuid=uuid, data=data: module.upsert(uuid, data))
+        for arg_type, uuid, data in workload
+    ]
+    gets = [
+        (lambda module=modules[arg_type], uuid=uuid: module.get_many([uuid]))
+        for arg_type, uuid, _ in workload
+        if arg_type == "selection"
+    ]
+    searches = [
+        (lambda uuid=uuid: modules["selection"].search([{"field": "market_id", "operator": "=", "value": str(uuid)}]))
+        for arg_type, uuid, _ in workload
+        if arg_type == "market"
+    ]
+    phases = {"create": (len(upserts), measure(upserts)), "replay": (len(upserts), measure(upserts))}
+    phases["get"] = (len(gets), measure(gets))
+    phases["search"] = (len(searches), measure(searches))
+    # The sport is deleted with its subtree
+    modules["sport"].delete(workload[0][1])
+    return phases
+
+
+def main() -> None:
+    """
+    Runs the benchmark.
+    """
+    parser = ArgumentParser(description="Benchmark the storage backends")
+    parser.add_argument("--events", dest="events", type=int, default=1000, help="Number of events of the sport")
+    parser.add_argument("--memory-only", dest="memory_only", action="store_true", help="Skip PostgreSQL")
+    args = parser.parse_args()
+
+    results = {}
+    for backend in ["memory"] if args.memory_only else ["memory", "postgresql"]:
+        STORAGE["BACKEND"] = backend
+        results[backend] = run(build_workload(args.events))
+    MemoryStorage.get_instance().clear()
+
+    print(f"{args.events:,} events, {MARKETS_PER_EVENT} markets each, {SELECTIONS_PER_MARKET} selections per market")
+    header = f"{'phase':<10}{'ops':>10}" + "".join(f"{backend + ' ops/s':>20}" for backend in results)
+    print(header + (f"{'python %':>12}" if "postgresql" in results else ""))
+    for phase, (count, _) in results["memory"].items():
+        line = f"{phase:<10}{count:>10,}" + "".join(
+            f"{count / result[phase][1]:>20,.0f}" for result in results.values()
+        )
+        if "postgresql" in results:
+            # Share of the time on PostgreSQL which is spent in the modules rather than in the database
+            line += f"{100 * results['memory'][phase][1] / results['postgresql'][phase][1]:>12.1f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
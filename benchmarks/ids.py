@@ -0,0 +1,118 @@
+"""
+Benchmark of the id strategies.
+
+Loads the same number of selection-shaped rows into a scratch table per id strategy (`uuid4`,
+`uuid7`), in batches as a feed would, and compares the insert throughput and the size of the
+primary-key and foreign-key indexes. Needs the database of the settings.
+
+Usage:
+    python -m benchmarks.ids --rows 10000000
+"""
+
+import time
+from argparse import ArgumentParser
+
+from sqlalchemy import text
+
+from utils.bulk import BulkCopy
+from utils.db import DB
+from utils.helper import ID_STRATEGIES, Helper
+
+# Selections per market, as with the generator defaults
+SELECTIONS_PER_MARKET = 3
+
+
+def create_table(name: str) -> None:
+    """
+    Creates an empty scratch table shaped like `selection`, with its primary key and foreign-key index.
+
+    Args:
+        name (str): The name of the table.
+    """
+    with DB.get_instance().get_session() as session:
+        session.execute(text(f"DROP TABLE IF EXISTS {name}"))
+        session.execute(
+            text(
+                f"CREATE TABLE {name} (id uuid PRIMARY KEY, market_id uuid NOT NULL, name varchar(100) NOT NULL, "
+                "price numeric(10, 2), created_at timestamptz NOT NULL DEFAULT now())"
+            )
+        )
+        session.execute(text(f"CREATE INDEX {name}_market_id_idx ON {name} (market_id)"))
+
+
+def load(name: str, strategy: str, rows: int, batch_size: int) -> float:
+    """
+    Loads the rows in batches, each batch being a `COPY` in its own transaction.
+
+    The selections of a market are generated together, their market id with the same strategy.
+
+    Args:
+        name (str): The name of the table.
+        strategy (str): The id strategy.
+        rows (int): The number of rows.
+        batch_size (int): The number of rows per batch.
+
+    Returns:
+        float: The time spent loading, in seconds (the id generation included).
+    """
+    elapsed = 0.0
+    loaded = 0
+    while loaded < rows:
+        started_at = time.perf_counter()
+        batch = []
+        market_id = None
+        for index in range(loaded, min(loaded + batch_size, rows)):
+            if index % SELECTIONS_PER_MARKET == 0 or market_id is None:
+                market_id = Helper.new_id(strategy)
+            batch.append((Helper.new_id(strategy), market_id, f"Selection {index % SELECTIONS_PER_MARKET}", "2.50"))
+        with DB.get_instance().get_raw_connection() as connection:
+            with connection.cursor() as cursor:
+                loaded += BulkCopy.copy(cursor, name, ["id", "market_id", "name", "price"], batch, False)
+        elapsed += time.perf_counter() - started_at
+    return elapsed
+
+
+def get_sizes(name: str) -> tuple[int, int, int]:
+    """
+    Reads the size of the table and of its indexes.
+
+    Args:
+        name (str): The name of the table.
+
+    Returns:
+        tuple[int, int, int]: The size of the table, of the primary key and of the foreign-key index, in bytes.
+    """
+    with DB.get_instance().get_session() as session:
+        return session.execute(
+            text(
+                f"SELECT pg_relation_size('{name}'), pg_relation_size('{name}_pkey'), "
+                f"pg_relation_size('{name}_market_id_idx')"
+            )
+        ).one()
+
+
+def main() -> None:
+    """
+    Runs the benchmark.
+    """
+    parser = ArgumentParser(description="Benchmark the id strategies")
+    parser.add_argument("--rows", dest="rows", type=int, default=10_000_000, help="Number of rows per strategy")
+    parser.add_argument("--batch-size", dest="batch_size", type=int, default=10_000, help="Number of rows per COPY")
+    parser.add_argument("--keep", dest="keep", action="store_true", help="Keep the scratch tables")
+    args = parser.parse_args()
+
+    print(f"{args.rows:,} rows per strategy, {args.batch_size:,} per batch")
+    print(f"{'strategy':<10}{'rows/s':>12}{'table MB':>12}{'pkey MB':>12}{'fk index MB':>14}")
+    for strategy in ID_STRATEGIES:
+        name = f"benchmark_ids_{strategy}"
+        create_table(name)
+        elapsed = load(name, strategy, args.rows, args.batch_size)
+        table, primary_key, foreign_key = (size / 1024**2 for size in get_sizes(name))
+        print(f"{strategy:<10}{args.rows / elapsed:>12,.0f}{table:>12,.1f}{primary_key:>12,.1f}{foreign_key:>14,.1f}")
+        if args.keep is False:
+            with DB.get_instance().get_session() as session:
+                session.execute(text(f"DROP TABLE {name}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark of the row serializers.
+
+Compares the `obj_to_json` converters of the models with the compiled `RowSerializer`
+on synthetic selection rows shaped like the tuples returned by psycopg2.
+
+Usage:
+    python -m benchmarks.serializers --rows 1000000
+"""
+
+import io
+import json
+import random
+import time
+from argparse import ArgumentParser
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from uuid import UUID
+
+from models.selection import SelectionModel, SelectionOutcome
+from utils.serializers import RowSerializer
+
+KEYS = SelectionModel.__table__.columns.keys()
+# Rows returned by a session have both positional and attribute access, like a named tuple
+Row = namedtuple("Row", KEYS)  # type: ignore[misc]
+
+
+def build_rows(count: int, seed: int = 42) -> list:
+    """
+    Builds synthetic selection rows.
+
+    Args:
+        count (int): The number of rows.
+        seed (int): The seed of the random generator.
+
+    Returns:
+        list: The rows, as named tuples.
+    """
+    rng = random.Random(seed)
+    started_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    outcomes = [outcome.value for outcome in SelectionOutcome]
+    rows = []
+    for index in range(count):
+        # Selections of a market are created in the same minute, as with the generator
+        created_at = started_at + timedelta(seconds=index // 3 * 7)
+        rows.append(
+            Row(
+                UUID(int=rng.getrandbits(128), version=4),
+                UUID(int=rng.getrandbits(128), version=4),
+                f"Selection {index % 3}",
+                f"Selection {index % 3}",
+                f"selection-{index}",
+                Decimal(f"{1.01 + rng.expovariate(0.25):.2f}"),
+                rng.choice(outcomes),
+                rng.random() < 0.8,
+                1,
+                created_at,
+                created_at,
+            )
+        )
+    return rows
+
+
+def measure(name: str, function, rows: list) -> float:
+    """
+    Runs a function on the rows and prints its throughput.
+
+    Args:
+        name (str): The name of the measure.
+        function: The function to run, taking the rows.
+        rows (list): The rows.
+
+    Returns:
+        float: The elapsed time in seconds.
+    """
+    started_at = time.perf_counter()
+    function(rows)
+    elapsed = time.perf_counter() - started_at
+    print(f"{name:<40}{elapsed:>10.3f} s{len(rows) / elapsed:>14,.0f} rows/s")
+    return elapsed
+
+
+def main() -> None:
+    """
+    Runs the benchmark.
+    """
+    parser = ArgumentParser(description="Benchmark the row serializers")
+    parser.add_argument("--rows", dest="rows", type=int, default=1_000_000, help="Number of rows")
+    args = parser.parse_args()
+
+    rows = build_rows(args.rows)
+    serializer = RowSerializer.get(SelectionModel)
+    print(f"{args.rows:,} selection rows")
+
+    baseline = measure("obj_to_json", lambda rows: [SelectionModel.obj_to_json(row) for row in rows], rows)
+    compiled = measure("RowSerializer.serialize", lambda rows: serializer.serialize(rows, KEYS), rows)
+    print(f"{'speedup':<40}{baseline / compiled:>10.1f} x")
+
+    def write_baseline(rows):
+        output = io.StringIO()
+        for row in rows:
+            output.write(json.dumps(SelectionModel.obj_to_json(row), default=str) + "\n")
+
+    baseline = measure("obj_to_json + json.dumps", write_baseline, rows)
+    compiled = measure("RowSerializer.write", lambda rows: serializer.write(rows, KEYS, io.StringIO()), rows)
+    print(f"{'speedup':<40}{baseline / compiled:>10.1f} x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""
+Checks of behaviors of the project which need a burst of ids or several databases.
+
+Each check is a script exiting with an error at the first failed expectation.
+"""
+
+
+class CheckError(Exception):
+    """
+    Raised when a check does not get the expected result.
+    """
+
+
+def expect(condition: bool, message: str) -> None:
+    """
+    Fails the check when a condition does not hold.
+
+    Args:
+        condition (bool): The expected condition.
+        message (str): The description of the failure.
+
+    Raises:
+        CheckError: If the condition does not hold.
+    """
+    if condition is False:
+        raise CheckError(message)
@@ -0,0 +1,56 @@
+"""
+Check of the unique slugs of the bulk paths (import, sync).
+
+Builds the slugs of many resources of the same name whose ids are generated in one burst, with
+each id strategy, and checks that they are all distinct and fit the slug columns. The ids of a
+uuid7 burst share their timestamp, so the slugs must not be built from it.
+
+Usage:
+    python -m checks.slugs --ids 100000
+"""
+
+from argparse import ArgumentParser
+
+from utils.helper import ID_STRATEGIES, SLUG_LENGTH, Helper
+
+from . import expect
+
+
+def check_burst(strategy: str, ids: int, name: str) -> None:
+    """
+    Checks that the slugs of a burst of resources of the same name are distinct.
+
+    Args:
+        strategy (str): The id strategy (`uuid4` or `uuid7`).
+        ids (int): The number of ids of the burst.
+        name (str): The name of the resources.
+    """
+    slugs = {Helper.unique_slug(name, Helper.new_id(strategy)) for _ in range(ids)}
+    expect(len(slugs) == ids, f"{strategy}: {ids - len(slugs)} colliding slugs out of {ids}")
+    expect(
+        all(len(slug or "") <= SLUG_LENGTH for slug in slugs), f"{strategy}: slugs longer than {SLUG_LENGTH} characters"
+    )
+
+
+def main() -> None:
+    """
+    Runs the check.
+    """
+    parser = ArgumentParser(description="Check the unique slugs of a burst of resources of the same name")
+    parser.add_argument("--ids", dest="ids", type=int, default=100000, help="Number of ids of each burst")
+    args = parser.parse_args()
+
+    for strategy in ID_STRATEGIES:
+        for name in ["Match Winner", "x" * SLUG_LENGTH]:
+            check_burst(strategy, args.ids, name)
+        # Ids given as strings, as by the payloads of the import
+        uuid = Helper.new_id(strategy)
+        expect(
+            Helper.unique_slug("Draw", str(uuid)) == Helper.unique_slug("Draw", uuid),
+            f"{strategy}: the slug depends on the type of the id",
+        )
+        print(f"{strategy}: {args.ids:,} distinct slugs per name")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,12 @@
 """Script launch when you install the project through `make install`"""
 
+from sqlalchemy import text
+
 from models.event import EventModel, EventStatus, EventType
 from models.market import MarketModel
 from models.selection import SelectionModel, SelectionOutcome
 from models.sport import SportModel
+from settings.base import PARTITIONS
 from utils.db import DB
 
 # We're doing a simple creation of tables with no migrations
@@ -14,13 +17,18 @@ DB.get_instance().create_enum(SelectionOutcome, "selectionoutcome")
 DB.get_instance().create_table_from_model(SportModel())
 DB.get_instance().create_table_from_model(EventModel())
 DB.get_instance().create_table_from_model(MarketModel())
-DB.get_instance().create_table_from_model(SelectionModel())
+# The selections can be hash partitioned by market, so the selections of a market share a partition
+if int(PARTITIONS["SELECTION"]) > 0:
+    DB.get_instance().create_partitioned_table_from_model(SelectionModel(), "market_id", int(PARTITIONS["SELECTION"]))
+else:
+    DB.get_instance().create_table_from_model(SelectionModel())
 
 # Then we create the trigger and function
 with DB.get_instance().get_session() as session:
     # Create TRIGGER and FUNCTION for SportModel
     session.execute(
-        """
+        text(
+            """
         CREATE OR REPLACE FUNCTION check_update_sport() RETURNS TRIGGER AS $check_update_sport$
             BEGIN
                 -- Update the events if sport is disabled
@@ -38,11 +46,13 @@ with DB.get_instance().get_session() as session:
             WHEN (OLD.is_active IS DISTINCT FROM NEW.is_active)
             EXECUTE FUNCTION check_update_sport();
     """
+        )
     )
 
     # Create TRIGGER and FUNCTION for EventModel
     session.execute(
-        """
+        text(
+            """
         CREATE OR REPLACE FUNCTION check_upsert_event() RETURNS TRIGGER AS $check_upsert_event$
             DECLARE
                 is_active BOOL;
@@ -74,11 +84,13 @@ with DB.get_instance().get_session() as session:
             WHEN (OLD.is_active IS DISTINCT FROM NEW.is_active)
             EXECUTE FUNCTION check_upsert_event();
     """
+        )
     )
 
     # Create TRIGGER and FUNCTION for MarketModel
     session.execute(
-        """
+        text(
+            """
         CREATE OR REPLACE FUNCTION check_upsert_market() RETURNS TRIGGER AS $check_upsert_market$
             DECLARE
                 is_active BOOL;
@@ -110,18 +122,27 @@ with DB.get_instance().get_session() as session:
             WHEN (OLD.is_active IS DISTINCT FROM NEW.is_active)
             EXECUTE FUNCTION check_upsert_market();
     """
+        )
     )
 
     # Create TRIGGER and FUNCTION for SelectionModel
     session.execute(
-        """
+        text(
+            """
         CREATE OR REPLACE FUNCTION check_upsert_selection() RETURNS TRIGGER AS $check_upsert_selection$
             DECLARE
                 is_active BOOL;
+                has_active BOOL;
             BEGIN
                 -- Update the market status if all selections are inactive or if at least one if active
                 EXECUTE format('SELECT m.is_active FROM market m WHERE m.id=$1') INTO is_active USING NEW.market_id;
-                IF (SELECT COUNT(s.id) from selection s WHERE s.is_active=true AND s.market_id=NEW.market_id) = 0 THEN
+                -- The siblings are read from the table firing the trigger: the partition of the market when
+                -- the selections are partitioned (the trigger is cloned on each partition), the table otherwise
+                EXECUTE format(
+                    'SELECT EXISTS (SELECT 1 FROM %I.%I s WHERE s.is_active=true AND s.market_id=$1)',
+                    TG_TABLE_SCHEMA, TG_TABLE_NAME
+                ) INTO has_active USING NEW.market_id;
+                IF has_active = false THEN
                     UPDATE market SET is_active=false WHERE id=NEW.market_id;
                 ELSIF is_active = false AND NEW.is_active = true THEN
                     UPDATE market SET is_active=false WHERE id=NEW.market_id;
@@ -142,4 +163,163 @@ with DB.get_instance().get_session() as session:
             WHEN (OLD.is_active IS DISTINCT FROM NEW.is_active)
             EXECUTE FUNCTION check_upsert_selection();
     """
+        )
+    )
+
+    # Add the version column (optimistic concurrency) to the tables created before it
+    for table in [
+        SportModel.__tablename__,
+        EventModel.__tablename__,
+        MarketModel.__tablename__,
+        SelectionModel.__tablename__,
+    ]:
+        session.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1"))
+
+    # Increment the version on every update which changes a row, including the `is_active` cascades of the triggers
+    # above, so a conditional write never overwrites a row deactivated since it was read
+    session.execute(
+        text(
+            """
+        CREATE OR REPLACE FUNCTION increment_version() RETURNS TRIGGER AS $increment_version$
+            BEGIN
+                NEW.version := OLD.version + 1;
+                RETURN NEW;
+            END;
+        $increment_version$ LANGUAGE plpgsql;
+    """
+        )
+    )
+    for table in [
+        SportModel.__tablename__,
+        EventModel.__tablename__,
+        MarketModel.__tablename__,
+        SelectionModel.__tablename__,
+    ]:
+        session.execute(
+            text(
+                f"""
+        DROP TRIGGER IF EXISTS increment_version ON {table};
+        CREATE TRIGGER increment_version
+            BEFORE UPDATE ON {table}
+            FOR EACH ROW
+            WHEN (OLD.* IS DISTINCT FROM NEW.*)
+            EXECUTE FUNCTION increment_version();
+    """
+            )
+        )
+
+    # Create the archive tables of the ended events and their subtrees (see `utils.archive`), with the same columns
+    # but without the foreign keys, triggers and unique slugs of the hot tables
+    for table, parent_key in [
+        (EventModel.__tablename__, "sport_id"),
+        (MarketModel.__tablename__, "event_id"),
+        (SelectionModel.__tablename__, "market_id"),
+    ]:
+        session.execute(
+            text(
+                f"""
+        CREATE TABLE IF NOT EXISTS {table}_archive (LIKE {table} INCLUDING DEFAULTS, PRIMARY KEY (id));
+        CREATE INDEX IF NOT EXISTS {table}_archive_{parent_key}_idx ON {table}_archive ({parent_key});
+    """
+            )
+        )
+
+    # Create the covering indexes of the common projections (children of a parent, with their main fields),
+    # so that those searches are answered by an index-only scan
+    session.execute(
+        text(
+            """
+        CREATE INDEX IF NOT EXISTS event_sport_id_idx
+            ON event (sport_id) INCLUDE (name, type, status, is_active);
+        CREATE INDEX IF NOT EXISTS market_event_id_idx
+            ON market (event_id) INCLUDE (name, "order", is_active);
+        CREATE INDEX IF NOT EXISTS selection_market_id_idx
+            ON selection (market_id) INCLUDE (name, price, outcome, is_active);
+        -- Ended events, in the order they are archived
+        CREATE INDEX IF NOT EXISTS event_ended_updated_at_idx
+            ON event (updated_at) WHERE status = 'ENDED';
+    """
+        )
+    )
+
+    # Create the event book (see `utils.book`), a read model holding the nested document of each event. The triggers
+    # only flag the events whose event, markets or selections changed, their documents are rebuilt on the next read
+    # or refresh. A flag is a row appended to `event_book_queue` by a plain insert, which neither locks nor waits for
+    # any row (an upsert of a flag per event would lock it until the commit of the write, serializing the writers of
+    # an event); the refresh of an event consumes its flags. A book row never built has no `refreshed_at`
+    session.execute(
+        text(
+            """
+        CREATE TABLE IF NOT EXISTS event_book (
+            event_id UUID PRIMARY KEY REFERENCES event (id) ON DELETE CASCADE,
+            document JSONB,
+            refreshed_at TIMESTAMP WITH TIME ZONE
+        );
+        -- Flags of the first version of the event book, moved to the queue
+        DROP INDEX IF EXISTS event_book_dirty_idx;
+        ALTER TABLE event_book DROP COLUMN IF EXISTS is_dirty;
+        CREATE INDEX IF NOT EXISTS event_book_unbuilt_idx ON event_book (event_id) WHERE refreshed_at IS NULL;
+
+        CREATE TABLE IF NOT EXISTS event_book_queue (
+            id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+            event_id UUID NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS event_book_queue_event_id_idx ON event_book_queue (event_id);
+
+        CREATE OR REPLACE FUNCTION mark_event_book(target UUID) RETURNS VOID AS $mark_event_book$
+            -- Nothing is flagged when the event is gone, e.g. when its deletion cascades to its markets
+            INSERT INTO event_book_queue (event_id) SELECT e.id FROM event e WHERE e.id = target;
+        $mark_event_book$ LANGUAGE sql;
+
+        CREATE OR REPLACE FUNCTION mark_event_book_event() RETURNS TRIGGER AS $mark_event_book_event$
+            BEGIN
+                PERFORM mark_event_book(NEW.id);
+                RETURN NULL;
+            END;
+        $mark_event_book_event$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION mark_event_book_market() RETURNS TRIGGER AS $mark_event_book_market$
+            BEGIN
+                IF TG_OP <> 'INSERT' THEN
+                    PERFORM mark_event_book(OLD.event_id);
+                END IF;
+                IF TG_OP <> 'DELETE' AND (TG_OP = 'INSERT' OR NEW.event_id <> OLD.event_id) THEN
+                    PERFORM mark_event_book(NEW.event_id);
+                END IF;
+                RETURN NULL;
+            END;
+        $mark_event_book_market$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION mark_event_book_selection() RETURNS TRIGGER AS $mark_event_book_selection$
+            BEGIN
+                IF TG_OP <> 'INSERT' THEN
+                    PERFORM mark_event_book(m.event_id) FROM market m WHERE m.id = OLD.market_id;
+                END IF;
+                IF TG_OP <> 'DELETE' AND (TG_OP = 'INSERT' OR NEW.market_id <> OLD.market_id) THEN
+                    PERFORM mark_event_book(m.event_id) FROM market m WHERE m.id = NEW.market_id;
+                END IF;
+                RETURN NULL;
+            END;
+        $mark_event_book_selection$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS mark_event_book ON event;
+        CREATE TRIGGER mark_event_book
+            AFTER INSERT OR UPDATE ON event
+            FOR EACH ROW
+            EXECUTE FUNCTION mark_event_book_event();
+        DROP TRIGGER IF EXISTS mark_event_book ON market;
+        CREATE TRIGGER mark_event_book
+            AFTER INSERT OR UPDATE OR DELETE ON market
+            FOR EACH ROW
+            EXECUTE FUNCTION mark_event_book_market();
+        DROP TRIGGER IF EXISTS mark_event_book ON selection;
+        CREATE TRIGGER mark_event_book
+            AFTER INSERT OR UPDATE OR DELETE ON selection
+            FOR EACH ROW
+            EXECUTE FUNCTION mark_event_book_selection();
+
+        -- The events created before the event book are flagged, their documents are built on demand
+        INSERT INTO event_book (event_id) SELECT id FROM event ON CONFLICT (event_id) DO NOTHING;
+    """
+        )
     )
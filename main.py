@@ -1,19 +1,69 @@
 """Entrypoint of the application"""
 
+# pylint: disable=wrong-import-position
+import time
+
+# Taken before any other import so that `--profile` can report the import time
+STARTED_AT = time.perf_counter()
+
+# isort: split
 import importlib
+import json
 import pprint
 import sys
 from argparse import ArgumentParser, RawTextHelpFormatter
-from uuid import uuid4
 
 from sqlalchemy.exc import SQLAlchemyError
 
+from settings.base import SQL, STORAGE
+from utils.archive import Archiver
+from utils.batch import BatchRunner
+from utils.book import EventBook
+from utils.cleanup import SubtreeDeleter
+from utils.db import DB
+from utils.explain import PlanAnalyzer
+from utils.fanout import SearchFanOut
+from utils.generator import DataGenerator
+from utils.helper import Helper
+from utils.importer import BulkImporter
+from utils.instrumentation import SQLStats
+from utils.loadtest import LoadTester
 from utils.parsers import TypeParser
+from utils.profiler import Profiler
+
+# The DB engine is created by its first use, which is accounted as the connect phase
+profiler = Profiler.get_instance()
+profiler.add("import", time.perf_counter() - STARTED_AT - profiler.phases.get("connect", 0.0))
 
 # Create the main parser
 parser = ArgumentParser(
     description="Manipulate sports, events, markets and selections", formatter_class=RawTextHelpFormatter
 )
+parser.add_argument(
+    "--stats", dest="stats", action="store_true", help="Print the SQL statistics of the command once it is done"
+)
+parser.add_argument("--verbose", dest="verbose", action="store_true", help="Log every SQL statement")
+parser.add_argument(
+    "--primary",
+    dest="primary",
+    action="store_true",
+    help="Read from the primary rather than from the replicas, e.g. to read the writes just made",
+)
+parser.add_argument(
+    "--profile", dest="profile", action="store_true", help="Print the time spent per phase of the command"
+)
+parser.add_argument(
+    "--profile-output",
+    dest="profile_output",
+    default=None,
+    help="With --profile, dump the cProfile statistics to this file",
+)
+parser.add_argument(
+    "--profile-memory",
+    dest="profile_memory",
+    action="store_true",
+    help="With --profile, trace the peak memory (and the top allocations with --profile-output)",
+)
 # Create a subparser to split arguments per command
 subparsers = parser.add_subparsers(help="sub-command help", dest="command")
 
@@ -27,6 +77,7 @@ HELP_TXT = """\
 - Selection: {"market_id": "uuid...", "name": "Selection1", display_name": "Selection 1", \
 "price": 10.01, "outcome": "WIN|VOID|LOSE|PLACE|UNSETTLED", "is_active": true}
 """
+INCLUDE_ARCHIVED_HELP = "Include the archived events, markets and selections (see the archive command)"
 
 # Create the parser for "create"
 create_sub = subparsers.add_parser("create", help="Create a resource", formatter_class=RawTextHelpFormatter)
@@ -52,15 +103,71 @@ update_sub.add_argument(
     required=True,
     help=f"Data to update for a resource:\n{HELP_TXT}",
 )
+update_sub.add_argument(
+    "--version",
+    dest="version",
+    type=int,
+    default=None,
+    help="Version the resource is expected to have, the update is rejected if it changed meanwhile",
+)
 
 # Create the parser for "delete"
 delete_sub = subparsers.add_parser("delete", help="Delete a resource", formatter_class=RawTextHelpFormatter)
 delete_sub.add_argument("-i", "--id", dest="id", type=TypeParser.check_uuid, required=True, help="UUID of the resource")
 delete_sub.add_argument("-t", "--type", dest="type", type=TypeParser.check_type, required=True, help="Type to impact")
+delete_sub.add_argument(
+    "--subtree",
+    dest="subtree",
+    action="store_true",
+    help="Delete the descendants leaves first in batches, then the resource, instead of a single cascading delete",
+)
+delete_sub.add_argument(
+    "--batch-size", dest="batch_size", type=int, default=1000, help="With --subtree, number of rows per transaction"
+)
+delete_sub.add_argument(
+    "--pause", dest="pause", type=float, default=0.0, help="With --subtree, seconds to wait after each batch"
+)
+delete_sub.add_argument(
+    "--max-batches",
+    dest="max_batches",
+    type=int,
+    default=0,
+    help="With --subtree, stop after this number of batches (0 for no limit), a next run resumes where it stopped",
+)
 
-# Create the parser for "delete"
+# Create the parser for "get"
+get_sub = subparsers.add_parser("get", help="Get resources by UUID", formatter_class=RawTextHelpFormatter)
+get_sub.add_argument("-t", "--type", dest="type", type=TypeParser.check_type, required=True, help="Type to get")
+get_sub.add_argument(
+    "-i", "--id", dest="ids", type=TypeParser.check_uuid, nargs="+", action="extend", default=[], help="UUID(s)"
+)
+get_sub.add_argument(
+    "--ids-file",
+    dest="ids_file",
+    type=TypeParser.check_uuid_file,
+    default=[],
+    help="File with one UUID per line, - to read them from the standard input",
+)
+get_sub.add_argument(
+    "-f",
+    "--fields",
+    dest="fields",
+    type=TypeParser.check_fields,
+    default=None,
+    help="Comma-separated fields to select and return, e.g. name,price (all fields by default)",
+)
+get_sub.add_argument("--include-archived", dest="include_archived", action="store_true", help=INCLUDE_ARCHIVED_HELP)
+
+# Create the parser for "search"
 search_sub = subparsers.add_parser("search", help="Search a resource", formatter_class=RawTextHelpFormatter)
-search_sub.add_argument("-t", "--type", dest="type", type=TypeParser.check_type, required=True, help="Type to search")
+search_sub.add_argument(
+    "-t",
+    "--type",
+    dest="types",
+    type=TypeParser.check_types,
+    required=True,
+    help="Type(s) to search, comma-separated types (e.g. sport,event,market) are searched concurrently",
+)
 search_sub.add_argument(
     "-d",
     "--data",
@@ -69,24 +176,408 @@ search_sub.add_argument(
     required=True,
     help=f"Data to update for a resource:\n{HELP_TXT}",
 )
+search_sub.add_argument(
+    "-f",
+    "--fields",
+    dest="fields",
+    type=TypeParser.check_fields,
+    default=None,
+    help="Comma-separated fields to select and return, e.g. name,price (all fields by default)",
+)
+search_sub.add_argument(
+    "--explain",
+    dest="explain",
+    action="store_true",
+    help="Print the query plan with its sequential scans, sorts and suggested indexes instead of the results",
+)
+search_sub.add_argument(
+    "--analyze",
+    dest="analyze",
+    action="store_true",
+    help="With --explain, run the query to get actual rows and timings",
+)
+search_sub.add_argument("--json", dest="json", action="store_true", help="With --explain, print the plan as JSON")
+search_sub.add_argument("--include-archived", dest="include_archived", action="store_true", help=INCLUDE_ARCHIVED_HELP)
+search_sub.add_argument(
+    "--format",
+    dest="format",
+    choices=["pprint", "jsonl"],
+    default="pprint",
+    help="Output format of the results, jsonl streams one JSON object per line",
+)
+
+# Create the parser for "count"
+count_sub = subparsers.add_parser("count", help="Count resources", formatter_class=RawTextHelpFormatter)
+count_sub.add_argument("-t", "--type", dest="type", type=TypeParser.check_type, required=True, help="Type to count")
+count_sub.add_argument(
+    "-d",
+    "--data",
+    dest="data",
+    type=TypeParser.check_json,
+    default=[],
+    help=f"Criteria of the resources to count (all by default):\n{HELP_TXT}",
+)
+count_sub.add_argument(
+    "--approximate",
+    dest="approximate",
+    action="store_true",
+    help="Return the planner estimate (or pg_class.reltuples without criteria) instead of reading the rows",
+)
+
+# Create the parser for "aggregate"
+aggregate_sub = subparsers.add_parser(
+    "aggregate", help="Compute grouped statistics", formatter_class=RawTextHelpFormatter
+)
+aggregate_sub.add_argument(
+    "-t", "--type", dest="type", type=TypeParser.check_type, required=True, help="Type to aggregate"
+)
+aggregate_sub.add_argument(
+    "-d",
+    "--data",
+    dest="data",
+    type=TypeParser.check_json,
+    default=[],
+    help=f"Criteria of the resources to aggregate (all by default):\n{HELP_TXT}",
+)
+aggregate_sub.add_argument(
+    "-g",
+    "--group-by",
+    dest="group_by",
+    type=TypeParser.check_fields,
+    default=[],
+    help="Comma-separated columns or ancestor ids to group by, e.g. outcome or event_id (no group by default)",
+)
+aggregate_sub.add_argument(
+    "-m",
+    "--metrics",
+    dest="metrics",
+    type=TypeParser.check_metrics,
+    default=[("count", None)],
+    help="Comma-separated aggregates among count, sum, min, max and avg, e.g. count,min:price,avg:price",
+)
+
+# Create the parser for "batch"
+batch_sub = subparsers.add_parser(
+    "batch", help="Run a file of create, update and delete commands", formatter_class=RawTextHelpFormatter
+)
+batch_sub.add_argument(
+    "--file",
+    dest="file",
+    required=True,
+    help='JSON lines file, e.g. {"command": "update", "type": "selection", "id": "uuid...", "data": {"price": 2.5}}',
+)
+batch_sub.add_argument(
+    "--workers", dest="workers", type=int, default=1, help="Number of threads, commands of a resource stay in order"
+)
+batch_sub.add_argument(
+    "--scaling",
+    dest="scaling",
+    action="store_true",
+    help="Run the batch with 1, 2, 4... up to --workers threads and report the throughput of each run",
+)
+
+# Create the parser for "sync"
+sync_sub = subparsers.add_parser(
+    "sync", help="Sync the children of a resource with a snapshot", formatter_class=RawTextHelpFormatter
+)
+sync_sub.add_argument(
+    "-t",
+    "--type",
+    dest="type",
+    type=TypeParser.check_type,
+    choices=["sport", "event", "market"],
+    required=True,
+    help="Type of the root of the snapshot",
+)
+sync_sub.add_argument("-i", "--id", dest="id", type=TypeParser.check_uuid, required=True, help="UUID of the root")
+sync_sub.add_argument(
+    "--file",
+    dest="snapshot",
+    type=TypeParser.check_json_file,
+    required=True,
+    help='JSON file (- for stdin) with the children of the root, e.g. [{"id": ..., "name": ..., "selections": [...]}]',
+)
+sync_sub.add_argument("--dry-run", dest="dry_run", action="store_true", help="Report the diff without writing it")
+
+# Create the parser for "archive"
+archive_sub = subparsers.add_parser(
+    "archive",
+    help="Move the ended events and their subtrees to the archive tables",
+    formatter_class=RawTextHelpFormatter,
+)
+archive_sub.add_argument(
+    "--older-than",
+    dest="older_than",
+    type=float,
+    default=30.0,
+    help="Number of days an ended event must have been left untouched to be archived",
+)
+archive_sub.add_argument(
+    "--batch-size", dest="batch_size", type=int, default=100, help="Number of events moved per transaction"
+)
+archive_sub.add_argument(
+    "--max-batches",
+    dest="max_batches",
+    type=int,
+    default=0,
+    help="Stop after this number of batches (0 for no limit), a next run resumes where it stopped",
+)
+archive_sub.add_argument("--dry-run", dest="dry_run", action="store_true", help="Count the rows to move only")
+
+# Create the parser for "book"
+book_sub = subparsers.add_parser(
+    "book", help="Read the nested documents of events from the event book", formatter_class=RawTextHelpFormatter
+)
+book_sub.add_argument(
+    "-i", "--id", dest="ids", type=TypeParser.check_uuid, nargs="+", action="extend", default=[], help="Event UUID(s)"
+)
+book_sub.add_argument(
+    "--refresh",
+    dest="refresh",
+    action="store_true",
+    help="Rebuild the documents of all the events flagged as changed instead of reading documents",
+)
+book_sub.add_argument(
+    "--batch-size", dest="batch_size", type=int, default=500, help="With --refresh, number of events per transaction"
+)
+book_sub.add_argument(
+    "--max-batches",
+    dest="max_batches",
+    type=int,
+    default=0,
+    help="With --refresh, stop after this number of batches (0 for no limit)",
+)
+
+# Create the parser for "import"
+import_sub = subparsers.add_parser(
+    "import", help="Load a fixture file with several processes", formatter_class=RawTextHelpFormatter
+)
+import_sub.add_argument(
+    "--file",
+    dest="file",
+    required=True,
+    help='JSON lines file, e.g. {"type": "market", "id": "uuid...", "data": {"event_id": "uuid...", "name": ...}}',
+)
+import_sub.add_argument("--workers", dest="workers", type=int, default=1, help="Number of worker processes")
+import_sub.add_argument(
+    "--chunk-size",
+    dest="chunk_size",
+    type=int,
+    default=5000,
+    help="Rows per transaction, the children of a parent are never split across chunks",
+)
+
+# Create the parser for "generate"
+generate_sub = subparsers.add_parser(
+    "generate", help="Generate a deterministic synthetic dataset", formatter_class=RawTextHelpFormatter
+)
+generate_sub.add_argument("--seed", dest="seed", type=int, default=42, help="Seed of the random generator")
+generate_sub.add_argument("--sports", dest="sports", type=int, default=10, help="Number of sports")
+generate_sub.add_argument("--events", dest="events", type=int, default=1000, help="Number of events")
+generate_sub.add_argument(
+    "--markets-per-event", dest="markets_per_event", type=int, default=10, help="Average number of markets per event"
+)
+generate_sub.add_argument(
+    "--selections-per-market",
+    dest="selections_per_market",
+    type=int,
+    default=3,
+    help="Average number of selections per market",
+)
+generate_sub.add_argument(
+    "--batch-size", dest="batch_size", type=int, default=1000, help="Number of events loaded per COPY round"
+)
+generate_sub.add_argument(
+    "--keep-triggers",
+    dest="keep_triggers",
+    action="store_true",
+    help="Keep the is_active triggers enabled during the load (much slower)",
+)
+
+# Create the parser for "loadtest"
+loadtest_sub = subparsers.add_parser(
+    "loadtest", help="Run a mixed concurrent workload and report latencies", formatter_class=RawTextHelpFormatter
+)
+loadtest_sub.add_argument("-w", "--workers", dest="workers", type=int, default=4, help="Number of worker processes")
+loadtest_sub.add_argument(
+    "--duration", dest="duration", type=float, default=30.0, help="Duration of the test in seconds"
+)
+loadtest_sub.add_argument(
+    "--rate", dest="rate", type=float, default=0.0, help="Target operations per second for all workers, 0 for no limit"
+)
+loadtest_sub.add_argument(
+    "--mix",
+    dest="mix",
+    type=TypeParser.check_mix,
+    default="price=60,settle=10,search=30",
+    help="Weight of each operation among price, settle and search",
+)
+loadtest_sub.add_argument(
+    "--sample", dest="sample", type=int, default=1000, help="Number of selections targeted by the workload"
+)
+loadtest_sub.add_argument("--seed", dest="seed", type=int, default=42, help="Seed of the random generators")
+loadtest_sub.add_argument(
+    "--optimistic",
+    dest="optimistic",
+    action="store_true",
+    help="Check the version of the selections on write and retry on a conflict",
+)
+loadtest_sub.add_argument(
+    "--histogram", dest="histogram", action="store_true", help="Print the latency histogram of each operation"
+)
 
 # Get formatted data
-args_dict = parser.parse_args(sys.argv[1:])
+with profiler.phase("parse"):
+    args_dict = parser.parse_args(sys.argv[1:])
+
+# Instrument the engine when statistics or the slow-query log are requested (no engine with the memory backend)
+if STORAGE["BACKEND"] == "postgresql":
+    DB.get_instance().set_verbose(args_dict.verbose)
+    DB.get_instance().set_read_primary(args_dict.primary)
+if STORAGE["BACKEND"] == "postgresql" and (args_dict.stats or SQL["SLOW_QUERY_LOG"] != ""):
+    for engine in DB.get_instance().get_engines():
+        SQLStats.get_instance().attach(engine)
+
+if args_dict.profile:
+    profiler.start(args_dict.profile_output, args_dict.profile_memory)
+    if STORAGE["BACKEND"] == "postgresql":
+        with profiler.phase("connect"):
+            # Open the first pool connection now rather than during the first query
+            DB.get_instance().get_engine().connect().close()
 
 # Dynamically instantiate the proper module and call the method associated to the command line
 command = args_dict.command
 try:
-    if command in ["create", "update"]:
-        uuid = getattr(importlib.import_module("modules"), args_dict.type.capitalize())().upsert(
-            getattr(args_dict, "id", uuid4()), args_dict.data
-        )
-        print(f"A resource has been {command}d under the ID: {uuid}")
-    elif command == "delete":
-        getattr(importlib.import_module("modules"), args_dict.type.capitalize())().delete(args_dict.id)
-        print("The resource has been successfully deleted")
-    elif command == "search":
-        results = getattr(importlib.import_module("modules"), args_dict.type.capitalize())().search(args_dict.data)
-        pprint.pprint(results)
-
-except SQLAlchemyError as error:
+    with profiler.phase("execute"):
+        if command in ["create", "update"]:
+            result = getattr(importlib.import_module("modules"), args_dict.type.capitalize())().upsert(
+                getattr(args_dict, "id", None) or Helper.new_id(), args_dict.data, getattr(args_dict, "version", None)
+            )
+            if result["written"]:
+                print(f"A resource has been {command}d under the ID: {result['id']}")
+            else:
+                print(f"The resource {result['id']} is unchanged, nothing has been written")
+        elif command == "delete" and args_dict.subtree:
+            pprint.pprint(
+                SubtreeDeleter(args_dict.batch_size, args_dict.pause, sys.stderr).run(
+                    args_dict.type, args_dict.id, args_dict.max_batches
+                )
+            )
+        elif command == "delete":
+            getattr(importlib.import_module("modules"), args_dict.type.capitalize())().delete(args_dict.id)
+            print("The resource has been successfully deleted")
+        elif command == "get":
+            if len(args_dict.ids + args_dict.ids_file) == 0:
+                raise ValueError("No UUID to get, use --id and/or --ids-file")
+            results, missing = getattr(importlib.import_module("modules"), args_dict.type.capitalize())().get_many(
+                args_dict.ids + args_dict.ids_file, args_dict.fields, args_dict.include_archived
+            )
+            with profiler.phase("output"):
+                pprint.pprint(results)
+            if len(missing) > 0:
+                print(f"{len(missing)} resource(s) not found: {', '.join(str(uuid) for uuid in missing)}")
+        elif command == "search" and len(args_dict.types) > 1:
+            if args_dict.explain:
+                raise ValueError("--explain needs a single type")
+            results = SearchFanOut.search(
+                [(arg_type, args_dict.data) for arg_type in args_dict.types],
+                args_dict.fields,
+                args_dict.include_archived,
+            )
+            with profiler.phase("output"):
+                if args_dict.format == "jsonl":
+                    sys.stdout.writelines(json.dumps(tagged, ensure_ascii=False) + "\n" for tagged in results)
+                else:
+                    pprint.pprint(results)
+        elif command == "search" and args_dict.explain:
+            if args_dict.include_archived:
+                raise ValueError("--explain only explains the search of the hot tables, without --include-archived")
+            report = getattr(importlib.import_module("modules"), args_dict.types[0].capitalize())().explain(
+                args_dict.data, args_dict.analyze, args_dict.fields
+            )
+            print(json.dumps(report, indent=2, default=str) if args_dict.json else PlanAnalyzer.render(report))
+        elif command == "search" and args_dict.format == "jsonl":
+            getattr(importlib.import_module("modules"), args_dict.types[0].capitalize())().export(
+                args_dict.data, sys.stdout, args_dict.fields, args_dict.include_archived
+            )
+        elif command == "search":
+            results = getattr(importlib.import_module("modules"), args_dict.types[0].capitalize())().search(
+                args_dict.data, args_dict.fields, args_dict.include_archived
+            )
+            with profiler.phase("output"):
+                pprint.pprint(results)
+        elif command == "count":
+            print(
+                getattr(importlib.import_module("modules"), args_dict.type.capitalize())().count(
+                    args_dict.data, args_dict.approximate
+                )
+            )
+        elif command == "aggregate":
+            pprint.pprint(
+                getattr(importlib.import_module("modules"), args_dict.type.capitalize())().aggregate(
+                    args_dict.data, args_dict.group_by, args_dict.metrics
+                )
+            )
+        elif command == "batch":
+            runner = BatchRunner(args_dict.workers)
+            commands = runner.load(args_dict.file)
+            pprint.pprint(runner.scale(commands) if args_dict.scaling else runner.run(commands))
+        elif command == "sync":
+            pprint.pprint(
+                getattr(importlib.import_module("modules"), args_dict.type.capitalize())().sync(
+                    args_dict.id, args_dict.snapshot, args_dict.dry_run
+                )
+            )
+        elif command == "archive":
+            pprint.pprint(
+                Archiver(args_dict.batch_size).run(args_dict.older_than, args_dict.max_batches, args_dict.dry_run)
+            )
+        elif command == "book" and args_dict.refresh:
+            pprint.pprint(EventBook.refresh_dirty(args_dict.batch_size, args_dict.max_batches))
+        elif command == "book":
+            if len(args_dict.ids) == 0:
+                raise ValueError("No event UUID to read, use --id or --refresh")
+            documents, inactive, missing = EventBook.get_many(args_dict.ids)
+            with profiler.phase("output"):
+                pprint.pprint(documents)
+            if len(inactive) > 0:
+                print(f"{len(inactive)} event(s) not active: {', '.join(str(uuid) for uuid in inactive)}")
+            if len(missing) > 0:
+                print(f"{len(missing)} event(s) not found: {', '.join(str(uuid) for uuid in missing)}")
+        elif command == "import":
+            pprint.pprint(BulkImporter(args_dict.workers, args_dict.chunk_size).run(args_dict.file))
+        elif command == "generate":
+            summary = DataGenerator(
+                seed=args_dict.seed,
+                sports=args_dict.sports,
+                events=args_dict.events,
+                markets_per_event=args_dict.markets_per_event,
+                selections_per_market=args_dict.selections_per_market,
+                batch_size=args_dict.batch_size,
+                keep_triggers=args_dict.keep_triggers,
+            ).run()
+            pprint.pprint(summary)
+        elif command == "loadtest":
+            tester = LoadTester(
+                workers=args_dict.workers,
+                duration=args_dict.duration,
+                rate=args_dict.rate,
+                mix=args_dict.mix,
+                sample=args_dict.sample,
+                seed=args_dict.seed,
+                optimistic=args_dict.optimistic,
+            )
+            pprint.pprint(tester.run())
+            if args_dict.histogram:
+                for operation, histogram in tester.histograms.items():
+                    print(f"\n{operation}\n{histogram.render()}")
+
+except (SQLAlchemyError, ValueError) as error:
     print(error)
+
+if args_dict.stats:
+    pprint.pprint(SQLStats.get_instance().report())
+
+if args_dict.profile:
+    profiler.stop()
+    print(profiler.report(time.perf_counter() - STARTED_AT), file=sys.stderr)
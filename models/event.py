@@ -6,14 +6,14 @@ Defines the database schema, enumerations, and helper methods for the Event enti
 
 from datetime import datetime, timezone
 from enum import Enum
-from uuid import uuid4
 
 from sqlalchemy import Column, ForeignKey, func
 from sqlalchemy.dialects.postgresql import ENUM, UUID
 from sqlalchemy.orm import relationship
-from sqlalchemy.types import Boolean, DateTime, String
+from sqlalchemy.types import Boolean, DateTime, Integer, String
 
 from utils import BaseModel
+from utils.helper import Helper
 
 from . import JSON
 from .sport import SportModel
@@ -60,6 +60,7 @@ class EventJSON(JSON):
         type (EventType): Type of the event.
         status (EventStatus): Status of the event.
         is_active (bool): Whether the event is active.
+        version (int): Version of the event, incremented by every write.
         created_at (str): Timestamp of when the event was created.
         updated_at (str): Timestamp of when the event was last updated.
     """
@@ -72,6 +73,7 @@ class EventJSON(JSON):
     type: EventType
     status: EventStatus
     is_active: bool
+    version: int
     created_at: str
     updated_at: str
 
@@ -89,13 +91,14 @@ class EventModel(BaseModel):
         type (EventType): Type of the event.
         status (EventStatus): Status of the event.
         is_active (bool): Whether the event is active.
+        version (int): Version of the event, incremented by every write.
         created_at (datetime): Timestamp of when the event was created.
         updated_at (datetime): Timestamp of when the event was last updated.
     """
 
     __tablename__ = "event"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=Helper.new_id)
     # FK
     sport_id = Column(
         UUID(as_uuid=True), ForeignKey(SportModel.id, name="event_sport_id", ondelete="CASCADE"), nullable=False
@@ -109,6 +112,8 @@ class EventModel(BaseModel):
     type = Column(ENUM(EventType))
     status = Column(ENUM(EventStatus))
     is_active = Column(Boolean, default=False)
+    # Optimistic concurrency, a conditional write expects the version it has read
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     # Default columns
     # pylint: disable=not-callable
     created_at = Column(DateTime(timezone=datetime.now(timezone.utc)), default=func.now(), nullable=False)
@@ -137,6 +142,7 @@ class EventModel(BaseModel):
             "type": obj.type,
             "status": obj.status,
             "is_active": obj.is_active,
+            "version": obj.version,
             "created_at": obj.created_at.strftime("%Y-%m-%d %H:%M"),
             "updated_at": obj.updated_at.strftime("%Y-%m-%d %H:%M"),
         }
@@ -157,6 +163,7 @@ class EventModel(BaseModel):
             "type": self.type,
             "status": self.status,
             "is_active": self.is_active,
+            "version": self.version,
             "created_at": self.created_at.strftime("%Y-%m-%d %H:%M"),
             "updated_at": self.updated_at.strftime("%Y-%m-%d %H:%M"),
         }
@@ -5,14 +5,14 @@ Defines the database schema, JSON structure, and helper methods for the Market e
 """
 
 from datetime import datetime, timezone
-from uuid import uuid4
 
 from sqlalchemy import Column, ForeignKey, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
-from sqlalchemy.types import Boolean, DateTime, SmallInteger, String
+from sqlalchemy.types import Boolean, DateTime, Integer, SmallInteger, String
 
 from utils import BaseModel
+from utils.helper import Helper
 
 from . import JSON
 from .event import EventModel
@@ -32,6 +32,7 @@ class MarketJSON(JSON):
         schema (int): Schema version for the market.
         columns (int): Number of columns for the market.
         is_active (bool): Whether the market is active.
+        version (int): Version of the market, incremented by every write.
         created_at (str): Timestamp of when the market was created.
         updated_at (str): Timestamp of when the market was last updated.
     """
@@ -45,6 +46,7 @@ class MarketJSON(JSON):
     schema: int
     columns: int
     is_active: bool
+    version: int
     created_at: str
     updated_at: str
 
@@ -63,13 +65,14 @@ class MarketModel(BaseModel):
         schema (int): Schema version for the market.
         columns (int): Number of columns for the market.
         is_active (bool): Whether the market is active.
+        version (int): Version of the market, incremented by every write.
         created_at (datetime): Timestamp of when the market was created.
         updated_at (datetime): Timestamp of when the market was last updated.
     """
 
     __tablename__ = "market"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=Helper.new_id)
     # FK
     event_id = Column(
         UUID(as_uuid=True), ForeignKey(EventModel.id, name="market_event_id", ondelete="CASCADE"), nullable=False
@@ -84,6 +87,8 @@ class MarketModel(BaseModel):
     schema = Column(SmallInteger, nullable=False)
     columns = Column(SmallInteger, nullable=False)
     is_active = Column(Boolean, default=False)
+    # Optimistic concurrency, a conditional write expects the version it has read
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     # Default columns
     # pylint: disable=not-callable
     created_at = Column(DateTime(timezone=datetime.now(timezone.utc)), default=func.now(), nullable=False)
@@ -113,6 +118,7 @@ class MarketModel(BaseModel):
             "schema": obj.schema,
             "columns": obj.columns,
             "is_active": obj.is_active,
+            "version": obj.version,
             "created_at": obj.created_at.strftime("%Y-%m-%d %H:%M"),
             "updated_at": obj.updated_at.strftime("%Y-%m-%d %H:%M"),
         }
@@ -134,6 +140,7 @@ class MarketModel(BaseModel):
             "schema": self.schema,
             "columns": self.columns,
             "is_active": self.is_active,
+            "version": self.version,
             "created_at": self.created_at.strftime("%Y-%m-%d %H:%M"),
             "updated_at": self.updated_at.strftime("%Y-%m-%d %H:%M"),
         }
@@ -6,14 +6,14 @@ Defines the database schema, JSON structure, and helper methods for the Selectio
 
 from datetime import datetime, timezone
 from enum import Enum
-from uuid import uuid4
 
 from sqlalchemy import Column, ForeignKey, func
 from sqlalchemy.dialects.postgresql import ENUM, UUID
 from sqlalchemy.orm import relationship
-from sqlalchemy.types import Boolean, DateTime, Numeric, String
+from sqlalchemy.types import Boolean, DateTime, Integer, Numeric, String
 
 from utils import BaseModel
+from utils.helper import Helper
 
 from . import JSON
 from .market import MarketModel
@@ -51,6 +51,7 @@ class SelectionJSON(JSON):
         price (float): Price of the selection.
         outcome (SelectionOutcome): Outcome of the selection.
         is_active (bool): Whether the selection is active.
+        version (int): Version of the selection, incremented by every write.
         created_at (str): Timestamp of when the selection was created.
         updated_at (str): Timestamp of when the selection was last updated.
     """
@@ -63,6 +64,7 @@ class SelectionJSON(JSON):
     price: float
     outcome: SelectionOutcome
     is_active: bool
+    version: int
     created_at: str
     updated_at: str
 
@@ -80,13 +82,14 @@ class SelectionModel(BaseModel):
         price (float): Price of the selection.
         outcome (SelectionOutcome): Outcome of the selection.
         is_active (bool): Whether the selection is active.
+        version (int): Version of the selection, incremented by every write.
         created_at (datetime): Timestamp of when the selection was created.
         updated_at (datetime): Timestamp of when the selection was last updated.
     """
 
     __tablename__ = "selection"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=Helper.new_id)
     # FK
     market_id = Column(
         UUID(as_uuid=True), ForeignKey(MarketModel.id, name="selection_market_id", ondelete="CASCADE"), nullable=False
@@ -99,6 +102,8 @@ class SelectionModel(BaseModel):
     price = Column(Numeric(10, 2))
     outcome = Column(ENUM(SelectionOutcome))
     is_active = Column(Boolean, default=False)
+    # Optimistic concurrency, a conditional write expects the version it has read
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     # Default columns
     # pylint: disable=not-callable
     created_at = Column(DateTime(timezone=datetime.now(timezone.utc)), default=func.now(), nullable=False)
@@ -127,6 +132,7 @@ class SelectionModel(BaseModel):
             "price": obj.price,
             "outcome": obj.outcome,
             "is_active": obj.is_active,
+            "version": obj.version,
             "created_at": obj.created_at.strftime("%Y-%m-%d %H:%M"),
             "updated_at": obj.updated_at.strftime("%Y-%m-%d %H:%M"),
         }
@@ -147,6 +153,7 @@ class SelectionModel(BaseModel):
             "price": self.price,
             "outcome": self.outcome,
             "is_active": self.is_active,
+            "version": self.version,
             "created_at": self.created_at.strftime("%Y-%m-%d %H:%M"),
             "updated_at": self.updated_at.strftime("%Y-%m-%d %H:%M"),
         }
@@ -5,14 +5,14 @@ Defines the database schema, JSON structure, and helper methods for the Sport en
 """
 
 from datetime import datetime, timezone
-from uuid import uuid4
 
 from sqlalchemy import Column, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
-from sqlalchemy.types import Boolean, DateTime, SmallInteger, String
+from sqlalchemy.types import Boolean, DateTime, Integer, SmallInteger, String
 
 from utils import BaseModel
+from utils.helper import Helper
 
 from . import JSON
 
@@ -28,6 +28,7 @@ class SportJSON(JSON):
         slug (str): Slugified version of the sport name.
         order (int): Display order of the sport.
         is_active (bool): Whether the sport is active.
+        version (int): Version of the sport, incremented by every write.
         created_at (str): Timestamp of when the sport was created.
         updated_at (str): Timestamp of when the sport was last updated.
     """
@@ -38,6 +39,7 @@ class SportJSON(JSON):
     slug: str
     order: int
     is_active: bool
+    version: int
     created_at: str
     updated_at: str
 
@@ -53,13 +55,14 @@ class SportModel(BaseModel):
         slug (str): Slugified version of the sport name.
         order (int): Display order of the sport.
         is_active (bool): Whether the sport is active.
+        version (int): Version of the sport, incremented by every write.
         created_at (datetime): Timestamp of when the sport was created.
         updated_at (datetime): Timestamp of when the sport was last updated.
     """
 
     __tablename__ = "sport"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=Helper.new_id)
     # FK
     events = relationship("EventModel", lazy="joined", back_populates="sport")
     # Columns
@@ -68,6 +71,8 @@ class SportModel(BaseModel):
     slug = Column(String(100), nullable=False, unique=True)
     order = Column(SmallInteger, nullable=False)
     is_active = Column(Boolean, default=False)
+    # Optimistic concurrency, a conditional write expects the version it has read
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     # Default columns
     # pylint: disable=not-callable
     created_at = Column(DateTime(timezone=datetime.now(timezone.utc)), default=func.now(), nullable=False)
@@ -94,6 +99,7 @@ class SportModel(BaseModel):
             "slug": obj.slug,
             "order": obj.order,
             "is_active": obj.is_active,
+            "version": obj.version,
             "created_at": obj.created_at.strftime("%Y-%m-%d %H:%M"),
             "updated_at": obj.updated_at.strftime("%Y-%m-%d %H:%M"),
         }
@@ -112,6 +118,7 @@ class SportModel(BaseModel):
             "slug": self.slug,
             "order": self.order,
             "is_active": self.is_active,
+            "version": self.version,
             "created_at": self.created_at.strftime("%Y-%m-%d %H:%M"),
             "updated_at": self.updated_at.strftime("%Y-%m-%d %H:%M"),
         }
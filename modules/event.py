@@ -2,48 +2,58 @@
 Defines the Event class for business logic.
 
 This class implements the required methods for managing events, such as upserting,
-deleting, and searching, using the database interface.
+deleting, getting, searching, exporting, counting, aggregating and explaining searches,
+and syncing snapshots of their children, using the storage backend (always the database for
+aggregations, explains and syncs).
 """
 
 from collections.abc import Sequence
+from typing import TextIO
 from uuid import UUID
 
 from models.event import EventJSON, EventModel
+from utils.aggregation import Aggregator
 from utils.db import DB
+from utils.explain import PlanAnalyzer, PlanJSON
 from utils.helper import Helper
-from utils.interfaces import ModuleInterface
+from utils.interfaces import ModuleInterface, UpsertJSON
+from utils.sync import SnapshotSync
 
 
 class Event(ModuleInterface):
     """
     A class for handling business logic related to events.
 
-    This class provides methods to upsert, delete, and search for events in the database.
+    This class provides methods to upsert, delete, get, search, export, count and aggregate events in the database,
+    and to explain the query of a search and sync the markets and selections of an event with a snapshot.
     """
 
-    def upsert(self, uuid: UUID, data: dict[str, str | int | float | bool]) -> UUID:
+    def upsert(self, uuid: UUID, data: dict[str, str | int | float | bool], version: int | None = None) -> UpsertJSON:
         """
         Upserts (inserts or updates) an event in the database.
 
         Args:
             uuid (UUID): The unique identifier of the event.
             data (dict[str, str | int | float | bool]): The data to be upserted.
+            version (int | None): The version the event is expected to have, None to write whatever its version.
 
         Returns:
-            UUID: The unique identifier of the upserted event.
+            UpsertJSON: The unique identifier of the event and whether it has been written, an identical payload
+                being skipped.
+
+        Raises:
+            VersionConflictError: If the event does not have the expected version.
         """
-        model = DB.get_instance().get_upsert_data(EventModel(id=uuid), data)
+        values = self.get_storage().get_upsert_values(EventModel, data)
         if data.get("name", None):
-            model.slug = Helper.slugify(model.name)
+            values["slug"] = Helper.slugify(values["name"])
         if data.get("type", None):
-            model.type = model.type.upper()
+            values["type"] = values["type"].upper()
         if data.get("status", None):
-            model.status = model.status.upper()
+            values["status"] = values["status"].upper()
 
-        # Upsert data in DB
-        with DB.get_instance().get_session() as session:
-            session.merge(model)
-        return uuid
+        # Upsert data in the storage, only when it changes the stored row
+        return {"id": str(uuid), "written": self.get_storage().upsert(EventModel, uuid, values, version)}
 
     def delete(self, uuid: UUID) -> None:
         """
@@ -52,27 +62,123 @@ class Event(ModuleInterface):
         Args:
             uuid (UUID): The unique identifier of the event to delete.
         """
-        DB.get_instance().delete(EventModel, uuid)
+        self.get_storage().delete(EventModel, uuid)
+
+    def get_many(
+        self, ids: list[UUID], fields: list[str] | None = None, include_archived: bool = False
+    ) -> tuple[list[EventJSON], list[UUID]]:
+        """
+        Fetches events by their UUIDs.
 
-    def search(self, data: list[dict[str, str | int | float | bool]]) -> Sequence[EventJSON]:
+        Args:
+            ids (list[UUID]): The unique identifiers of the events to fetch.
+            fields (list[str] | None): The fields to return, all of them when None.
+            include_archived (bool): Whether the archived events are fetched too.
+
+        Returns:
+            tuple[list[EventJSON], list[UUID]]: The events found, in the order of the UUIDs, and the UUIDs not found.
+        """
+        return self.get_storage().get_many(EventModel, "e", ids, fields, include_archived)
+
+    def search(
+        self,
+        data: list[dict[str, str | int | float | bool]],
+        fields: list[str] | None = None,
+        include_archived: bool = False,
+    ) -> Sequence[EventJSON]:
         """
         Searches for events in the database based on criteria.
 
         Args:
             data (list[dict[str, str | int | float | bool]]): A list of search criteria.
+            fields (list[str] | None): The fields to return, all of them when None.
+            include_archived (bool): Whether the archived events are searched too.
 
         Returns:
             Sequence[EventJSON]: A sequence of event objects in JSON format.
         """
-        results = []
-        model_keys = EventModel.__table__.columns.keys()
-        with DB.get_instance().get_session() as session:
-            query = "SELECT DISTINCT e.* FROM event e"
-            # Build the where query
-            where_query = DB.get_instance().build_where("e", model_keys, data)
-            # Apply the where
-            if where_query != "":
-                query += f" WHERE {where_query}"
-            results = session.execute(query).all()
-
-        return [EventModel.obj_to_json(res) for res in results]
+        return self.get_storage().search(EventModel, "e", data, fields, include_archived)
+
+    def export(
+        self,
+        data: list[dict[str, str | int | float | bool]],
+        output: TextIO,
+        fields: list[str] | None = None,
+        include_archived: bool = False,
+    ) -> int:
+        """
+        Writes the events matching the criteria to an output buffer as JSON lines.
+
+        Args:
+            data (list[dict[str, str | int | float | bool]]): A list of search criteria.
+            output (TextIO): The buffer to write to.
+            fields (list[str] | None): The fields to write, all of them when None.
+            include_archived (bool): Whether the archived events are written too.
+
+        Returns:
+            int: The number of events written.
+        """
+        return self.get_storage().export(EventModel, "e", data, output, fields, include_archived)
+
+    def count(self, data: list[dict[str, str | int | float | bool]], approximate: bool = False) -> int:
+        """
+        Counts the events matching the criteria.
+
+        Args:
+            data (list[dict[str, str | int | float | bool]]): A list of search criteria.
+            approximate (bool): Whether to return an estimate instead of an exact count.
+
+        Returns:
+            int: The number of events.
+        """
+        return self.get_storage().count(EventModel, "e", data, approximate)
+
+    def aggregate(
+        self,
+        data: list[dict[str, str | int | float | bool]],
+        group_by: list[str],
+        metrics: list[tuple[str, str | None]],
+    ) -> list[dict]:
+        """
+        Computes grouped statistics over the events matching the criteria.
+
+        Args:
+            data (list[dict[str, str | int | float | bool]]): A list of search criteria.
+            group_by (list[str]): Columns of the event or ids of its ancestors.
+            metrics (list[tuple[str, str | None]]): The functions with their column, None for `count(*)`.
+
+        Returns:
+            list[dict]: One object per group, with the grouped values and the aggregates.
+        """
+        return Aggregator.aggregate(EventModel, "e", data, group_by, metrics)
+
+    def explain(
+        self, data: list[dict[str, str | int | float | bool]], analyze: bool = False, fields: list[str] | None = None
+    ) -> PlanJSON:
+        """
+        Explains the query run by a search for events.
+
+        Args:
+            data (list[dict[str, str | int | float | bool]]): A list of search criteria.
+            analyze (bool): Whether to execute the query to get actual rows and timings.
+            fields (list[str] | None): The fields selected by the search, all of them when None.
+
+        Returns:
+            PlanJSON: The plan of the query with its findings and index suggestions.
+        """
+        query = DB.get_instance().build_search_query(EventModel, "e", data, fields)
+        return PlanAnalyzer.analyze(EventModel, query, data, analyze, fields)
+
+    def sync(self, uuid: UUID, snapshot: list[dict], dry_run: bool = False) -> dict:
+        """
+        Syncs the markets and selections of an event with a snapshot, writing only the rows which changed.
+
+        Args:
+            uuid (UUID): The unique identifier of the event.
+            snapshot (list[dict]): The children of the event, as parsed from JSON.
+            dry_run (bool): Only compute the diff, without writing anything.
+
+        Returns:
+            dict: The number of rows inserted, updated, deleted and unchanged per type.
+        """
+        return SnapshotSync(EventModel).run(uuid, snapshot, dry_run)
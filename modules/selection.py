@@ -2,46 +2,54 @@
 Defines the Selection class for business logic.
 
 This class implements the required methods for managing selections, such as upserting,
-deleting, and searching, using the database interface.
+deleting, getting, searching, exporting, counting, aggregating and explaining searches, using the storage
+backend (always the database for aggregations and explains).
 """
 
 from collections.abc import Sequence
+from typing import TextIO
 from uuid import UUID
 
 from models.selection import SelectionJSON, SelectionModel
+from utils.aggregation import Aggregator
 from utils.db import DB
+from utils.explain import PlanAnalyzer, PlanJSON
 from utils.helper import Helper
-from utils.interfaces import ModuleInterface
+from utils.interfaces import ModuleInterface, UpsertJSON
 
 
 class Selection(ModuleInterface):
     """
     A class for handling business logic related to selections.
 
-    This class provides methods to upsert, delete, and search for selections in the database.
+    This class provides methods to upsert, delete, get, search, export, count and aggregate selections in the database,
+    and to explain the query of a search.
     """
 
-    def upsert(self, uuid: UUID, data: dict[str, str | int | float | bool]) -> UUID:
+    def upsert(self, uuid: UUID, data: dict[str, str | int | float | bool], version: int | None = None) -> UpsertJSON:
         """
         Upserts (inserts or updates) a selection in the database.
 
         Args:
             uuid (UUID): The unique identifier of the selection.
             data (dict[str, str | int | float | bool]): The data to be upserted.
+            version (int | None): The version the selection is expected to have, None to write whatever its version.
 
         Returns:
-            UUID: The unique identifier of the upserted selection.
+            UpsertJSON: The unique identifier of the selection and whether it has been written, an identical payload
+                being skipped.
+
+        Raises:
+            VersionConflictError: If the selection does not have the expected version.
         """
-        model = DB.get_instance().get_upsert_data(SelectionModel(id=uuid), data)
+        values = self.get_storage().get_upsert_values(SelectionModel, data)
         if data.get("name", None):
-            model.slug = Helper.slugify(model.name)
+            values["slug"] = Helper.slugify(values["name"])
         if data.get("outcome", None):
-            model.outcome = model.outcome.upper()
+            values["outcome"] = values["outcome"].upper()
 
-        # Upsert data in DB
-        with DB.get_instance().get_session() as session:
-            session.merge(model)
-        return uuid
+        # Upsert data in the storage, only when it changes the stored row
+        return {"id": str(uuid), "written": self.get_storage().upsert(SelectionModel, uuid, values, version)}
 
     def delete(self, uuid: UUID) -> None:
         """
@@ -50,27 +58,110 @@ class Selection(ModuleInterface):
         Args:
             uuid (UUID): The unique identifier of the selection to delete.
         """
-        DB.get_instance().delete(SelectionModel, uuid)
+        self.get_storage().delete(SelectionModel, uuid)
+
+    def get_many(
+        self, ids: list[UUID], fields: list[str] | None = None, include_archived: bool = False
+    ) -> tuple[list[SelectionJSON], list[UUID]]:
+        """
+        Fetches selections by their UUIDs.
+
+        Args:
+            ids (list[UUID]): The unique identifiers of the selections to fetch.
+            fields (list[str] | None): The fields to return, all of them when None.
+            include_archived (bool): Whether the archived selections are fetched too.
 
-    def search(self, data: list[dict[str, str | int | float | bool]]) -> Sequence[SelectionJSON]:
+        Returns:
+            tuple[list[SelectionJSON], list[UUID]]: The selections found, in the order of the UUIDs,
+                and the UUIDs not found.
+        """
+        return self.get_storage().get_many(SelectionModel, "s", ids, fields, include_archived)
+
+    def search(
+        self,
+        data: list[dict[str, str | int | float | bool]],
+        fields: list[str] | None = None,
+        include_archived: bool = False,
+    ) -> Sequence[SelectionJSON]:
         """
         Searches for selections in the database based on criteria.
 
         Args:
             data (list[dict[str, str | int | float | bool]]): A list of search criteria.
+            fields (list[str] | None): The fields to return, all of them when None.
+            include_archived (bool): Whether the archived selections are searched too.
 
         Returns:
             Sequence[SelectionJSON]: A sequence of selection objects in JSON format.
         """
-        results = []
-        model_keys = SelectionModel.__table__.columns.keys()
-        with DB.get_instance().get_session() as session:
-            query = "SELECT DISTINCT s.* FROM selection s"
-            # Build the where query
-            where_query = DB.get_instance().build_where("s", model_keys, data)
-            # Apply the where
-            if where_query != "":
-                query += f" WHERE {where_query}"
-            results = session.execute(query).all()
-
-        return [SelectionModel.obj_to_json(res) for res in results]
+        return self.get_storage().search(SelectionModel, "s", data, fields, include_archived)
+
+    def export(
+        self,
+        data: list[dict[str, str | int | float | bool]],
+        output: TextIO,
+        fields: list[str] | None = None,
+        include_archived: bool = False,
+    ) -> int:
+        """
+        Writes the selections matching the criteria to an output buffer as JSON lines.
+
+        Args:
+            data (list[dict[str, str | int | float | bool]]): A list of search criteria.
+            output (TextIO): The buffer to write to.
+            fields (list[str] | None): The fields to write, all of them when None.
+            include_archived (bool): Whether the archived selections are written too.
+
+        Returns:
+            int: The number of selections written.
+        """
+        return self.get_storage().export(SelectionModel, "s", data, output, fields, include_archived)
+
+    def count(self, data: list[dict[str, str | int | float | bool]], approximate: bool = False) -> int:
+        """
+        Counts the selections matching the criteria.
+
+        Args:
+            data (list[dict[str, str | int | float | bool]]): A list of search criteria.
+            approximate (bool): Whether to return an estimate instead of an exact count.
+
+        Returns:
+            int: The number of selections.
+        """
+        return self.get_storage().count(SelectionModel, "s", data, approximate)
+
+    def aggregate(
+        self,
+        data: list[dict[str, str | int | float | bool]],
+        group_by: list[str],
+        metrics: list[tuple[str, str | None]],
+    ) -> list[dict]:
+        """
+        Computes grouped statistics over the selections matching the criteria.
+
+        Args:
+            data (list[dict[str, str | int | float | bool]]): A list of search criteria.
+            group_by (list[str]): Columns of the selection or ids of its ancestors.
+            metrics (list[tuple[str, str | None]]): The functions with their column, None for `count(*)`.
+
+        Returns:
+            list[dict]: One object per group, with the grouped values and the aggregates.
+        """
+        return Aggregator.aggregate(SelectionModel, "s", data, group_by, metrics)
+
+    def explain(
+        self, data: list[dict[str, str | int | float | bool]], analyze: bool = False, fields: list[str] | None = None
+    ) -> PlanJSON:
+        """
+        Explains the query run by a search for selections.
+
+        Args:
+            data (list[dict[str, str | int | float | bool]]): A list of search criteria.
+            analyze (bool): Whether to execute the query to get actual rows and timings.
+            fields (list[str] | None): The fields selected by the search, all of them when None.
+
+        Returns:
+            PlanJSON: The plan of the query with its findings and index suggestions.
+        """
+        query = DB.get_instance().build_search_query(SelectionModel, "s", data, fields)
+        return PlanAnalyzer.analyze(SelectionModel, query, data, analyze, fields)
@@ -2,44 +2,54 @@
 Defines the Sport class for business logic.
 
 This class implements the required methods for managing sports, such as upserting,
-deleting, and searching, using the database interface.
+deleting, getting, searching, exporting, counting, aggregating and explaining searches,
+and syncing snapshots of their children, using the storage backend (always the database for
+aggregations, explains and syncs).
 """
 
 from collections.abc import Sequence
+from typing import TextIO
 from uuid import UUID
 
 from models.sport import SportJSON, SportModel
+from utils.aggregation import Aggregator
 from utils.db import DB
+from utils.explain import PlanAnalyzer, PlanJSON
 from utils.helper import Helper
-from utils.interfaces import ModuleInterface
+from utils.interfaces import ModuleInterface, UpsertJSON
+from utils.sync import SnapshotSync
 
 
 class Sport(ModuleInterface):
     """
     A class for handling business logic related to sports.
 
-    This class provides methods to upsert, delete, and search for sports in the database.
+    This class provides methods to upsert, delete, get, search, export, count and aggregate sports in the database,
+    and to explain the query of a search and sync the events, markets and selections of a sport with a snapshot.
     """
 
-    def upsert(self, uuid: UUID, data: dict[str, str | int | float | bool]) -> UUID:
+    def upsert(self, uuid: UUID, data: dict[str, str | int | float | bool], version: int | None = None) -> UpsertJSON:
         """
         Upserts (inserts or updates) a sport in the database.
 
         Args:
             uuid (UUID): The unique identifier of the sport.
             data (dict[str, str | int | float | bool]): The data to be upserted.
+            version (int | None): The version the sport is expected to have, None to write whatever its version.
 
         Returns:
-            UUID: The unique identifier of the upserted sport.
+            UpsertJSON: The unique identifier of the sport and whether it has been written, an identical payload
+                being skipped.
+
+        Raises:
+            VersionConflictError: If the sport does not have the expected version.
         """
-        model = DB.get_instance().get_upsert_data(SportModel(id=uuid), data)
+        values = self.get_storage().get_upsert_values(SportModel, data)
         if data.get("name", None) is not None:
-            model.slug = Helper.slugify(model.name)
+            values["slug"] = Helper.slugify(values["name"])
 
-        # Upsert data in DB
-        with DB.get_instance().get_session() as session:
-            session.merge(model)
-        return uuid
+        # Upsert data in the storage, only when it changes the stored row
+        return {"id": str(uuid), "written": self.get_storage().upsert(SportModel, uuid, values, version)}
 
     def delete(self, uuid: UUID) -> None:
         """
@@ -48,27 +58,123 @@ class Sport(ModuleInterface):
         Args:
             uuid (UUID): The unique identifier of the sport to delete.
         """
-        DB.get_instance().delete(SportModel, uuid)
+        self.get_storage().delete(SportModel, uuid)
+
+    def get_many(
+        self, ids: list[UUID], fields: list[str] | None = None, include_archived: bool = False
+    ) -> tuple[list[SportJSON], list[UUID]]:
+        """
+        Fetches sports by their UUIDs.
 
-    def search(self, data: list[dict[str, str | int | float | bool]]) -> Sequence[SportJSON]:
+        Args:
+            ids (list[UUID]): The unique identifiers of the sports to fetch.
+            fields (list[str] | None): The fields to return, all of them when None.
+            include_archived (bool): Ignored, sports are never archived.
+
+        Returns:
+            tuple[list[SportJSON], list[UUID]]: The sports found, in the order of the UUIDs, and the UUIDs not found.
+        """
+        return self.get_storage().get_many(SportModel, "s", ids, fields, include_archived)
+
+    def search(
+        self,
+        data: list[dict[str, str | int | float | bool]],
+        fields: list[str] | None = None,
+        include_archived: bool = False,
+    ) -> Sequence[SportJSON]:
         """
         Searches for sports in the database based on criteria.
 
         Args:
             data (list[dict[str, str | int | float | bool]]): A list of search criteria.
+            fields (list[str] | None): The fields to return, all of them when None.
+            include_archived (bool): Ignored, sports are never archived.
 
         Returns:
             Sequence[SportJSON]: A sequence of sport objects in JSON format.
         """
-        results = []
-        model_keys = SportModel.__table__.columns.keys()
-        with DB.get_instance().get_session() as session:
-            query = "SELECT DISTINCT s.* FROM sport s"
-            # Build the where query
-            where_query = DB.get_instance().build_where("s", model_keys, data)
-            # Apply the where
-            if where_query != "":
-                query += f" WHERE {where_query}"
-            results = session.execute(query).all()
-
-        return [SportModel.obj_to_json(res) for res in results]
+        return self.get_storage().search(SportModel, "s", data, fields, include_archived)
+
+    def export(
+        self,
+        data: list[dict[str, str | int | float | bool]],
+        output: TextIO,
+        fields: list[str] | None = None,
+        include_archived: bool = False,
+    ) -> int:
+        """
+        Writes the sports matching the criteria to an output buffer as JSON lines.
+
+        Args:
+            data (list[dict[str, str | int | float | bool]]): A list of search criteria.
+            output (TextIO): The buffer to write to.
+            fields (list[str] | None): The fields to write, all of them when None.
+            include_archived (bool): Ignored, sports are never archived.
+
+        Returns:
+            int: The number of sports written.
+        """
+        return self.get_storage().export(SportModel, "s", data, output, fields, include_archived)
+
+    def count(self, data: list[dict[str, str | int | float | bool]], approximate: bool = False) -> int:
+        """
+        Counts the sports matching the criteria.
+
+        Args:
+            data (list[dict[str, str | int | float | bool]]): A list of search criteria.
+            approximate (bool): Whether to return an estimate instead of an exact count.
+
+        Returns:
+            int: The number of sports.
+        """
+        return self.get_storage().count(SportModel, "s", data, approximate)
+
+    def aggregate(
+        self,
+        data: list[dict[str, str | int | float | bool]],
+        group_by: list[str],
+        metrics: list[tuple[str, str | None]],
+    ) -> list[dict]:
+        """
+        Computes grouped statistics over the sports matching the criteria.
+
+        Args:
+            data (list[dict[str, str | int | float | bool]]): A list of search criteria.
+            group_by (list[str]): Columns of the sport or ids of its ancestors.
+            metrics (list[tuple[str, str | None]]): The functions with their column, None for `count(*)`.
+
+        Returns:
+            list[dict]: One object per group, with the grouped values and the aggregates.
+        """
+        return Aggregator.aggregate(SportModel, "s", data, group_by, metrics)
+
+    def explain(
+        self, data: list[dict[str, str | int | float | bool]], analyze: bool = False, fields: list[str] | None = None
+    ) -> PlanJSON:
+        """
+        Explains the query run by a search for sports.
+
+        Args:
+            data (list[dict[str, str | int | float | bool]]): A list of search criteria.
+            analyze (bool): Whether to execute the query to get actual rows and timings.
+            fields (list[str] | None): The fields selected by the search, all of them when None.
+
+        Returns:
+            PlanJSON: The plan of the query with its findings and index suggestions.
+        """
+        query = DB.get_instance().build_search_query(SportModel, "s", data, fields)
+        return PlanAnalyzer.analyze(SportModel, query, data, analyze, fields)
+
+    def sync(self, uuid: UUID, snapshot: list[dict], dry_run: bool = False) -> dict:
+        """
+        Syncs the events, markets and selections of a sport with a snapshot, writing only the rows which changed.
+
+        Args:
+            uuid (UUID): The unique identifier of the sport.
+            snapshot (list[dict]): The children of the sport, as parsed from JSON.
+            dry_run (bool): Only compute the diff, without writing anything.
+
+        Returns:
+            dict: The number of rows inserted, updated, deleted and unchanged per type.
+        """
+        return SnapshotSync(SportModel).run(uuid, snapshot, dry_run)
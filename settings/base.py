@@ -15,4 +15,36 @@ DATABASE = {
     "URI": os.environ.get("POSTGRESQL_ADDON_URI", ""),
 }
 
+REPLICAS = {
+    "URIS": os.environ.get("POSTGRESQL_REPLICA_URIS", ""),
+    "RETRY_AFTER_SECONDS": os.environ.get("REPLICA_RETRY_AFTER_SECONDS", 30),
+}
+
+SHARDS = {
+    "URIS": os.environ.get("POSTGRESQL_SHARD_URIS", ""),
+    "CACHE_SIZE": os.environ.get("SHARD_CACHE_SIZE", 100_000),
+}
+
+SQL = {
+    "SLOW_QUERY_MS": os.environ.get("SQL_SLOW_QUERY_MS", 100),
+    "SLOW_QUERY_LOG": os.environ.get("SQL_SLOW_QUERY_LOG", ""),
+}
+
+PARTITIONS = {
+    "SELECTION": os.environ.get("SELECTION_PARTITIONS", 0),
+}
+
+IDS = {
+    "STRATEGY": os.environ.get("ID_STRATEGY", "uuid7"),
+}
+
+STORAGE = {
+    "BACKEND": os.environ.get("STORAGE_BACKEND", "postgresql"),
+}
+
+CONCURRENCY = {
+    "RETRIES": os.environ.get("OPTIMISTIC_RETRIES", 3),
+    "RETRY_BACKOFF_MS": os.environ.get("OPTIMISTIC_RETRY_BACKOFF_MS", 5),
+}
+
 ENV = os.environ.get("ENV", "local")
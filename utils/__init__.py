@@ -6,7 +6,7 @@ This module provides a shared SQLAlchemy declarative base for all models in the
 
 from sqlalchemy.orm import DeclarativeMeta
 
-from utils.db import DB
+from utils.db import BASE
 
 # Define the base model for all database models
-BaseModel: DeclarativeMeta = DB.get_instance().get_base()
+BaseModel: DeclarativeMeta = BASE
@@ -0,0 +1,258 @@
+"""
+Aggregation utility.
+
+Compiles grouped statistics (count, sum, min, max, avg) over the rows matching a search
+into a single SQL query, grouping by columns of the model or ids of its ancestors.
+"""
+
+from decimal import Decimal
+
+from sqlalchemy import Column, Table, text
+from sqlalchemy.orm import DeclarativeMeta
+from sqlalchemy.types import Integer, Numeric
+
+from .db import DB
+from .serializers import RowSerializer
+
+# Aggregate functions allowed, `count` is the only one which does not need a column
+FUNCTIONS = ["count", "sum", "min", "max", "avg"]
+
+
+class Aggregator:
+    """
+    A utility class to compute grouped statistics in the database.
+    """
+
+    @classmethod
+    def get_ancestors(cls, table: Table) -> list[tuple[Table, Column]]:
+        """
+        Lists the ancestors of a table by following its foreign keys.
+
+        Args:
+            table (Table): The table to start from.
+
+        Returns:
+            list[tuple[Table, Column]]: Each ancestor with the foreign key column referencing it, parents first.
+        """
+        ancestors = []
+        while len(table.foreign_keys) > 0:
+            foreign_key = next(iter(table.foreign_keys))
+            ancestors.append((foreign_key.column.table, foreign_key.parent))
+            table = foreign_key.column.table
+        return ancestors
+
+    @classmethod
+    def resolve_groups(cls, model: DeclarativeMeta, prefix: str, group_by: list[str]) -> tuple[list, list[str]]:
+        """
+        Resolves the columns to group by, joining the ancestors holding them.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model aggregated.
+            prefix (str): The table prefix.
+            group_by (list[str]): Columns of the model or ids of its ancestors (e.g. `sport_id` for a market).
+
+        Returns:
+            tuple[list, list[str]]: The grouped columns with their SQL expression, and the joins needed.
+
+        Raises:
+            ValueError: If a group is neither a column of the model nor the id of an ancestor.
+        """
+        columns = model.__table__.columns
+        ancestors = cls.get_ancestors(model.__table__)
+        groups, joins = [], []
+        for field in group_by:
+            if field in columns:
+                groups.append((field, columns[field], f'{prefix}."{field}"'))
+                continue
+            # The id of an ancestor is the foreign key held by the ancestor below it
+            depth = next((depth for depth, (_, key) in enumerate(ancestors) if key.name == field), None)
+            if depth is None:
+                ids = [key.name for _, key in ancestors]
+                raise ValueError(
+                    f"Unknown group {field} for {model.__tablename__}, "
+                    f"expected a column ({columns.keys()}) or an ancestor id ({ids})"
+                )
+            # Join the ancestors up to the one holding the foreign key
+            for level in range(len(joins), depth):
+                parent, key = ancestors[level]
+                alias = f"a{level + 1}"
+                child = prefix if level == 0 else f"a{level}"
+                joins.append(f'JOIN {parent.name} {alias} ON {alias}.id = {child}."{key.name}"')
+            owner = prefix if depth == 0 else f"a{depth}"
+            groups.append((field, ancestors[depth][1], f'{owner}."{field}"'))
+        return groups, joins
+
+    @classmethod
+    def resolve_metrics(cls, model: DeclarativeMeta, prefix: str, metrics: list[tuple[str, str | None]]) -> list:
+        """
+        Resolves the aggregates to compute.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model aggregated.
+            prefix (str): The table prefix.
+            metrics (list[tuple[str, str | None]]): The functions with their column, None for `count(*)`.
+
+        Returns:
+            list: The name of each aggregate with its SQL expression.
+
+        Raises:
+            ValueError: If a function is unknown or a column is not a numeric column of the model.
+        """
+        columns = model.__table__.columns
+        resolved = []
+        for function, field in metrics:
+            if function not in FUNCTIONS:
+                raise ValueError(f"Unknown function {function}, expected one of {FUNCTIONS}")
+            if field is None:
+                if function != "count":
+                    raise ValueError(f"The function {function} needs a column, e.g. {function}:price")
+                resolved.append(("count", "count(*)"))
+                continue
+            if field not in columns or isinstance(columns[field].type, (Integer, Numeric)) is False:
+                numerics = [column.name for column in columns if isinstance(column.type, (Integer, Numeric))]
+                raise ValueError(f"Invalid column {field} for {function}, expected one of {numerics}")
+            resolved.append((f"{function}_{field}", f'{function}({prefix}."{field}")'))
+        return resolved
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    @classmethod
+    def build_query(
+        cls,
+        model: DeclarativeMeta,
+        prefix: str,
+        data: list[dict[str, str | int | float | bool]],
+        group_by: list[str],
+        metrics: list[tuple[str, str | None]],
+    ) -> tuple[str, list]:
+        """
+        Compiles the grouped query of an aggregation.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model aggregated.
+            prefix (str): The table prefix.
+            data (list[dict]): The data to filter by, with the search syntax.
+            group_by (list[str]): Columns of the model or ids of its ancestors.
+            metrics (list[tuple[str, str | None]]): The functions with their column, None for `count(*)`.
+
+        Returns:
+            tuple[str, list]: The SQL query string and the grouped columns.
+        """
+        groups, joins = cls.resolve_groups(model, prefix, group_by)
+        aggregates = cls.resolve_metrics(model, prefix, metrics)
+        selected = [f'{expression} AS "{name}"' for name, _, expression in groups]
+        selected += [f'{expression} AS "{name}"' for name, expression in aggregates]
+        query = " ".join([f"SELECT {', '.join(selected)} FROM {model.__tablename__} {prefix}"] + joins)
+        # Build the where query
+        where_query = DB.get_instance().build_where(prefix, model.__table__.columns.keys(), data)
+        # Apply the where
+        if where_query != "":
+            query += f" WHERE {where_query}"
+        if len(groups) > 0:
+            positions = ", ".join(str(position) for position in range(1, len(groups) + 1))
+            query += f" GROUP BY {positions} ORDER BY {positions}"
+        return query, groups
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    @classmethod
+    def aggregate(
+        cls,
+        model: DeclarativeMeta,
+        prefix: str,
+        data: list[dict[str, str | int | float | bool]],
+        group_by: list[str],
+        metrics: list[tuple[str, str | None]],
+    ) -> list[dict]:
+        """
+        Computes grouped statistics over the rows matching the criteria.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model aggregated.
+            prefix (str): The table prefix.
+            data (list[dict]): The data to filter by, with the search syntax.
+            group_by (list[str]): Columns of the model or ids of its ancestors, none for a single total.
+            metrics (list[tuple[str, str | None]]): The functions with their column, None for `count(*)`.
+
+        Returns:
+            list[dict]: One object per group, with the grouped values and the aggregates.
+        """
+        if DB.get_instance().is_sharded():
+            return cls.aggregate_shards(model, prefix, data, group_by, metrics)
+        query, groups = cls.build_query(model, prefix, data, group_by, metrics)
+        conversions = [RowSerializer.get_conversion(column.type) for _, column, _ in groups]
+        with DB.get_instance().get_session(read_only=True) as session:
+            result = session.execute(text(query))
+            keys = list(result.keys())
+            rows = result.all()
+
+        results = []
+        for row in rows:
+            values = [
+                value if conversion is None or value is None else conversion(value)
+                for conversion, value in zip(conversions, row[: len(groups)])
+            ]
+            # Sums and averages of numeric columns are returned as Decimal
+            values += [float(value) if isinstance(value, Decimal) else value for value in row[len(groups) :]]
+            results.append(dict(zip(keys, values)))
+        return results
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    @classmethod
+    def aggregate_shards(
+        cls,
+        model: DeclarativeMeta,
+        prefix: str,
+        data: list[dict[str, str | int | float | bool]],
+        group_by: list[str],
+        metrics: list[tuple[str, str | None]],
+    ) -> list[dict]:
+        """
+        Computes grouped statistics on every shard concurrently and merges the groups.
+
+        Counts and sums are added up, minimums and maximums compared, and averages computed from
+        the sums and counts of their column, aggregated on the shards alongside.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model aggregated.
+            prefix (str): The table prefix.
+            data (list[dict]): The data to filter by, with the search syntax.
+            group_by (list[str]): Columns of the model or ids of its ancestors, none for a single total.
+            metrics (list[tuple[str, str | None]]): The functions with their column, None for `count(*)`.
+
+        Returns:
+            list[dict]: One object per group, with the grouped values and the aggregates, ordered by group.
+        """
+        names = [name for name, _ in cls.resolve_metrics(model, prefix, metrics)]
+        merged_metrics = [(function, field) for function, field in metrics if function != "avg"]
+        for function, field in metrics:
+            if function == "avg":
+                merged_metrics += [("sum", field), ("count", field)]
+        merged_metrics = list(dict.fromkeys(merged_metrics))
+        results = DB.get_instance().run_on_shards(lambda: cls.aggregate(model, prefix, data, group_by, merged_metrics))
+
+        groups: dict[tuple, dict] = {}
+        for result in (result for shard_results in results for result in shard_results):
+            key = tuple(result[field] for field in group_by)
+            if key not in groups:
+                groups[key] = result
+                continue
+            for name, value in result.items():
+                current = groups[key][name]
+                if name in group_by or value is None:
+                    continue
+                if current is None:
+                    groups[key][name] = value
+                elif name.startswith(("count", "sum")):
+                    groups[key][name] = current + value
+                else:
+                    groups[key][name] = min(current, value) if name.startswith("min") else max(current, value)
+
+        merged = []
+        # In the order of the query of a single database, nulls last
+        for key in sorted(groups, key=lambda key: tuple((value is None, value) for value in key)):
+            group = groups[key]
+            for function, field in metrics:
+                if function == "avg":
+                    count = group[f"count_{field}"]
+                    group[f"avg_{field}"] = group[f"sum_{field}"] / count if count else None
+            merged.append({name: group[name] for name in group_by + names})
+        return merged
@@ -0,0 +1,170 @@
+"""
+Archiving utility.
+
+Moves the ended events and their markets and selections from the hot tables to archive
+tables with the same columns, in batches committed one by one, so the searches, indexes
+and triggers of the hot tables only deal with the live data.
+"""
+
+import time
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from models.event import EventModel, EventStatus
+from models.market import MarketModel
+from models.selection import SelectionModel
+
+from .db import ARCHIVE_SUFFIX, DB
+
+
+class Archiver:
+    """
+    A class archiving the subtrees of ended events.
+
+    Each batch locks a set of events (skipping the ones locked by another archiver) and their
+    markets, then moves their selections, markets and themselves to the archive tables, in a
+    single transaction. An interrupted
+    run loses at most its current batch and is resumed by running it again.
+    """
+
+    def __init__(self, batch_size: int = 100):
+        """
+        Initializes the archiver.
+
+        Args:
+            batch_size (int): Number of events (with their subtree) moved per transaction.
+        """
+        self.batch_size = max(1, batch_size)
+
+    @classmethod
+    def get_cutoff(cls, days: float) -> datetime:
+        """
+        Computes the cutoff of an archiving run.
+
+        Args:
+            days (float): Number of days an event must have been left untouched since it ended.
+
+        Returns:
+            datetime: The events last updated before this date are archived.
+        """
+        return datetime.now(timezone.utc) - timedelta(days=days)
+
+    def lock_batch(self, session: Session, cutoff: datetime) -> list[UUID]:
+        """
+        Locks the next batch of events to archive.
+
+        Args:
+            session (Session): The session of the batch.
+            cutoff (datetime): The events last updated before this date are archived.
+
+        Returns:
+            list[UUID]: The ids of the events, empty when there is nothing left to archive.
+        """
+        rows = session.execute(
+            text(
+                "SELECT id FROM event WHERE status = :status AND updated_at < :cutoff "
+                "ORDER BY updated_at LIMIT :limit FOR UPDATE SKIP LOCKED"
+            ),
+            {"status": EventStatus.ENDED.name, "cutoff": cutoff, "limit": self.batch_size},
+        ).all()
+        return [row.id for row in rows]
+
+    @classmethod
+    def move_batch(cls, session: Session, ids: list[UUID]) -> dict[str, int]:
+        """
+        Moves the subtrees of a batch of events to the archive tables, leaves first.
+
+        The markets of the events are locked first: the foreign key check of a selection written
+        into one of them concurrently waits for the batch, then fails, so no selection is created
+        between the move of the selections and the one of their market. Each level is deleted and
+        copied by the same statement, so the rows copied are exactly the rows deleted.
+
+        Args:
+            session (Session): The session of the batch.
+            ids (list[UUID]): The ids of the events.
+
+        Returns:
+            dict[str, int]: The number of rows moved per type.
+        """
+        ids_param = bindparam("ids", type_=ARRAY(EventModel.__table__.columns["id"].type))
+        session.execute(
+            text("SELECT 1 FROM market WHERE event_id = ANY(:ids) FOR UPDATE").bindparams(ids_param), {"ids": ids}
+        )
+        sources = {
+            "selection": (SelectionModel, "USING market m WHERE m.id = t.market_id AND m.event_id = ANY(:ids)"),
+            "market": (MarketModel, "WHERE t.event_id = ANY(:ids)"),
+            "event": (EventModel, "WHERE t.id = ANY(:ids)"),
+        }
+        moved = {}
+        for name, (model, condition) in sources.items():
+            columns = ", ".join(f'"{column}"' for column in model.__table__.columns.keys())
+            query = text(
+                f"WITH moved AS (DELETE FROM {name} t {condition} RETURNING t.*) "
+                f"INSERT INTO {name}{ARCHIVE_SUFFIX} ({columns}) SELECT {columns} FROM moved"
+            ).bindparams(ids_param)
+            moved[name] = session.execute(query, {"ids": ids}).rowcount
+        return moved
+
+    @classmethod
+    def count(cls, cutoff: datetime) -> dict[str, int]:
+        """
+        Counts the rows an archiving run would move.
+
+        Args:
+            cutoff (datetime): The events last updated before this date are archived.
+
+        Returns:
+            dict[str, int]: The number of rows per type.
+        """
+        with DB.get_instance().get_session() as session:
+            row = session.execute(
+                text(
+                    "SELECT count(DISTINCT e.id) AS event, count(DISTINCT m.id) AS market, count(s.id) AS selection "
+                    "FROM event e LEFT JOIN market m ON m.event_id = e.id LEFT JOIN selection s ON s.market_id = m.id "
+                    "WHERE e.status = :status AND e.updated_at < :cutoff"
+                ),
+                {"status": EventStatus.ENDED.name, "cutoff": cutoff},
+            ).one()
+        return {"selection": row.selection, "market": row.market, "event": row.event}
+
+    def run(self, days: float, max_batches: int = 0, dry_run: bool = False) -> dict:
+        """
+        Archives the events ended and left untouched for a number of days, batch by batch (the shards concurrently).
+
+        Args:
+            days (float): Number of days an event must have been left untouched since it ended.
+            max_batches (int): Number of batches after which the run stops, 0 to archive everything.
+            dry_run (bool): Only count the rows which would be moved.
+
+        Returns:
+            dict: The report with the cutoff, the number of batches and of rows moved per type, and the elapsed time.
+        """
+        if DB.get_instance().is_sharded():
+            reports = DB.get_instance().run_on_shards(lambda: self.run(days, max_batches, dry_run))
+            return reports[0] | {
+                "batches": sum(report["batches"] for report in reports),
+                "rows": {name: sum(report["rows"][name] for report in reports) for name in reports[0]["rows"]},
+                "elapsed": max(report["elapsed"] for report in reports),
+            }
+        started_at = time.perf_counter()
+        cutoff = self.get_cutoff(days)
+        report: dict = {"cutoff": cutoff.isoformat(), "dry_run": dry_run, "batches": 0}
+        if dry_run:
+            report["rows"] = self.count(cutoff)
+        else:
+            report["rows"] = {"selection": 0, "market": 0, "event": 0}
+            while max_batches <= 0 or report["batches"] < max_batches:
+                # One transaction per batch, committed before the next one is locked
+                with DB.get_instance().get_session() as session:
+                    ids = self.lock_batch(session, cutoff)
+                    if len(ids) == 0:
+                        break
+                    for name, count in self.move_batch(session, ids).items():
+                        report["rows"][name] += count
+                report["batches"] += 1
+        report["elapsed"] = round(time.perf_counter() - started_at, 3)
+        return report
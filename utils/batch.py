@@ -0,0 +1,283 @@
+"""
+Batch execution utility.
+
+Runs a file of create, update and delete commands (JSON lines) through the `modules` API,
+optionally on a thread pool, keeping the commands of a same resource in order.
+"""
+
+import importlib
+import json
+import time
+from argparse import ArgumentTypeError
+from concurrent.futures import ThreadPoolExecutor
+from uuid import UUID
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from models.event import EventModel
+from models.market import MarketModel
+from models.selection import SelectionModel
+from models.sport import SportModel
+
+from .helper import Helper
+from .interfaces import ModuleInterface
+from .parsers import TypeParser
+
+COMMANDS = ["create", "update", "delete"]
+# Models of the types, parents first
+MODELS = {"sport": SportModel, "event": EventModel, "market": MarketModel, "selection": SelectionModel}
+# Column holding the id of the parent of each type
+PARENT_COLUMNS = {"event": "sport_id", "market": "event_id", "selection": "market_id"}
+# Columns of a snapshot maintained by the storage, not written back by a reset
+TIMESTAMP_COLUMNS = ["created_at", "updated_at"]
+# Number of failures detailed in a report
+MAX_FAILURES = 10
+
+
+class BatchRunner:
+    """
+    A class running a batch of commands on a pool of worker threads.
+
+    Commands are partitioned by resource id, each partition being run in order by a single
+    worker, so the updates of a same resource stay sequential; the resources of a parent written
+    by the batch follow it in its partition. Each command opens its own
+    session (`DB.get_session`) on the worker thread running it.
+    """
+
+    def __init__(self, workers: int = 1):
+        """
+        Initializes the runner.
+
+        Args:
+            workers (int): Number of worker threads.
+        """
+        self.workers = max(1, workers)
+
+    @classmethod
+    def load(cls, path: str) -> list[dict]:
+        """
+        Loads and validates a batch file.
+
+        Each line is a JSON object with a `command` (create, update or delete), a `type`, an `id`
+        (optional for create, a new one being generated), the `data` of create and update and
+        optionally the `version` an update expects.
+
+        Args:
+            path (str): The path of the batch file.
+
+        Returns:
+            list[dict]: The commands, with their line number and resource id.
+
+        Raises:
+            ValueError: If the file cannot be read or a line is not a valid command.
+        """
+        try:
+            with open(path, encoding="utf-8") as file:
+                lines = file.readlines()
+        except (OSError, UnicodeDecodeError) as error:
+            raise ValueError(f"Cannot read the batch file {path}: {error}") from error
+
+        commands = []
+        for line_number, line in enumerate(lines, start=1):
+            if line.strip() == "":
+                continue
+            try:
+                command = json.loads(line)
+                if command.get("command") not in COMMANDS:
+                    raise ValueError(f"unknown command {command.get('command')}, expected one of {COMMANDS}")
+                TypeParser.check_type(command.get("type"))
+                if command.get("id") is None and command["command"] != "create":
+                    raise ValueError(f"an id is needed to {command['command']}")
+                if isinstance(command.get("data", {}), dict) is False:
+                    raise ValueError("the data must be an object")
+                # The id of a creation is generated now, so the commands which follow can target it
+                command["id"] = UUID(str(command.get("id") or Helper.new_id()))
+                command["line"] = line_number
+                commands.append(command)
+            except (ValueError, TypeError, AttributeError, ArgumentTypeError) as error:
+                raise ValueError(f"Invalid command line {line_number}: {error}") from error
+        return commands
+
+    @staticmethod
+    def run_command(command: dict) -> bool:
+        """
+        Runs a single command through the `modules` API.
+
+        Args:
+            command (dict): The command, as returned by `load`.
+
+        Returns:
+            bool: Whether the command wrote anything, an upsert of identical data being skipped.
+        """
+        module = getattr(importlib.import_module("modules"), command["type"].capitalize())()
+        if command["command"] == "delete":
+            module.delete(command["id"])
+            return True
+        return module.upsert(command["id"], command.get("data", {}), command.get("version"))["written"]
+
+    @staticmethod
+    def run_partition(commands: list[dict]) -> tuple[int, list[dict]]:
+        """
+        Runs the commands of a partition in order.
+
+        Args:
+            commands (list[dict]): The commands of the partition.
+
+        Returns:
+            tuple[int, list[dict]]: The number of commands which wrote, and the failures with the line number
+                and the error of the command.
+        """
+        written, failures = 0, []
+        for command in commands:
+            try:
+                written += BatchRunner.run_command(command)
+            except (SQLAlchemyError, ValueError, AttributeError) as error:
+                failures.append({"line": command["line"], "error": str(error).split("\n", maxsplit=1)[0]})
+        return written, failures
+
+    def partition(self, commands: list[dict]) -> list[list[dict]]:
+        """
+        Splits the commands by resource, one partition per worker.
+
+        A resource whose parent is targeted by the batch too (e.g. created by it) goes to the
+        partition of its parent, so a child is never written before its parent, or after its
+        deletion, by another worker: the result of a batch does not depend on the number of workers.
+
+        Args:
+            commands (list[dict]): The commands.
+
+        Returns:
+            list[list[dict]]: The partitions, each one keeping the order of its commands.
+        """
+        # Union-find of the resources of the batch with their parents of the batch
+        groups: dict[UUID, UUID] = {command["id"]: command["id"] for command in commands}
+
+        def find(uuid: UUID) -> UUID:
+            while groups[uuid] != uuid:
+                groups[uuid] = groups[groups[uuid]]
+                uuid = groups[uuid]
+            return uuid
+
+        for command in commands:
+            parent = (command.get("data") or {}).get(PARENT_COLUMNS.get(command["type"], ""))
+            try:
+                parent_id = UUID(str(parent))
+            except ValueError:
+                continue
+            if parent_id in groups:
+                groups[find(command["id"])] = find(parent_id)
+
+        partitions: list[list[dict]] = [[] for _ in range(self.workers)]
+        for command in commands:
+            partitions[find(command["id"]).int % self.workers].append(command)
+        return [partition for partition in partitions if len(partition) > 0]
+
+    def run(self, commands: list[dict]) -> dict:
+        """
+        Runs the commands.
+
+        Args:
+            commands (list[dict]): The commands, as returned by `load`.
+
+        Returns:
+            dict: The report with the number of commands, of commands which wrote (`written`) and of failures,
+                elapsed time and throughput.
+        """
+        started_at = time.perf_counter()
+        if self.workers == 1:
+            written, failures = self.run_partition(commands)
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="batch") as executor:
+                results = list(executor.map(self.run_partition, self.partition(commands)))
+                written = sum(count for count, _ in results)
+                failures = sorted((failure for _, result in results for failure in result), key=lambda f: f["line"])
+        elapsed = time.perf_counter() - started_at
+
+        return {
+            "workers": self.workers,
+            "commands": len(commands),
+            "written": written,
+            "errors": len(failures),
+            "failures": failures[:MAX_FAILURES],
+            "elapsed": round(elapsed, 3),
+            "throughput": round(len(commands) / max(elapsed, 1e-9), 1),
+        }
+
+    @classmethod
+    def snapshot(cls, commands: list[dict]) -> dict[str, dict[UUID, dict | None]]:
+        """
+        Reads the resources targeted by the commands, so they can be reset to their current state.
+
+        Args:
+            commands (list[dict]): The commands, as returned by `load`.
+
+        Returns:
+            dict[str, dict[UUID, dict | None]]: The stored data of each resource by type and id, None for the
+                resources which do not exist yet.
+        """
+        snapshot = {}
+        for arg_type, model in MODELS.items():
+            ids = list(dict.fromkeys(command["id"] for command in commands if command["type"] == arg_type))
+            found, _ = ModuleInterface.get_storage().get_many(model, arg_type[0], ids) if ids else ([], [])
+            stored = {UUID(obj["id"]): obj for obj in found}
+            snapshot[arg_type] = {uuid: stored.get(uuid) for uuid in ids}
+        return snapshot
+
+    @classmethod
+    def reset(cls, snapshot: dict[str, dict[UUID, dict | None]]) -> None:
+        """
+        Puts the resources of a snapshot back in their state, straight through the storage.
+
+        The resources which did not exist are deleted, then the others are written back as they
+        were (slug included), parents first. The descendants deleted along with a resource are
+        not restored unless the snapshot has them too.
+
+        Args:
+            snapshot (dict[str, dict[UUID, dict | None]]): The snapshot, as returned by `snapshot`.
+        """
+        storage = ModuleInterface.get_storage()
+        for arg_type, model in MODELS.items():
+            for uuid, data in snapshot[arg_type].items():
+                if data is None:
+                    storage.delete(model, uuid)
+        for arg_type, model in MODELS.items():
+            for uuid, data in snapshot[arg_type].items():
+                if data is not None:
+                    values = storage.get_upsert_values(model, data)
+                    storage.upsert(model, uuid, {key: values[key] for key in values if key not in TIMESTAMP_COLUMNS})
+
+    def scale(self, commands: list[dict]) -> list[dict]:
+        """
+        Runs the commands with 1, 2, 4... up to the configured number of workers.
+
+        The resources of the batch are reset before each run to their state before the first one,
+        so every run does the same work: the creations insert, the updates change the rows and the
+        deletes find them, instead of being skipped after the first run. The versions expected by
+        the commands are not checked, a reset writing new versions.
+
+        Args:
+            commands (list[dict]): The commands, as returned by `load`.
+
+        Returns:
+            list[dict]: The report of each run, with its speedup over a single worker and the number of resources
+                reset before it (`reset`).
+        """
+        counts = []
+        workers = 1
+        while workers < self.workers:
+            counts.append(workers)
+            workers *= 2
+        counts.append(self.workers)
+
+        commands = [{key: value for key, value in command.items() if key != "version"} for command in commands]
+        snapshot = self.snapshot(commands)
+        resources = sum(len(resources) for resources in snapshot.values())
+        reports = []
+        for workers in counts:
+            self.reset(snapshot)
+            report = BatchRunner(workers).run(commands)
+            report["reset"] = resources
+            baseline = reports[0]["throughput"] if len(reports) > 0 else report["throughput"]
+            report["speedup"] = round(report["throughput"] / max(baseline, 1e-9), 2)
+            reports.append(report)
+        return reports
@@ -0,0 +1,202 @@
+"""
+Event book utility.
+
+Maintains and reads the `event_book` table, a read model holding per event the nested
+document of the event with its active markets (in their order) and their active selections,
+so the front end reads a single row instead of joining the four tables.
+"""
+
+import time
+from uuid import UUID
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import BindParameter
+
+from models.event import EventModel
+
+from .db import DB
+
+# Document of an active event, None for an inactive one
+DOCUMENT_QUERY = """
+CASE WHEN e.is_active THEN jsonb_build_object(
+    'id', e.id, 'sport_id', e.sport_id, 'name', e.name, 'display_name', e.display_name, 'slug', e.slug,
+    'type', e.type, 'status', e.status, 'version', e.version, 'updated_at', e.updated_at,
+    'markets', COALESCE((
+        SELECT jsonb_agg(jsonb_build_object(
+            'id', m.id, 'name', m.name, 'display_name', m.display_name, 'slug', m.slug, 'order', m."order",
+            'schema', m.schema, 'columns', m.columns, 'version', m.version,
+            'selections', COALESCE((
+                SELECT jsonb_agg(jsonb_build_object(
+                    'id', s.id, 'name', s.name, 'display_name', s.display_name, 'slug', s.slug, 'price', s.price,
+                    'outcome', s.outcome, 'version', s.version
+                ) ORDER BY s.created_at, s.id)
+                FROM selection s WHERE s.market_id = m.id AND s.is_active
+            ), '[]'::jsonb)
+        ) ORDER BY m."order", m.id)
+        FROM market m WHERE m.event_id = e.id AND m.is_active
+    ), '[]'::jsonb)
+) END
+"""
+
+
+class EventBook:
+    """
+    A class refreshing and reading the event book.
+
+    The triggers of `init_db.py` flag the events whose event, markets or selections changed, by appending
+    them to `event_book_queue`. A read rebuilds the documents of the flagged events it asks for, and
+    `refresh_dirty` rebuilds the flagged ones in batches, so the documents are only rebuilt for the touched
+    events. An event is flagged while it has rows in the queue or its document was never built.
+    """
+
+    @classmethod
+    def get_ids_param(cls) -> BindParameter:
+        """
+        Builds the bind parameter of a list of event ids.
+
+        Returns:
+            BindParameter: The `ids` parameter, typed as an array of UUIDs.
+        """
+        return bindparam("ids", type_=ARRAY(EventModel.__table__.columns["id"].type))
+
+    @classmethod
+    def refresh(cls, session: Session, ids: list[UUID]) -> int:
+        """
+        Rebuilds the documents of events.
+
+        The rows of the events are locked, then their flags are consumed before their documents are built,
+        each by a statement of its own: a write committed before the consumption is in the document, and the
+        flag of a write committed afterwards stays in the queue, so the event is rebuilt again.
+
+        Args:
+            session (Session): The session, committed by the caller.
+            ids (list[UUID]): The ids of the events.
+
+        Returns:
+            int: The number of documents rebuilt, the events which do not exist being skipped.
+        """
+        session.execute(
+            text(
+                "INSERT INTO event_book (event_id) SELECT id FROM event WHERE id = ANY(:ids) "
+                "ON CONFLICT (event_id) DO NOTHING"
+            ).bindparams(cls.get_ids_param()),
+            {"ids": ids},
+        )
+        session.execute(
+            text("SELECT 1 FROM event_book WHERE event_id = ANY(:ids) ORDER BY event_id FOR UPDATE").bindparams(
+                cls.get_ids_param()
+            ),
+            {"ids": ids},
+        )
+        session.execute(
+            text("DELETE FROM event_book_queue WHERE event_id = ANY(:ids)").bindparams(cls.get_ids_param()),
+            {"ids": ids},
+        )
+        return session.execute(
+            text(
+                "UPDATE event_book b SET document = d.document, refreshed_at = now() "
+                f"FROM (SELECT e.id, {DOCUMENT_QUERY} AS document FROM event e WHERE e.id = ANY(:ids)) d "
+                "WHERE b.event_id = d.id"
+            ).bindparams(cls.get_ids_param()),
+            {"ids": ids},
+        ).rowcount
+
+    @classmethod
+    def get_many(cls, ids: list[UUID]) -> tuple[list[dict], list[UUID], list[UUID]]:
+        """
+        Reads the documents of events, rebuilding the flagged ones first.
+
+        Args:
+            ids (list[UUID]): The ids of the events.
+
+        Returns:
+            tuple[list[dict], list[UUID], list[UUID]]: The documents of the active events, in the order of the ids,
+                the ids of the inactive events and the ids not found.
+        """
+        if DB.get_instance().is_sharded():
+            # Each shard returns the events it holds, the others being missing there
+            results = DB.get_instance().run_on_shards(lambda: cls.get_many(ids))
+            found = {document["id"]: document for documents, _, _ in results for document in documents}
+            inactive = {uuid for _, shard_inactive, _ in results for uuid in shard_inactive}
+            return (
+                [found[str(uuid)] for uuid in ids if str(uuid) in found],
+                [uuid for uuid in ids if uuid in inactive],
+                [uuid for uuid in ids if str(uuid) not in found and uuid not in inactive],
+            )
+        query = text(
+            "SELECT b.event_id, b.document, b.refreshed_at IS NULL OR EXISTS ("
+            "SELECT 1 FROM event_book_queue q WHERE q.event_id = b.event_id) AS is_dirty "
+            "FROM event_book b WHERE b.event_id = ANY(:ids)"
+        ).bindparams(cls.get_ids_param())
+        with DB.get_instance().get_session() as session:
+            rows = {row.event_id: row for row in session.execute(query, {"ids": ids})}
+            # The events without a row (flagged, or loaded with the triggers disabled) are rebuilt too
+            stale = [uuid for uuid in ids if uuid not in rows or rows[uuid].is_dirty]
+            if len(stale) > 0:
+                cls.refresh(session, stale)
+                rows = {row.event_id: row for row in session.execute(query, {"ids": ids})}
+
+        documents, inactive, missing = [], [], []
+        for uuid in ids:
+            if uuid not in rows:
+                missing.append(uuid)
+            elif rows[uuid].document is None:
+                inactive.append(uuid)
+            else:
+                documents.append(rows[uuid].document)
+        return documents, inactive, missing
+
+    @classmethod
+    def refresh_dirty(cls, batch_size: int = 500, max_batches: int = 0) -> dict:
+        """
+        Rebuilds the documents of the flagged events, batch by batch (the shards concurrently).
+
+        The flags of the deleted events are dropped and the flagged events get a row first, then each batch
+        locks flagged rows (skipping the ones locked by another refresh) and rebuilds them in a single transaction.
+
+        Args:
+            batch_size (int): Number of events rebuilt per transaction.
+            max_batches (int): Number of batches after which the refresh stops, 0 to refresh everything.
+
+        Returns:
+            dict: The report with the number of batches and of documents rebuilt, and the elapsed time.
+        """
+        if DB.get_instance().is_sharded():
+            reports = DB.get_instance().run_on_shards(lambda: cls.refresh_dirty(batch_size, max_batches))
+            return {key: sum(report[key] for report in reports) for key in ["batches", "refreshed"]} | {
+                "elapsed": max(report["elapsed"] for report in reports)
+            }
+        started_at = time.perf_counter()
+        report: dict = {"batches": 0, "refreshed": 0}
+        with DB.get_instance().get_session() as session:
+            session.execute(
+                text("DELETE FROM event_book_queue q WHERE NOT EXISTS (SELECT 1 FROM event e WHERE e.id = q.event_id)")
+            )
+            session.execute(
+                text(
+                    "INSERT INTO event_book (event_id) SELECT DISTINCT event_id FROM event_book_queue "
+                    "ON CONFLICT (event_id) DO NOTHING"
+                )
+            )
+        while max_batches <= 0 or report["batches"] < max_batches:
+            with DB.get_instance().get_session() as session:
+                ids = (
+                    session.execute(
+                        text(
+                            "SELECT b.event_id FROM event_book b WHERE b.refreshed_at IS NULL OR EXISTS ("
+                            "SELECT 1 FROM event_book_queue q WHERE q.event_id = b.event_id) "
+                            "ORDER BY b.event_id LIMIT :limit FOR UPDATE OF b SKIP LOCKED"
+                        ),
+                        {"limit": max(1, batch_size)},
+                    )
+                    .scalars()
+                    .all()
+                )
+                if len(ids) == 0:
+                    break
+                report["refreshed"] += cls.refresh(session, list(ids))
+            report["batches"] += 1
+        report["elapsed"] = round(time.perf_counter() - started_at, 3)
+        return report
@@ -0,0 +1,151 @@
+"""
+Subtree deletion utility.
+
+Deletes a resource with its descendants leaves first, in bounded batches committed one by
+one, instead of a single cascading `DELETE` holding its locks and WAL until the whole
+subtree is gone.
+"""
+
+import time
+from typing import TextIO
+from uuid import UUID
+
+from sqlalchemy import text
+
+from .db import DB, ShardRouter
+from .importer import LEVELS
+
+
+class SubtreeDeleter:
+    """
+    A class deleting the subtree of a resource in batches.
+
+    The descendants are deleted level by level, selections first, each batch being a short
+    transaction of its own, optionally followed by a pause leaving room to the live traffic.
+    As the progress is the database state itself, an interrupted deletion is resumed by
+    running it again. The root is deleted once it has no descendants left.
+    """
+
+    def __init__(self, batch_size: int = 1000, pause: float = 0.0, progress: TextIO | None = None):
+        """
+        Initializes the deleter.
+
+        Args:
+            batch_size (int): Number of rows deleted per transaction.
+            pause (float): Seconds to wait after each batch.
+            progress (TextIO | None): The buffer to write a progress line to after each batch, None for none.
+        """
+        self.batch_size = max(1, batch_size)
+        self.pause = max(0.0, pause)
+        self.progress = progress
+
+    @classmethod
+    def get_level(cls, arg_type: str) -> int:
+        """
+        Finds the level of a type in the hierarchy.
+
+        Args:
+            arg_type (str): The type.
+
+        Returns:
+            int: The index of the type in the levels, 0 for sports.
+        """
+        return next(index for index, (name, _, _) in enumerate(LEVELS) if name == arg_type)
+
+    @classmethod
+    def build_batch_query(cls, arg_type: str, depth: int) -> str:
+        """
+        Builds the query deleting a batch of descendants of a root at a given depth below it.
+
+        The descendants are found by joining their ancestors up to the child of the root, each
+        join following the index of a foreign key.
+
+        Args:
+            arg_type (str): The type of the root.
+            depth (int): The depth of the descendants, 1 for the children of the root.
+
+        Returns:
+            str: The SQL query, deleting at most `:limit` rows under `:root`.
+        """
+        root = cls.get_level(arg_type)
+        name, _, _ = LEVELS[root + depth]
+        joins = []
+        for level in range(depth, 1, -1):
+            parent, _, _ = LEVELS[root + level - 1]
+            _, _, parent_key = LEVELS[root + level]
+            joins.append(f'JOIN {parent} a{level - 1} ON a{level - 1}.id = a{level}."{parent_key}"')
+        _, _, root_key = LEVELS[root + 1]
+        return (
+            f"DELETE FROM {name} WHERE id IN (SELECT a{depth}.id FROM {name} a{depth} {' '.join(joins)} "
+            f'WHERE a1."{root_key}" = :root LIMIT :limit)'
+        )
+
+    def run(self, arg_type: str, uuid: UUID, max_batches: int = 0) -> dict:
+        """
+        Deletes a resource and its subtree, leaves first, on the shard of the resource.
+
+        Args:
+            arg_type (str): The type of the resource.
+            uuid (UUID): The unique identifier of the resource.
+            max_batches (int): Number of batches after which the deletion stops, 0 to delete everything.
+
+        Returns:
+            dict: The report with the rows deleted per type, the number of batches, whether the deletion is
+                complete (root included) and the elapsed time.
+
+        Raises:
+            ValueError: If the resource does not exist.
+        """
+        with ShardRouter.get_instance().route(arg_type, uuid):
+            report = self.run_shard(arg_type, uuid, max_batches)
+        if report["complete"]:
+            ShardRouter.get_instance().forget(uuid)
+        return report
+
+    def run_shard(self, arg_type: str, uuid: UUID, max_batches: int = 0) -> dict:
+        """
+        Deletes a resource and its subtree, leaves first, on the current shard.
+
+        Args:
+            arg_type (str): The type of the resource.
+            uuid (UUID): The unique identifier of the resource.
+            max_batches (int): Number of batches after which the deletion stops, 0 to delete everything.
+
+        Returns:
+            dict: The report with the rows deleted per type, the number of batches, whether the deletion is
+                complete (root included) and the elapsed time.
+
+        Raises:
+            ValueError: If the resource does not exist.
+        """
+        started_at = time.perf_counter()
+        with DB.get_instance().get_session() as session:
+            if session.execute(text(f"SELECT 1 FROM {arg_type} WHERE id = :root"), {"root": uuid}).first() is None:
+                raise ValueError(f"The {arg_type} {uuid} does not exist")
+
+        root = self.get_level(arg_type)
+        report: dict = {"rows": {}, "batches": 0, "complete": False}
+        for depth in range(len(LEVELS) - 1 - root, 0, -1):
+            name, _, _ = LEVELS[root + depth]
+            query = text(self.build_batch_query(arg_type, depth))
+            report["rows"][name] = 0
+            deleted = self.batch_size
+            while deleted == self.batch_size:
+                if 0 < max_batches <= report["batches"]:
+                    report["elapsed"] = round(time.perf_counter() - started_at, 3)
+                    return report
+                # One transaction per batch, its locks are released before the next one
+                with DB.get_instance().get_session() as session:
+                    deleted = session.execute(query, {"root": uuid, "limit": self.batch_size}).rowcount
+                report["rows"][name] += deleted
+                report["batches"] += 1
+                if self.progress is not None:
+                    self.progress.write(f"{name}: {report['rows'][name]} deleted ({report['batches']} batches)\n")
+                if self.pause > 0 and deleted > 0:
+                    time.sleep(self.pause)
+
+        DB.get_instance().delete(LEVELS[root][1], uuid)
+        report["rows"][arg_type] = 1
+        report["complete"] = True
+        report["elapsed"] = round(time.perf_counter() - started_at, 3)
+        return report
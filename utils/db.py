@@ -5,37 +5,100 @@ Provides database connection utilities, session management, and helper functions
 for building queries, creating tables, enums, and performing CRUD operations.
 """
 
+import itertools
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from enum import Enum
-from typing import Generator
+from typing import Any, Callable, Generator, TextIO, TypeVar
 from uuid import UUID
 
-from sqlalchemy import Table, create_engine, delete, inspect
-from sqlalchemy.dialects.postgresql import ENUM
-from sqlalchemy.engine import Engine
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import (
+    Table,
+    bindparam,
+    create_engine,
+    delete,
+    exists,
+    func,
+    insert,
+    inspect,
+    or_,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, ENUM
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import DeclarativeMeta, Session
 from sqlalchemy.schema import CreateTable
 from sqlalchemy_utils import create_database, database_exists
 
-from settings.base import DATABASE
+from settings.base import DATABASE, REPLICAS, SHARDS
 
 from .decorators import Singleton
+from .profiler import Profiler
+from .serializers import RowSerializer
+from .storage import StorageInterface
+
+# Number of rows fetched at once from the server-side cursor of an export
+EXPORT_BATCH_SIZE = 10_000
+# Number of UUIDs bound in a single statement when fetching resources by id
+GET_CHUNK_SIZE = 10_000
+# Tables whose rows are moved to an archive table (same name with `ARCHIVE_SUFFIX`), see `utils.archive`
+ARCHIVED_TABLES = ["event", "market", "selection"]
+ARCHIVE_SUFFIX = "_archive"
+
+T = TypeVar("T")  # Generic type of the result of a function run on every shard
+
+
+class VersionConflictError(ValueError):
+    """
+    Raised when a conditional write expects a version which is no longer the one stored.
+
+    Attributes:
+        uuid (UUID): The UUID of the resource.
+        expected (int): The version expected by the write.
+        actual (int | None): The version stored, None when the resource does not exist.
+    """
+
+    def __init__(self, table: str, uuid: UUID, expected: int, actual: int | None):
+        """
+        Initializes the error.
+
+        Args:
+            table (str): The table of the resource.
+            uuid (UUID): The UUID of the resource.
+            expected (int): The version expected by the write.
+            actual (int | None): The version stored, None when the resource does not exist.
+        """
+        self.uuid = uuid
+        self.expected = expected
+        self.actual = actual
+        found = "it does not exist" if actual is None else f"found version {actual}"
+        super().__init__(f"Version conflict on {table} {uuid}: expected version {expected}, {found}")
+
+
+# Declarative base of the models, created without connecting to the database
+BASE: DeclarativeMeta = declarative_base()
 
 
 @Singleton
-class DB:
+class DB(StorageInterface):
     """Singleton class for managing database connections and operations."""
 
     __engine: Engine | None = None
-    __base: DeclarativeMeta = declarative_base()
+    __base: DeclarativeMeta = BASE
 
     def __init__(
         self,
         uri: str = str(DATABASE["URI"]),
         verbose: bool = False,
+        replica_uris: str = str(REPLICAS["URIS"]),
+        shard_uris: str = str(SHARDS["URIS"]),
     ):
         """
         Initializes the database connection.
@@ -43,17 +106,36 @@ class DB:
         Args:
             uri (str): Database URI for connection.
             verbose (bool): Flag for enabling verbose output for SQLAlchemy.
+            replica_uris (str): Comma-separated URIs of the read replicas, empty to read from the primary.
+            shard_uris (str): Comma-separated URIs of the databases sharding the data with the primary (the first
+                shard), empty for a single database.
 
         Raises:
             SystemExit: If the database connection fails.
         """
         try:
-            self.__engine = create_engine(uri, echo=verbose)
-            if not database_exists(self.__engine.url):
-                create_database(self.__engine.url)
+            with Profiler.get_instance().phase("connect"):
+                self.__engine = create_engine(uri, echo=verbose)
+                if not database_exists(self.__engine.url):
+                    create_database(self.__engine.url)
+                # The replicas are checked when a connection is checked out, a replica down being skipped
+                self.__replicas = [
+                    create_engine(replica_uri.strip(), echo=verbose, pool_pre_ping=True)
+                    for replica_uri in replica_uris.split(",")
+                    if replica_uri.strip() != ""
+                ]
+                self.__shards = [self.__engine] + [
+                    create_engine(shard_uri.strip(), echo=verbose)
+                    for shard_uri in shard_uris.split(",")
+                    if shard_uri.strip() != ""
+                ]
         except SQLAlchemyError as error:
             print(f"An error occurred while connecting to the DB; {error}")
             sys.exit(1)
+        self.__replica_turns = itertools.count()
+        self.__replica_down_until: dict[int, float] = {}
+        self.__read_primary = False
+        self.__local = threading.local()
 
     @staticmethod
     def get_instance():
@@ -64,31 +146,6 @@ class DB:
             DB: The singleton instance.
         """
 
-    # pylint: disable=no-self-use
-    def get_operators(self, operator: str) -> str | None:
-        """
-        Gets the SQL operator corresponding to the given string.
-
-        Args:
-            operator (str): The input operator.
-
-        Returns:
-            str | None: The SQL operator if valid, otherwise None.
-        """
-        sql_operator = None
-        if operator in ["=", ">", "<", ">=", "<=", "like", "ilike", "in"]:
-            sql_operator = operator
-        elif operator.startswith("not") is True:
-            sql_operator = f"not {operator[3:]}"
-        elif "regex" in operator:
-            sql_operator = "~"
-            if "not" in operator:
-                sql_operator = "!~"
-            if "i" in operator:
-                sql_operator += "*"
-
-        return sql_operator
-
     def get_condition(self, operator: str, field: str, prefix: str, value: list | str | int | float | bool) -> str:
         """
         Constructs a SQL condition for a WHERE clause.
@@ -108,15 +165,15 @@ class DB:
             return query
 
         # Apply some verifications
-        if "in" in operator:
+        if "in" in operator_allowed:
             if isinstance(value, list) and len(value) > 0:
-                query = f"{prefix}.{field} {operator} (" + "'" + "','".join(value) + "')"
+                query = f"{prefix}.{field} {operator_allowed} (" + "'" + "','".join(value) + "')"
             else:
-                query = f"{prefix}.{field} {operator} (" + "'" + str(value) + "')"
-        elif "like" in operator:
-            query = f"{prefix}.{field} {operator} " + "'%" + str(value) + "%'"
+                query = f"{prefix}.{field} {operator_allowed} (" + "'" + str(value) + "')"
+        elif "like" in operator_allowed:
+            query = f"{prefix}.{field} {operator_allowed} " + "'%" + str(value) + "%'"
         else:
-            query = f"{prefix}.{field} {operator} " + "'" + str(value) + "'"
+            query = f"{prefix}.{field} {operator_allowed} " + "'" + str(value) + "'"
         return query
 
     # pylint: disable=no-self-use
@@ -146,16 +203,338 @@ class DB:
             where_query += where_condition
         return where_query
 
+    def get_source(self, model: DeclarativeMeta, include_archived: bool = False) -> str:
+        """
+        Returns the relation to select the rows of a model from.
+
+        With the archived rows, it is the `UNION ALL` of the table and its archive table; the
+        planner pushes the conditions of the query down to both, so each one uses its indexes.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model.
+            include_archived (bool): Whether the archived rows are included.
+
+        Returns:
+            str: The name of the table, or a subquery when the archived rows are included.
+        """
+        table = model.__tablename__
+        if include_archived is False or table not in ARCHIVED_TABLES:
+            return table
+        columns = ", ".join(f'"{column}"' for column in model.__table__.columns.keys())
+        return f"(SELECT {columns} FROM {table} UNION ALL SELECT {columns} FROM {table}{ARCHIVE_SUFFIX})"
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def build_search_query(
+        self,
+        model: DeclarativeMeta,
+        prefix: str,
+        data: list[dict[str, str | int | float | bool]],
+        fields: list[str] | None = None,
+        include_archived: bool = False,
+    ) -> str:
+        """
+        Builds the SELECT query run by a search.
+
+        Only the requested fields are selected, so a projection covered by an index can be
+        answered by an index-only scan.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model to search.
+            prefix (str): The table prefix.
+            data (list[dict]): The data to filter by.
+            fields (list[str] | None): The columns to select, all of them when None.
+            include_archived (bool): Whether the archived rows are searched too.
+
+        Returns:
+            str: The SQL query string.
+
+        Raises:
+            ValueError: If a field is not a column of the model.
+        """
+        model_keys = model.__table__.columns.keys()
+        unknown = [field for field in fields or [] if field not in model_keys]
+        if len(unknown) > 0:
+            raise ValueError(f"Unknown field(s) {unknown} for {model.__tablename__}, expected some of {model_keys}")
+        # Each row holds the primary key or is projected on purpose, no DISTINCT is needed
+        columns = ", ".join(f'{prefix}."{field}"' for field in fields) if fields else f"{prefix}.*"
+        query = f"SELECT {columns} FROM {self.get_source(model, include_archived)} {prefix}"
+        # Build the where query
+        where_query = self.build_where(prefix, model_keys, data)
+        # Apply the where
+        if where_query != "":
+            query += f" WHERE {where_query}"
+        return query
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def search(
+        self,
+        model: DeclarativeMeta,
+        prefix: str,
+        data: list[dict[str, str | int | float | bool]],
+        fields: list[str] | None = None,
+        include_archived: bool = False,
+    ) -> list:
+        """
+        Runs a search and converts its rows to JSON objects.
+
+        The rows are read as plain tuples from the DBAPI cursor and converted by the
+        compiled serializer of the model, no ORM object is built.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model to search.
+            prefix (str): The table prefix.
+            data (list[dict]): The data to filter by.
+            fields (list[str] | None): The columns to select and serialize, all of them when None.
+            include_archived (bool): Whether the archived rows are searched too.
+
+        Returns:
+            list: The JSON objects of the matching rows.
+
+        Raises:
+            ValueError: If a field is not a column of the model.
+        """
+        if self.is_sharded():
+            # Every shard searched concurrently, unless the search is filtered by sport
+            shards = ShardRouter.get_instance().get_search_shards(model, data)
+            results = self.run_on_shards(lambda: self.search(model, prefix, data, fields, include_archived), shards)
+            return [result for shard_results in results for result in shard_results]
+        query = self.build_search_query(model, prefix, data, fields, include_archived)
+        with self.get_session(read_only=True) as session:
+            result = session.execute(text(query))
+            keys = [column[0] for column in result.cursor.description]
+            rows = result.cursor.fetchall()
+            result.close()
+
+        with Profiler.get_instance().phase("serialize"):
+            return RowSerializer.get(model, fields).serialize(rows, keys)
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def export(
+        self,
+        model: DeclarativeMeta,
+        prefix: str,
+        data: list[dict[str, str | int | float | bool]],
+        output: TextIO,
+        fields: list[str] | None = None,
+        include_archived: bool = False,
+    ) -> int:
+        """
+        Runs a search and writes its rows to an output buffer as JSON lines.
+
+        The rows are streamed through a server-side cursor, so the memory used does not
+        depend on the number of rows.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model to search.
+            prefix (str): The table prefix.
+            data (list[dict]): The data to filter by.
+            output (TextIO): The buffer to write to.
+            fields (list[str] | None): The columns to select and serialize, all of them when None.
+            include_archived (bool): Whether the archived rows are exported too.
+
+        Returns:
+            int: The number of rows written.
+
+        Raises:
+            ValueError: If a field is not a column of the model.
+        """
+        if self.is_sharded():
+            # The shards are streamed one after the other, so the memory used stays bounded
+            count = 0
+            for shard in ShardRouter.get_instance().get_search_shards(model, data):
+                with self.use_shard(shard):
+                    count += self.export(model, prefix, data, output, fields, include_archived)
+            return count
+        query = self.build_search_query(model, prefix, data, fields, include_archived)
+        serializer = RowSerializer.get(model, fields)
+        count = 0
+        with self.get_session(read_only=True) as session:
+            result = session.execute(
+                text(query).execution_options(stream_results=True, max_row_buffer=EXPORT_BATCH_SIZE)
+            )
+            keys = [column[0] for column in result.cursor.description]
+            with Profiler.get_instance().phase("serialize"):
+                # Read through the result, which already buffers the first row of the server-side cursor
+                while rows := result.fetchmany(EXPORT_BATCH_SIZE):
+                    count += serializer.write(rows, keys, output)
+            result.close()
+        return count
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def get_many(
+        self,
+        model: DeclarativeMeta,
+        prefix: str,
+        ids: list[UUID],
+        fields: list[str] | None = None,
+        include_archived: bool = False,
+    ) -> tuple[list, list[UUID]]:
+        """
+        Fetches resources by their UUIDs.
+
+        The UUIDs are bound as a single array parameter (`id = ANY(:ids)`), by chunks of
+        `GET_CHUNK_SIZE`, so the statement does not grow with the number of UUIDs.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model to fetch.
+            prefix (str): The table prefix.
+            ids (list[UUID]): The UUIDs to fetch.
+            fields (list[str] | None): The columns to select and serialize, all of them when None.
+            include_archived (bool): Whether the archived rows are fetched too.
+
+        Returns:
+            tuple[list, list[UUID]]: The JSON objects found, in the order of the UUIDs, and the UUIDs not found.
+
+        Raises:
+            ValueError: If a field is not a column of the model.
+        """
+        if self.is_sharded():
+            return self.merge_shards(
+                ids, self.run_on_shards(lambda: self.get_many(model, prefix, ids, fields, include_archived))
+            )
+        # The id is always selected to put the rows back in the requested order
+        selected = fields + ["id"] if fields and "id" not in fields else fields
+        query = text(
+            f"{self.build_search_query(model, prefix, [], selected, include_archived)} WHERE {prefix}.id = ANY(:ids)"
+        ).bindparams(bindparam("ids", type_=ARRAY(model.__table__.columns["id"].type)))
+        unique_ids = list(dict.fromkeys(ids))
+        rows: dict[UUID, Any] = {}
+        with self.get_session(read_only=True) as session:
+            for start in range(0, len(unique_ids), GET_CHUNK_SIZE):
+                result = session.execute(query, {"ids": unique_ids[start : start + GET_CHUNK_SIZE]})
+                keys = [column[0] for column in result.cursor.description]
+                position = keys.index("id")
+                rows.update((row[position], row) for row in result.cursor.fetchall())
+                result.close()
+
+        with Profiler.get_instance().phase("serialize"):
+            convert = RowSerializer.get(model, fields).get_converter(keys) if len(rows) > 0 else None
+            results = [convert(rows[uuid]) for uuid in ids if uuid in rows]
+        return results, [uuid for uuid in unique_ids if uuid not in rows]
+
+    @classmethod
+    def merge_shards(cls, ids: list[UUID], results: list[tuple[list, list[UUID]]]) -> tuple[list, list[UUID]]:
+        """
+        Merges the resources fetched by UUID from each shard.
+
+        Args:
+            ids (list[UUID]): The UUIDs fetched.
+            results (list[tuple[list, list[UUID]]]): The JSON objects found and the UUIDs not found, per shard.
+
+        Returns:
+            tuple[list, list[UUID]]: The JSON objects found, in the order of the UUIDs, and the UUIDs not found.
+        """
+        found: dict[UUID, Any] = {}
+        for objects, missing in results:
+            # The objects of a shard are in the order of the UUIDs it found, repeated ones included
+            missed = set(missing)
+            found.update(zip((uuid for uuid in ids if uuid not in missed), objects))
+        return [found[uuid] for uuid in ids if uuid in found], [
+            uuid for uuid in dict.fromkeys(ids) if uuid not in found
+        ]
+
+    def count(
+        self,
+        model: DeclarativeMeta,
+        prefix: str,
+        data: list[dict[str, str | int | float | bool]],
+        approximate: bool = False,
+    ) -> int:
+        """
+        Counts the rows matching the search criteria.
+
+        The approximate count does not read the table: without criteria it is the number of
+        rows stored in `pg_class.reltuples` (updated by VACUUM and ANALYZE), otherwise the number
+        of rows estimated by the planner.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model to count.
+            prefix (str): The table prefix.
+            data (list[dict]): The data to filter by.
+            approximate (bool): Whether to return an estimate instead of an exact count.
+
+        Returns:
+            int: The number of matching rows.
+        """
+        if self.is_sharded():
+            shards = ShardRouter.get_instance().get_search_shards(model, data)
+            return sum(self.run_on_shards(lambda: self.count(model, prefix, data, approximate), shards))
+        query = f"FROM {model.__tablename__} {prefix}"
+        # Build the where query
+        where_query = self.build_where(prefix, model.__table__.columns.keys(), data)
+        # Apply the where
+        if where_query != "":
+            query += f" WHERE {where_query}"
+
+        with self.get_session(read_only=True) as session:
+            if approximate is False:
+                return session.execute(text(f"SELECT count(*) {query}")).scalar()
+            if where_query == "":
+                # reltuples is -1 as long as the table has never been analyzed
+                estimate = session.execute(
+                    text("SELECT reltuples FROM pg_class WHERE oid = CAST(:table AS regclass)"),
+                    {"table": model.__tablename__},
+                ).scalar()
+                if estimate >= 0:
+                    return int(estimate)
+            plan = session.execute(text(f"EXPLAIN (FORMAT JSON) SELECT 1 {query}")).scalar()
+            return int(plan[0]["Plan"]["Plan Rows"])
+
+    def get_read_concurrency(self) -> int:
+        """
+        Returns the number of read-only operations which can run at once without waiting for a connection.
+
+        Returns:
+            int: The size of the pools of the replicas the reads go to, the one of the primary without replicas.
+        """
+        if self.__read_primary is False and getattr(self.__local, "primary", False) is False and self.__replicas:
+            return sum(replica.pool.size() for replica in self.__replicas)
+        return self.__engine.pool.size()
+
+    def get_read_connection(self) -> Connection:
+        """
+        Opens a connection for a read-only operation, on a replica when there are some.
+
+        The replicas are taken in turn. A replica which cannot be connected to (its pooled
+        connections are pinged when checked out) is skipped for `REPLICA_RETRY_AFTER_SECONDS`;
+        the primary is used when every replica is down or the reads are forced to the primary.
+
+        Returns:
+            Connection: The connection, to be closed by the caller.
+        """
+        if self.get_current_shard() not in [None, 0]:
+            # The replicas are the ones of the primary, the first shard
+            return self.get_current_engine().connect()
+        if (
+            self.__read_primary is False
+            and getattr(self.__local, "primary", False) is False
+            and len(self.__replicas) > 0
+        ):
+            turn = next(self.__replica_turns)
+            for offset in range(len(self.__replicas)):
+                index = (turn + offset) % len(self.__replicas)
+                if self.__replica_down_until.get(index, 0.0) > time.monotonic():
+                    continue
+                try:
+                    return self.__replicas[index].connect()
+                except OperationalError as error:
+                    self.__replica_down_until[index] = time.monotonic() + float(REPLICAS["RETRY_AFTER_SECONDS"])
+                    print(f"Replica {index} is down, reading from another database; {error.orig}", file=sys.stderr)
+        return self.__engine.connect()
+
     @contextmanager
-    # pylint: disable=unused-argument
-    def get_session(self, *args, **kwargs) -> Generator[Session, None, None]:
+    def get_session(self, read_only: bool = False) -> Generator[Session, None, None]:
         """
         Context manager for handling database sessions.
 
+        Args:
+            read_only (bool): Whether the session only reads, it is then bound to a replica when there are some.
+
         Yields:
             Session: The SQLAlchemy session.
         """
-        session = Session(self.__engine)
+        connection = self.get_read_connection() if read_only else None
+        session = Session(connection or self.get_current_engine())
         try:
             yield session
         except:
@@ -163,6 +542,30 @@ class DB:
             raise
         else:
             session.commit()
+        finally:
+            if connection is not None:
+                connection.close()
+
+    @contextmanager
+    def get_raw_connection(self) -> Generator[Any, None, None]:
+        """
+        Context manager for handling a raw DBAPI connection from the pool.
+
+        Used by bulk paths (e.g. `COPY`) which are not exposed through the ORM.
+
+        Yields:
+            Any: The DBAPI (psycopg2) connection.
+        """
+        connection = self.get_current_engine().raw_connection()
+        try:
+            yield connection
+        except:
+            connection.rollback()
+            raise
+        else:
+            connection.commit()
+        finally:
+            connection.close()
 
     def get_base(self) -> DeclarativeMeta:
         """
@@ -182,6 +585,133 @@ class DB:
         """
         return self.__engine
 
+    def get_engines(self) -> list[Engine]:
+        """
+        Returns the SQLAlchemy engines of the shards (the primary first) and of the replicas.
+
+        Returns:
+            list[Engine]: The engine of the primary, then the ones of the other shards and of the replicas.
+        """
+        return self.__shards + self.__replicas
+
+    def get_shard_count(self) -> int:
+        """
+        Returns the number of shards.
+
+        Returns:
+            int: The number of databases sharding the data, 1 without sharding.
+        """
+        return len(self.__shards)
+
+    def get_current_shard(self) -> int | None:
+        """
+        Returns the shard the current thread works on.
+
+        Returns:
+            int | None: The index of the shard, None outside of `use_shard`.
+        """
+        return getattr(self.__local, "shard", None)
+
+    def get_current_engine(self) -> Engine:
+        """
+        Returns the engine of the shard the current thread works on.
+
+        Returns:
+            Engine: The engine of the shard, the one of the primary outside of `use_shard`.
+        """
+        shard = self.get_current_shard()
+        return self.__engine if shard is None else self.__shards[shard]
+
+    def is_sharded(self) -> bool:
+        """
+        Tells whether an operation must be routed to its shards.
+
+        Returns:
+            bool: True with several shards, outside of `use_shard`.
+        """
+        return len(self.__shards) > 1 and self.get_current_shard() is None
+
+    @contextmanager
+    def use_shard(self, shard: int) -> Generator[None, None, None]:
+        """
+        Context manager sending the operations of the current thread to a shard.
+
+        Args:
+            shard (int): The index of the shard.
+        """
+        previous = self.get_current_shard()
+        self.__local.shard = shard
+        try:
+            yield
+        finally:
+            self.__local.shard = previous
+
+    def run_on_shards(self, function: Callable[[], T], shards: list[int] | None = None) -> list[T]:
+        """
+        Runs a function on shards concurrently, each call in the context of its shard.
+
+        Args:
+            function (Callable[[], T]): The function to run.
+            shards (list[int] | None): The indexes of the shards, all of them when None.
+
+        Returns:
+            list[T]: The result of each call, in the order of the shards.
+        """
+        shards = list(range(len(self.__shards))) if shards is None else shards
+
+        def run(shard: int) -> T:
+            with self.use_shard(shard):
+                return function()
+
+        if len(shards) <= 1:
+            return [run(shard) for shard in shards]
+        with ThreadPoolExecutor(max_workers=len(shards), thread_name_prefix="shard") as executor:
+            # Results are read in submission order, the first error is raised once all calls are done
+            return list(executor.map(run, shards))
+
+    @contextmanager
+    def read_from_primary(self) -> Generator[None, None, None]:
+        """
+        Context manager sending the read-only operations of the current thread to the primary.
+
+        Used when a read must see the latest writes, e.g. the read of a read-modify-write.
+        """
+        previous = getattr(self.__local, "primary", False)
+        self.__local.primary = True
+        try:
+            yield
+        finally:
+            self.__local.primary = previous
+
+    def set_read_primary(self, read_primary: bool) -> None:
+        """
+        Forces the read-only operations to the primary, e.g. to read the writes just made.
+
+        Args:
+            read_primary (bool): Whether the reads go to the primary rather than to the replicas.
+        """
+        self.__read_primary = read_primary
+
+    def reset_after_fork(self) -> None:
+        """
+        Drops the pool inherited from the parent process, called by `Singleton` in a forked child.
+
+        The connections are discarded without being closed, as their sockets are still used by
+        the parent; the engine then opens new connections, owned by the child.
+        """
+        for engine in self.get_engines():
+            engine.dispose(close=False)
+
+    def set_verbose(self, verbose: bool) -> None:
+        """
+        Enables or disables the logging of every statement by SQLAlchemy.
+
+        Args:
+            verbose (bool): Flag for enabling verbose output for SQLAlchemy.
+        """
+        for engine in self.get_engines():
+            engine.echo = verbose
+
     def create_table_from_model(self, model: DeclarativeMeta) -> Table | bool:
         """
         Creates a table for the given SQLAlchemy model.
@@ -201,6 +731,50 @@ class DB:
             session.execute(table_creation_sql)
         return model.__table__, True
 
+    def create_partitioned_table_from_model(self, model: DeclarativeMeta, key: str, partitions: int) -> Table | bool:
+        """
+        Creates a table for the given SQLAlchemy model, hash partitioned on a column.
+
+        PostgreSQL needs the partition key in every unique constraint of a partitioned table, so
+        the primary key becomes `(id, key)` and the unique columns are unique per `key` value.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model.
+            key (str): The column to partition by, usually the foreign key of the parent.
+            partitions (int): The number of partitions, named after the table with a `_p{remainder}` suffix.
+
+        Returns:
+            Table | bool: The table object and a flag indicating creation success.
+        """
+        table = model.__table__
+        if inspect(self.__engine).has_table(table.name):
+            return table, False
+
+        definitions = []
+        for column in table.columns:
+            definition = f'"{column.name}" {column.type.compile(dialect=self.__engine.dialect)}'
+            if column.server_default is not None:
+                definition += f" DEFAULT {column.server_default.arg}"
+            definitions.append(definition + (" NOT NULL" if column.nullable is False else ""))
+        definitions.append(f'PRIMARY KEY (id, "{key}")')
+        definitions += [f'UNIQUE ("{column.name}", "{key}")' for column in table.columns if column.unique]
+        for foreign_key in table.foreign_keys:
+            definitions.append(
+                f'CONSTRAINT {foreign_key.constraint.name} FOREIGN KEY ("{foreign_key.parent.name}") '
+                f"REFERENCES {foreign_key.column.table.name} ({foreign_key.column.name}) "
+                f"ON DELETE {foreign_key.ondelete or 'NO ACTION'}"
+            )
+        with self.get_session() as session:
+            session.execute(text(f'CREATE TABLE {table.name} ({", ".join(definitions)}) PARTITION BY HASH ("{key}")'))
+            for remainder in range(partitions):
+                session.execute(
+                    text(
+                        f"CREATE TABLE {table.name}_p{remainder} PARTITION OF {table.name} "
+                        f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+                    )
+                )
+        return table, True
+
     def create_enum(self, obj: Enum, name: str) -> None:
         """
         Creates an ENUM type in the database.
@@ -211,27 +785,57 @@ class DB:
         """
         ENUM(obj, name=name).create(bind=self.__engine)
 
-    # pylint: disable=no-self-use
-    def get_upsert_data(self, model: DeclarativeMeta, data: dict[str, str | int | float | bool]) -> DeclarativeMeta:
+    def upsert(self, model: DeclarativeMeta, uuid: UUID, values: dict, version: int | None = None) -> bool:
         """
-        Populates model fields with given data for upsert operations.
+        Upserts a resource, skipping the write when nothing changed.
+
+        The update only matches the row when one of the values is distinct from the stored one
+        (`IS DISTINCT FROM`), and reports in the same statement the stored version, so replaying
+        an identical payload costs a single read: no new row version, no `updated_at` bump and no
+        trigger. The row is inserted when it does not exist.
+
+        Every write increments the version of the row (by a trigger). With an expected `version`, the update
+        also needs the stored version to match (optimistic concurrency): the row is only locked
+        for the time of the statement, and a concurrent write is reported instead of overwritten.
 
         Args:
             model (DeclarativeMeta): The SQLAlchemy model.
-            data (dict): The data to populate.
+            uuid (UUID): The UUID of the resource.
+            values (dict): The values by column name, as returned by `get_upsert_values`.
+            version (int | None): The version the resource is expected to have, None to write whatever its version.
 
         Returns:
-            DeclarativeMeta: The updated model.
+            bool: Whether the resource has been inserted or updated.
+
+        Raises:
+            VersionConflictError: If the stored version is not the expected one, or the resource does not exist.
         """
-        # Isolate the column name
-        data_keys = data.keys()
-        model_keys = model.__table__.columns.keys()
-        # Fill the model
-        for key in model_keys:
-            if key not in data_keys or key == "id":
-                continue
-            setattr(model, key, data[key])
-        return model
+        if self.is_sharded():
+            with self.use_shard(ShardRouter.get_instance().get_write_shard(model, uuid, values)):
+                return self.upsert(model, uuid, values, version)
+        table = model.__table__
+        conditions = [table.columns["id"] == uuid]
+        if version is not None:
+            conditions.append(table.columns["version"] == version)
+        stored = select(table.columns["version"]).where(table.columns["id"] == uuid).scalar_subquery()
+        with self.get_session() as session:
+            if len(values) > 0:
+                conditions.append(or_(*(table.columns[key].is_distinct_from(value) for key, value in values.items())))
+                updated = (update(table).where(*conditions).values(values).returning(table.columns["id"])).cte(
+                    "updated"
+                )
+                # Both parts of the statement see the table as it was before the update
+                written, current = session.execute(
+                    select(select(func.count()).select_from(updated).scalar_subquery(), stored)
+                ).one()
+            else:
+                written, current = 0, session.execute(select(stored)).scalar()
+            if version is not None and written == 0 and current != version:
+                raise VersionConflictError(table.name, uuid, version, current)
+            if current is not None:
+                return written > 0
+            session.execute(insert(table).values({**values, "id": uuid}))
+        return True
 
     def delete(self, model: DeclarativeMeta, uuid: UUID) -> None:
         """
@@ -241,5 +845,200 @@ class DB:
             model (DeclarativeMeta): The SQLAlchemy model.
             uuid (UUID): The UUID of the resource to delete.
         """
+        if self.is_sharded():
+            shard = ShardRouter.get_instance().locate(model.__tablename__, uuid)
+            if shard is not None:
+                with self.use_shard(shard):
+                    self.delete(model, uuid)
+                ShardRouter.get_instance().forget(uuid)
+            return
         with self.get_session() as session:
             session.execute(delete(model).where(model.id == uuid).execution_options(synchronize_session="fetch"))
+
+
+@Singleton
+class ShardRouter:
+    """
+    Singleton class routing the resources to the shard of their sport.
+
+    A sport and its whole subtree live on the same shard, so the foreign keys and the triggers
+    keep working within each database. A new sport goes to the shard given by its id, a new event,
+    market or selection to the shard of its parent. An existing resource is looked up on every
+    shard at once, and its shard is then cached by id, so the following writes of the resource
+    and of its children go straight to their shard.
+    """
+
+    def __init__(self, cache_size: int = int(SHARDS["CACHE_SIZE"])):
+        """
+        Initializes the router.
+
+        Args:
+            cache_size (int): Number of ids whose shard is cached, the cache being emptied once full.
+        """
+        self.cache_size = max(1, cache_size)
+        self.__lock = threading.Lock()
+        self.__shards: dict[str, int] = {}
+
+    @staticmethod
+    def get_instance():
+        """
+        Returns the singleton instance of the ShardRouter class.
+
+        Returns:
+            ShardRouter: The singleton instance.
+        """
+
+    @classmethod
+    def get_parent_key(cls, model: DeclarativeMeta) -> tuple[str, str] | None:
+        """
+        Returns the parent of a model in the hierarchy.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model.
+
+        Returns:
+            tuple[str, str] | None: The table of the parent and the column holding its id, None for a sport.
+        """
+        foreign_key = next(iter(model.__table__.foreign_keys), None)
+        return None if foreign_key is None else (foreign_key.column.table.name, foreign_key.parent.name)
+
+    def get_new_shard(self, uuid: UUID | str) -> int:
+        """
+        Returns the shard of a new sport.
+
+        Args:
+            uuid (UUID | str): The id of the sport.
+
+        Returns:
+            int: The index of the shard.
+        """
+        return UUID(str(uuid)).int % DB.get_instance().get_shard_count()
+
+    def remember(self, uuid: UUID | str, shard: int) -> None:
+        """
+        Caches the shard of a resource.
+
+        Args:
+            uuid (UUID | str): The id of the resource.
+            shard (int): The index of its shard.
+        """
+        with self.__lock:
+            if len(self.__shards) >= self.cache_size:
+                self.__shards.clear()
+            self.__shards[str(uuid)] = shard
+
+    def forget(self, uuid: UUID | str) -> None:
+        """
+        Removes a deleted resource from the cache.
+
+        Args:
+            uuid (UUID | str): The id of the resource.
+        """
+        with self.__lock:
+            self.__shards.pop(str(uuid), None)
+
+    def locate(self, table: str, uuid: UUID | str) -> int | None:
+        """
+        Finds the shard holding a resource, from the cache or by looking it up on every shard.
+
+        Args:
+            table (str): The table of the resource.
+            uuid (UUID | str): The id of the resource.
+
+        Returns:
+            int | None: The index of the shard, None when the resource does not exist.
+        """
+        with self.__lock:
+            shard = self.__shards.get(str(uuid))
+        if shard is not None:
+            return shard
+
+        def exists() -> bool:
+            with DB.get_instance().get_session() as session:
+                return (
+                    session.execute(text(f"SELECT 1 FROM {table} WHERE id = :id"), {"id": str(uuid)}).first()
+                    is not None
+                )
+
+        shard = next((index for index, found in enumerate(DB.get_instance().run_on_shards(exists)) if found), None)
+        if shard is not None:
+            self.remember(uuid, shard)
+        return shard
+
+    @contextmanager
+    def route(self, table: str, uuid: UUID) -> Generator[None, None, None]:
+        """
+        Context manager sending the operations of the current thread to the shard of a resource.
+
+        Args:
+            table (str): The table of the resource.
+            uuid (UUID): The id of the resource.
+
+        Raises:
+            ValueError: If the resource does not exist.
+        """
+        if DB.get_instance().is_sharded() is False:
+            yield
+            return
+        shard = self.locate(table, uuid)
+        if shard is None:
+            raise ValueError(f"The {table} {uuid} does not exist")
+        with DB.get_instance().use_shard(shard):
+            yield
+
+    def get_write_shard(self, model: DeclarativeMeta, uuid: UUID, values: dict) -> int:
+        """
+        Finds the shard a resource is written to.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model.
+            uuid (UUID): The id of the resource.
+            values (dict): The values written, with the id of the parent to create a resource.
+
+        Returns:
+            int: The index of the shard.
+
+        Raises:
+            ValueError: If the parent does not exist, is missing to create the resource, or is on another shard.
+        """
+        shard = self.locate(model.__tablename__, uuid)
+        parent = self.get_parent_key(model)
+        if parent is None:
+            shard = self.get_new_shard(uuid) if shard is None else shard
+        elif values.get(parent[1]) is not None:
+            parent_shard = self.locate(parent[0], values[parent[1]])
+            if parent_shard is None:
+                raise ValueError(f"The {parent[0]} {values[parent[1]]} does not exist")
+            if shard is not None and shard != parent_shard:
+                raise ValueError(f"The {model.__tablename__} {uuid} cannot be moved to a {parent[0]} of another shard")
+            shard = parent_shard
+        elif shard is None:
+            raise ValueError(f"The {model.__tablename__} {uuid} does not exist, its {parent[1]} is needed to create it")
+        self.remember(uuid, shard)
+        return shard
+
+    def get_search_shards(self, model: DeclarativeMeta, data: list[dict[str, str | int | float | bool]]) -> list[int]:
+        """
+        Finds the shards a search must run on.
+
+        A search of sports by id or of events by sport id only runs on the shard of the sport,
+        any other search runs on every shard.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model searched.
+            data (list[dict]): The search criteria.
+
+        Returns:
+            list[int]: The indexes of the shards, none when the sport does not exist.
+        """
+        key = "id" if self.get_parent_key(model) is None else "sport_id"
+        for obj in data if key in model.__table__.columns else []:
+            if obj.get("field") != key or obj.get("operator") != "=" or obj.get("value") is None:
+                continue
+            try:
+                sport_id = UUID(str(obj["value"]))
+            except ValueError:
+                break
+            shard = self.locate("sport", sport_id)
+            return [] if shard is None else [shard]
+        return list(range(DB.get_instance().get_shard_count()))
@@ -2,6 +2,8 @@
 Define decorators for managing singleton patterns.
 """
 
+import os
+import threading
 from typing import Any, Type, TypeVar
 
 T = TypeVar("T")  # Generic type for the class being decorated
@@ -12,6 +14,10 @@ class Singleton:
     A decorator to enforce the Singleton pattern for a class.
 
     Ensures that only one instance of the class exists and provides a way to access it.
+
+    The creation is protected by a lock, so concurrent threads share the same instance. The
+    instance is bound to the process which created it: when it is accessed from a forked child,
+    its `reset_after_fork` method (if any) is called first, e.g. to drop inherited connections.
     """
 
     def __init__(self, cls: Type[T]):
@@ -23,18 +29,36 @@ class Singleton:
         """
         self._cls: Type[T] = cls
         self._instance: T | None = None
+        self._pid: int | None = None
+        self._lock = threading.Lock()
+        # The lock may be held by another thread at fork time, the child gets a fresh one
+        os.register_at_fork(after_in_child=self._reset_lock)
+
+    def _reset_lock(self) -> None:
+        """
+        Replaces the lock in a forked child.
+        """
+        self._lock = threading.Lock()
 
     def get_instance(self) -> Any:
         """
         Returns the singleton instance of the decorated class.
 
-        If the instance does not already exist, it will be created.
+        If the instance does not already exist, it will be created. If it was created by the
+        parent of the current process, its `reset_after_fork` method is called once.
 
         Returns:
             T: The singleton instance of the decorated class.
         """
-        if self._instance is None:
-            self._instance = self._cls()
+        # Fast path, without locking, once the instance exists in this process
+        if self._instance is not None and self._pid == os.getpid():
+            return self._instance
+        with self._lock:
+            if self._instance is None:
+                self._instance = self._cls()
+            elif self._pid != os.getpid() and hasattr(self._instance, "reset_after_fork"):
+                self._instance.reset_after_fork()
+            self._pid = os.getpid()
         return self._instance
 
     def __call__(self) -> Any:
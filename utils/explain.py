@@ -0,0 +1,273 @@
+"""
+Query plan analysis utility.
+
+Captures the PostgreSQL plan of a statement, highlights the costly nodes and suggests
+indexes matching the search criteria.
+"""
+
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import DeclarativeMeta
+
+from models import JSON
+
+from .db import DB
+
+# Operators served by a B-tree index
+BTREE_OPERATORS = ["=", "in", "<", "<=", ">", ">="]
+# Operators which need a trigram index to avoid a sequential scan
+TRIGRAM_OPERATORS = ["like", "ilike", "regex", "iregex"]
+# Ratio between actual and estimated rows above which the estimate is reported as a miss
+ESTIMATE_MISS_RATIO = 10
+
+
+class PlanJSON(JSON):
+    """
+    JSON structure for an analyzed plan.
+
+    Attributes:
+        statement (str): The explained statement.
+        analyzed (bool): Whether the statement was executed (EXPLAIN ANALYZE).
+        plan (dict): The plan as returned by PostgreSQL in JSON format.
+        findings (list[dict]): The sequential scans, sorts and row estimate misses of the plan.
+        suggestions (list[str]): The DDL of the indexes which could serve the criteria.
+        planning_ms (float | None): The planning time, only when analyzed.
+        execution_ms (float | None): The execution time, only when analyzed.
+    """
+
+    statement: str
+    analyzed: bool
+    plan: dict
+    findings: list[dict]
+    suggestions: list[str]
+    planning_ms: float | None
+    execution_ms: float | None
+
+
+class PlanAnalyzer:
+    """
+    A utility class to explain a statement and analyze its plan.
+    """
+
+    @classmethod
+    def explain(cls, statement: str, analyze: bool = False) -> dict:
+        """
+        Captures the plan of a statement.
+
+        Args:
+            statement (str): The statement to explain.
+            analyze (bool): Whether to execute the statement to get actual rows and timings.
+
+        Returns:
+            dict: The top-level object returned by `EXPLAIN (FORMAT JSON)`.
+        """
+        options = "FORMAT JSON, ANALYZE, BUFFERS" if analyze else "FORMAT JSON"
+        with DB.get_instance().get_session() as session:
+            result = session.execute(text(f"EXPLAIN ({options}) {statement}")).scalar()
+        return result[0]
+
+    @classmethod
+    def walk(cls, node: dict, depth: int = 0) -> list[tuple[int, dict]]:
+        """
+        Flattens a plan tree.
+
+        Args:
+            node (dict): The plan node to start from.
+            depth (int): The depth of the node.
+
+        Returns:
+            list[tuple[int, dict]]: The nodes with their depth, parents first.
+        """
+        nodes = [(depth, node)]
+        for child in node.get("Plans", []):
+            nodes.extend(cls.walk(child, depth + 1))
+        return nodes
+
+    @classmethod
+    def get_findings(cls, plan: dict, analyzed: bool) -> list[dict]:
+        """
+        Lists the sequential scans, sorts and row estimate misses of a plan.
+
+        Args:
+            plan (dict): The root node of the plan.
+            analyzed (bool): Whether the plan holds actual rows.
+
+        Returns:
+            list[dict]: One entry per finding, with its kind, node type and details.
+        """
+        findings = []
+        for _, node in cls.walk(plan):
+            node_type = node["Node Type"]
+            if node_type == "Seq Scan":
+                findings.append(
+                    {
+                        "kind": "seq_scan",
+                        "node": node_type,
+                        "relation": node.get("Relation Name"),
+                        "filter": node.get("Filter"),
+                        "rows": node.get("Plan Rows"),
+                    }
+                )
+            elif node_type in ["Sort", "Incremental Sort"]:
+                findings.append(
+                    {
+                        "kind": "sort",
+                        "node": node_type,
+                        "sort_key": node.get("Sort Key"),
+                        "method": node.get("Sort Method"),
+                        "space": node.get("Sort Space Type"),
+                        "rows": node.get("Plan Rows"),
+                    }
+                )
+            if analyzed and "Actual Rows" in node:
+                estimated = max(node["Plan Rows"], 1)
+                actual = max(node["Actual Rows"], 1)
+                if max(estimated, actual) / min(estimated, actual) >= ESTIMATE_MISS_RATIO:
+                    findings.append(
+                        {
+                            "kind": "estimate_miss",
+                            "node": node_type,
+                            "relation": node.get("Relation Name"),
+                            "rows": node["Plan Rows"],
+                            "actual_rows": node["Actual Rows"],
+                        }
+                    )
+        return findings
+
+    @classmethod
+    def get_suggestions(
+        cls,
+        model: DeclarativeMeta,
+        data: list[dict[str, str | int | float | bool]],
+        findings: list[dict],
+        fields: list[str] | None = None,
+    ) -> list[str]:
+        """
+        Suggests indexes for the criteria of a search which ended up in a sequential scan.
+
+        Equality criteria come first in a composite B-tree index, followed by a single range criterion.
+        Pattern criteria (like, regex) get a trigram GIN index each. Columns already leading an
+        existing index are skipped. When the search is projected, the other selected fields are
+        included in the B-tree index so that it covers the query (index-only scan).
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model searched.
+            data (list[dict]): The search criteria.
+            findings (list[dict]): The findings of the plan.
+            fields (list[str] | None): The fields selected by the search, all of them when None.
+
+        Returns:
+            list[str]: The DDL statements of the suggested indexes.
+        """
+        table = model.__table__.name
+        if all(finding.get("relation") != table for finding in findings if finding["kind"] == "seq_scan"):
+            return []
+
+        model_keys = model.__table__.columns.keys()
+        indexed = set(model.__table__.primary_key.columns.keys())
+        for index in inspect(DB.get_instance().get_engine()).get_indexes(table):
+            if len(index["column_names"]) > 0:
+                indexed.add(index["column_names"][0])
+
+        equalities, ranges, patterns = [], [], []
+        for obj in data:
+            field, operator = obj.get("field"), str(obj.get("operator", ""))
+            if field not in model_keys or obj.get("value", None) is None:
+                continue
+            if operator in ["=", "in"]:
+                equalities.append(field)
+            elif operator in BTREE_OPERATORS:
+                ranges.append(field)
+            elif operator in TRIGRAM_OPERATORS:
+                patterns.append(field)
+
+        suggestions = []
+        columns = list(dict.fromkeys(equalities + ranges[:1]))
+        if len(columns) > 0 and columns[0] not in indexed:
+            keys = ", ".join(f'"{column}"' for column in columns)
+            included = [f'"{field}"' for field in fields or [] if field not in columns]
+            include = f" INCLUDE ({', '.join(included)})" if len(included) > 0 else ""
+            suggestions.append(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {table}_{'_'.join(columns)}_idx ON {table} ({keys}){include};"
+            )
+        for column in dict.fromkeys(patterns):
+            suggestions.append("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+            suggestions.append(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {table}_{column}_trgm_idx "
+                f'ON {table} USING gin ("{column}" gin_trgm_ops);'
+            )
+        return list(dict.fromkeys(suggestions))
+
+    @classmethod
+    def analyze(
+        cls,
+        model: DeclarativeMeta,
+        statement: str,
+        data: list[dict[str, str | int | float | bool]],
+        analyze: bool = False,
+        fields: list[str] | None = None,
+    ) -> PlanJSON:
+        """
+        Explains a search statement and analyzes its plan.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model searched.
+            statement (str): The statement run by the search.
+            data (list[dict]): The search criteria.
+            analyze (bool): Whether to execute the statement to get actual rows and timings.
+            fields (list[str] | None): The fields selected by the search, all of them when None.
+
+        Returns:
+            PlanJSON: The plan with its findings and index suggestions.
+        """
+        explained = cls.explain(statement, analyze)
+        findings = cls.get_findings(explained["Plan"], analyze)
+        return {
+            "statement": statement,
+            "analyzed": analyze,
+            "plan": explained["Plan"],
+            "findings": findings,
+            "suggestions": cls.get_suggestions(model, data, findings, fields),
+            "planning_ms": explained.get("Planning Time"),
+            "execution_ms": explained.get("Execution Time"),
+        }
+
+    @classmethod
+    def render(cls, report: PlanJSON) -> str:
+        """
+        Renders an analyzed plan as text, highlighting the nodes with findings.
+
+        Args:
+            report (PlanJSON): The analyzed plan.
+
+        Returns:
+            str: The plan tree followed by the findings and the suggestions.
+        """
+        lines = [report["statement"], ""]
+        for depth, node in cls.walk(report["plan"]):
+            line = "  " * depth + ("-> " if depth > 0 else "") + node["Node Type"]
+            if "Relation Name" in node:
+                line += f" on {node['Relation Name']} {node.get('Alias', '')}".rstrip()
+            line += f"  (cost={node['Startup Cost']}..{node['Total Cost']} rows={node['Plan Rows']})"
+            if "Actual Rows" in node:
+                line += f" (actual time={node['Actual Total Time']} rows={node['Actual Rows']}"
+                line += f" loops={node['Actual Loops']})"
+            if node["Node Type"] == "Seq Scan":
+                line += "  <<< SEQUENTIAL SCAN"
+            elif node["Node Type"] in ["Sort", "Incremental Sort"]:
+                line += "  <<< SORT"
+            lines.append(line)
+            for key in ["Filter", "Sort Key", "Sort Method"]:
+                if key in node:
+                    lines.append("  " * (depth + 2) + f"{key}: {node[key]}")
+
+        if report["analyzed"]:
+            lines.append(f"\nPlanning: {report['planning_ms']} ms, execution: {report['execution_ms']} ms")
+        misses = [finding for finding in report["findings"] if finding["kind"] == "estimate_miss"]
+        for finding in misses:
+            lines.append(
+                f"Row estimate miss on {finding['node']}: estimated {finding['rows']}, actual {finding['actual_rows']}"
+            )
+        if len(report["suggestions"]) > 0:
+            lines.append("\nSuggested indexes:")
+            lines.extend(report["suggestions"])
+        return "\n".join(lines)
@@ -0,0 +1,105 @@
+"""
+Cross-type search utility.
+
+Runs the searches of several types concurrently on a thread pool sharing the connections of
+the storage, so the latency of a multi-type search is the one of its slowest query.
+"""
+
+import importlib
+from concurrent.futures import ThreadPoolExecutor
+
+from models import JSON
+from models.event import EventModel
+from models.market import MarketModel
+from models.selection import SelectionModel
+from models.sport import SportModel
+
+from .interfaces import ModuleInterface
+
+# Models of the types
+MODELS = {"sport": SportModel, "event": EventModel, "market": MarketModel, "selection": SelectionModel}
+
+
+class TaggedJSON(JSON):
+    """
+    JSON structure for a result of a cross-type search.
+
+    Attributes:
+        type (str): The type of the resource (sport, event, market or selection).
+        result (JSON): The resource.
+    """
+
+    type: str
+    result: JSON
+
+
+class SearchFanOut:
+    """
+    A utility class to search several types at once.
+    """
+
+    @classmethod
+    def search_type(
+        cls,
+        arg_type: str,
+        data: list[dict[str, str | int | float | bool]],
+        fields: list[str] | None = None,
+        include_archived: bool = False,
+    ) -> list[TaggedJSON]:
+        """
+        Searches a single type through its module and tags the results.
+
+        Args:
+            arg_type (str): The type to search.
+            data (list[dict]): The search criteria.
+            fields (list[str] | None): The fields to return, all of them when None.
+            include_archived (bool): Whether the archived resources are searched too.
+
+        Returns:
+            list[TaggedJSON]: The results tagged with their type.
+        """
+        module = getattr(importlib.import_module("modules"), arg_type.capitalize())()
+        return [{"type": arg_type, "result": result} for result in module.search(data, fields, include_archived)]
+
+    @classmethod
+    def search(
+        cls,
+        queries: list[tuple[str, list[dict[str, str | int | float | bool]]]],
+        fields: list[str] | None = None,
+        include_archived: bool = False,
+    ) -> list[TaggedJSON]:
+        """
+        Runs the search of each type concurrently and merges the results.
+
+        Each search checks out its own connection, so at most as many searches as the storage
+        serves reads at once (`get_read_concurrency`) run at once.
+
+        The criteria and the fields must be columns of their type, a filter on a missing column
+        being otherwise ignored by the search of that type, which would then return all its rows.
+
+        Args:
+            queries (list[tuple[str, list[dict]]]): The type to search with its criteria.
+            fields (list[str] | None): The fields to return for every type, all of them when None.
+            include_archived (bool): Whether the archived resources are searched too.
+
+        Returns:
+            list[TaggedJSON]: The results tagged with their type, in the order of the queries.
+
+        Raises:
+            ValueError: If a criterion or a field is not a column of its type.
+        """
+        if len(queries) == 0:
+            return []
+        for arg_type, data in queries:
+            columns = MODELS[arg_type].__table__.columns
+            unknown = [obj.get("field") for obj in data if obj.get("field") not in columns]
+            unknown += [field for field in fields or [] if field not in columns]
+            if len(unknown) > 0:
+                raise ValueError(f"Unknown field(s) {unknown} for {arg_type}, search the types separately")
+        workers = min(len(queries), ModuleInterface.get_storage().get_read_concurrency())
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="search") as executor:
+            futures = [
+                executor.submit(cls.search_type, arg_type, data, fields, include_archived) for arg_type, data in queries
+            ]
+            # Results are read in submission order, the first error is raised once all searches are done
+            return [tagged for future in futures for tagged in future.result()]
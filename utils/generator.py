@@ -0,0 +1,372 @@
+"""
+Synthetic dataset generator.
+
+Produces a deterministic hierarchy of sports, events, markets and selections from a seed
+and loads it through `COPY`, for benchmarks and capacity planning.
+"""
+
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+from models.event import EventModel, EventStatus, EventType
+from models.market import MarketModel
+from models.selection import SelectionModel, SelectionOutcome
+from models.sport import SportModel
+from settings.base import IDS
+
+from .bulk import BulkCopy
+from .db import DB
+from .helper import Helper
+
+SPORT_NAMES = [
+    "Football",
+    "Tennis",
+    "Basketball",
+    "Horse Racing",
+    "Cricket",
+    "Golf",
+    "Ice Hockey",
+    "Rugby Union",
+    "Baseball",
+    "Darts",
+    "Snooker",
+    "Boxing",
+]
+MARKET_NAMES = [
+    "Match Result",
+    "Both Teams To Score",
+    "Over/Under 2.5 Goals",
+    "Correct Score",
+    "Double Chance",
+    "Half Time Result",
+    "Asian Handicap",
+    "First Scorer",
+    "Total Corners",
+    "Draw No Bet",
+]
+# Weights of the enum values, roughly matching a production snapshot
+EVENT_STATUS_WEIGHTS = {EventStatus.PREPLAY: 60, EventStatus.INPLAY: 15, EventStatus.ENDED: 25}
+EVENT_TYPE_WEIGHTS = {EventType.PREPLAY: 30, EventType.INPLAY: 70}
+SETTLED_OUTCOME_WEIGHTS = {SelectionOutcome.LOSE: 80, SelectionOutcome.PLACE: 10, SelectionOutcome.VOID: 10}
+# Fixed origin for timestamps so that two runs with the same seed are identical
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+SPORT_COLUMNS = ["id", "name", "display_name", "slug", "order", "is_active", "created_at", "updated_at"]
+EVENT_COLUMNS = [
+    "id",
+    "sport_id",
+    "name",
+    "display_name",
+    "slug",
+    "type",
+    "status",
+    "is_active",
+    "created_at",
+    "updated_at",
+]
+MARKET_COLUMNS = [
+    "id",
+    "event_id",
+    "name",
+    "display_name",
+    "slug",
+    "order",
+    "schema",
+    "columns",
+    "is_active",
+    "created_at",
+    "updated_at",
+]
+SELECTION_COLUMNS = [
+    "id",
+    "market_id",
+    "name",
+    "display_name",
+    "slug",
+    "price",
+    "outcome",
+    "is_active",
+    "created_at",
+    "updated_at",
+]
+
+
+# pylint: disable=too-many-instance-attributes
+class DataGenerator:
+    """
+    A class generating a deterministic synthetic dataset and bulk loading it.
+
+    The same seed and sizes always produce the same ids, names, slugs and values.
+    Fan-out varies around the requested averages, and `is_active` is kept consistent
+    with the cascade rules enforced by the triggers of `init_db.py`.
+    """
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(
+        self,
+        seed: int = 42,
+        sports: int = 10,
+        events: int = 1000,
+        markets_per_event: int = 10,
+        selections_per_market: int = 3,
+        batch_size: int = 1000,
+        keep_triggers: bool = False,
+    ):
+        """
+        Initializes the generator.
+
+        Args:
+            seed (int): Seed of the random generator.
+            sports (int): Number of sports to generate.
+            events (int): Number of events to generate, spread over the sports.
+            markets_per_event (int): Average number of markets per event.
+            selections_per_market (int): Average number of selections per market.
+            batch_size (int): Number of events (with their subtree) loaded per `COPY` round.
+            keep_triggers (bool): Keep the `is_active` triggers enabled during the load (much slower).
+        """
+        self.rng = random.Random(seed)
+        self.sports = max(1, sports)
+        self.events = max(0, events)
+        self.markets_per_event = max(1, markets_per_event)
+        self.selections_per_market = max(1, selections_per_market)
+        self.batch_size = max(1, batch_size)
+        self.keep_triggers = keep_triggers
+        self.counters = {"sport": 0, "event": 0, "market": 0, "selection": 0}
+        self.id_strategy = str(IDS["STRATEGY"])
+        self.ids = 0
+
+    def new_uuid(self) -> str:
+        """
+        Draws a UUID from the seeded random generator, with the configured strategy (`ID_STRATEGY`).
+
+        Version 7 UUIDs get one millisecond per id from the generator epoch, so they keep the
+        insertion order of a live feed while staying reproducible.
+
+        Returns:
+            str: A version 4 or 7 UUID, reproducible for a given seed.
+        """
+        if self.id_strategy == "uuid7":
+            self.ids += 1
+            return str(Helper.uuid7(int(EPOCH.timestamp() * 1000) + self.ids, self.rng.getrandbits(74)))
+        return str(UUID(int=self.rng.getrandbits(128), version=4))
+
+    def fan_out(self, average: int) -> int:
+        """
+        Draws a number of children uniformly distributed around an average.
+
+        Args:
+            average (int): The expected number of children.
+
+        Returns:
+            int: A number of children between 1 and `2 * average - 1`.
+        """
+        return self.rng.randint(1, 2 * average - 1)
+
+    def timestamp(self) -> str:
+        """
+        Draws a timestamp within the year following the generator epoch.
+
+        Returns:
+            str: A timezone-aware timestamp in ISO 8601 format.
+        """
+        return (EPOCH + timedelta(seconds=self.rng.randrange(365 * 24 * 3600))).isoformat()
+
+    def slug(self, table: str, name: str, uuid: str) -> str:
+        """
+        Builds the slug of a resource, unique across runs as the ids are.
+
+        Args:
+            table (str): The table the resource belongs to.
+            name (str): The resource name.
+            uuid (str): The resource id.
+
+        Returns:
+            str: The slugified name suffixed by the end of the id, see `Helper.unique_slug`.
+        """
+        self.counters[table] += 1
+        return str(Helper.unique_slug(name, uuid))
+
+    def generate_sports(self) -> list[list]:
+        """
+        Generates the sport rows.
+
+        Returns:
+            list[list]: The sport rows, in `SPORT_COLUMNS` order.
+        """
+        rows = []
+        for index in range(self.sports):
+            name = SPORT_NAMES[index % len(SPORT_NAMES)]
+            if index >= len(SPORT_NAMES):
+                name = f"{name} {index // len(SPORT_NAMES) + 1}"
+            created_at = self.timestamp()
+            # The first sport is always active so that the dataset is never entirely inactive
+            is_active = index == 0 or self.rng.random() < 0.9
+            sport_id = self.new_uuid()
+            rows.append(
+                [sport_id, name, name, self.slug("sport", name, sport_id), index, is_active, created_at, created_at]
+            )
+        return rows
+
+    def generate_selections(
+        self, market_id: str, market_active: bool, status: EventStatus, created_at: str
+    ) -> list[list]:
+        """
+        Generates the selection rows of a market.
+
+        Args:
+            market_id (str): The parent market id.
+            market_active (bool): Whether the parent market may hold active selections.
+            status (EventStatus): The status of the event, ENDED events get settled outcomes.
+            created_at (str): The creation timestamp of the market, shared by its selections.
+
+        Returns:
+            list[list]: The selection rows, in `SELECTION_COLUMNS` order.
+        """
+        rows = []
+        count = self.fan_out(self.selections_per_market)
+        winner = self.rng.randrange(count)
+        for index in range(count):
+            name = f"Selection {index + 1}"
+            outcome = SelectionOutcome.UNSETTLED
+            if status == EventStatus.ENDED:
+                outcome = SelectionOutcome.WIN
+                if index != winner:
+                    outcome = self.rng.choices(
+                        list(SETTLED_OUTCOME_WEIGHTS), weights=list(SETTLED_OUTCOME_WEIGHTS.values())
+                    )[0]
+            # Decimal odds, skewed towards short prices
+            price = f"{min(1.01 + self.rng.expovariate(0.25), 999.0):.2f}"
+            selection_id = self.new_uuid()
+            rows.append(
+                [
+                    selection_id,
+                    market_id,
+                    name,
+                    name,
+                    self.slug("selection", name, selection_id),
+                    price,
+                    outcome.name,
+                    market_active and self.rng.random() < 0.9,
+                    created_at,
+                    created_at,
+                ]
+            )
+        return rows
+
+    def generate_event(self, sport: list, batch: dict[str, list]) -> None:
+        """
+        Generates an event with its markets and selections into the current batch.
+
+        A parent is only active when it has at least one active child, and children of
+        an inactive parent are inactive, as the triggers would enforce.
+
+        Args:
+            sport (list): The parent sport row.
+            batch (dict[str, list]): The rows of the current batch, per table.
+        """
+        status = self.rng.choices(list(EVENT_STATUS_WEIGHTS), weights=list(EVENT_STATUS_WEIGHTS.values()))[0]
+        event_type = self.rng.choices(list(EVENT_TYPE_WEIGHTS), weights=list(EVENT_TYPE_WEIGHTS.values()))[0]
+        event_id = self.new_uuid()
+        event_draw = sport[SPORT_COLUMNS.index("is_active")] and status != EventStatus.ENDED and self.rng.random() < 0.9
+        event_active = False
+        for order in range(self.fan_out(self.markets_per_event)):
+            name = MARKET_NAMES[order % len(MARKET_NAMES)]
+            market_id = self.new_uuid()
+            created_at = self.timestamp()
+            selections = self.generate_selections(market_id, event_draw and self.rng.random() < 0.9, status, created_at)
+            market_active = any(selection[SELECTION_COLUMNS.index("is_active")] for selection in selections)
+            event_active = event_active or market_active
+            batch["market"].append(
+                [
+                    market_id,
+                    event_id,
+                    name,
+                    name,
+                    self.slug("market", name, market_id),
+                    order,
+                    1,
+                    self.rng.choice([2, 3, 5]),
+                    market_active,
+                    created_at,
+                    created_at,
+                ]
+            )
+            batch["selection"].extend(selections)
+
+        home, away = self.rng.sample(range(1, 2 * self.events + 2), 2)
+        name = f"Team {home} v Team {away}"
+        created_at = self.timestamp()
+        batch["event"].append(
+            [
+                event_id,
+                sport[0],
+                name,
+                name,
+                self.slug("event", name, event_id),
+                event_type.name,
+                status.name,
+                event_active,
+                created_at,
+                created_at,
+            ]
+        )
+
+    def load(self, cursor, batch: dict[str, list]) -> None:
+        """
+        Loads a batch of rows, parents before children to satisfy the foreign keys.
+
+        Rows are generated with ids, enums, prices and timestamps already formatted as strings
+        (once per parent when shared), so they can skip `BulkCopy.encode`.
+
+        Args:
+            cursor: A DBAPI (psycopg2) cursor.
+            batch (dict[str, list]): The rows to load, per table.
+        """
+        BulkCopy.copy(cursor, SportModel.__tablename__, SPORT_COLUMNS, batch["sport"], False)
+        BulkCopy.copy(cursor, EventModel.__tablename__, EVENT_COLUMNS, batch["event"], False)
+        if self.keep_triggers is False:
+            # Flag the events in the event book, as its triggers are disabled too
+            BulkCopy.copy(cursor, "event_book", ["event_id"], [[event[0]] for event in batch["event"]], False)
+        BulkCopy.copy(cursor, MarketModel.__tablename__, MARKET_COLUMNS, batch["market"], False)
+        BulkCopy.copy(cursor, SelectionModel.__tablename__, SELECTION_COLUMNS, batch["selection"], False)
+
+    def run(self) -> dict[str, int | float]:
+        """
+        Generates and loads the whole dataset in a single transaction.
+
+        Returns:
+            dict[str, int | float]: The number of rows loaded per table, the elapsed time and the throughput.
+        """
+        started_at = time.perf_counter()
+        tables = [model.__tablename__ for model in (SportModel, EventModel, MarketModel, SelectionModel)]
+        sports = self.generate_sports()
+        # Skew the events towards the first sports, as football dominates real data
+        weights = [1 / (index + 1) for index in range(len(sports))]
+        with DB.get_instance().get_raw_connection() as connection:
+            with connection.cursor() as cursor:
+                if self.keep_triggers is False:
+                    BulkCopy.set_triggers(cursor, tables, False)
+
+                batch: dict[str, list] = {"sport": sports, "event": [], "market": [], "selection": []}
+                for index in range(self.events):
+                    self.generate_event(self.rng.choices(sports, weights=weights)[0], batch)
+                    if (index + 1) % self.batch_size == 0:
+                        self.load(cursor, batch)
+                        print(f"Loaded {index + 1}/{self.events} events")
+                        batch = {"sport": [], "event": [], "market": [], "selection": []}
+                self.load(cursor, batch)
+
+                if self.keep_triggers is False:
+                    # Sports were loaded first, deactivate the ones which ended up without active events
+                    cursor.execute(
+                        "UPDATE sport s SET is_active = false WHERE s.id = ANY(%s::uuid[]) AND s.is_active "
+                        "AND NOT EXISTS (SELECT 1 FROM event e WHERE e.sport_id = s.id AND e.is_active)",
+                        ([sport[0] for sport in sports],),
+                    )
+                    BulkCopy.set_triggers(cursor, tables, True)
+
+        elapsed = time.perf_counter() - started_at
+        rows = sum(self.counters.values())
+        return {**self.counters, "elapsed": round(elapsed, 2), "rows_per_second": round(rows / max(elapsed, 1e-9))}
@@ -1,10 +1,21 @@
 """
 A collection of helper classes and functions for the project.
 
-This module provides utilities to perform common tasks like string manipulation.
+This module provides utilities to perform common tasks like string manipulation and id generation.
 """
 
 import re
+import secrets
+import threading
+import time
+from uuid import UUID, uuid4
+
+from settings.base import IDS
+
+# Strategies generating the ids of new resources
+ID_STRATEGIES = ["uuid4", "uuid7"]
+# Length of the slug columns of the models
+SLUG_LENGTH = 100
 
 
 # pylint: disable=too-few-public-methods
@@ -13,6 +24,10 @@ class Helper:
     A helper class providing utility methods for string manipulation and other common tasks.
     """
 
+    # State of the UUIDv7 generator: last millisecond used and counter within it
+    __uuid7_lock = threading.Lock()
+    __uuid7_last = (0, 0)
+
     @classmethod
     def slugify(cls, text: str) -> str | None:
         """
@@ -32,3 +47,82 @@ class Helper:
         if isinstance(text, str) is False:
             return None
         return re.sub(r"[\W_]+", "-", text.strip().lower()).strip("-")
+
+    @classmethod
+    def unique_slug(cls, text: str, uuid: str) -> str | None:
+        """
+        Builds a slug which cannot collide with the slug of another resource of the same name.
+
+        Used by the bulk paths, which cannot resolve a slug conflict row by row.
+
+        Args:
+            text (str): The input string to slugify, usually the name of the resource.
+            uuid (str): The id of the resource, whose last characters suffix the slug.
+
+        Returns:
+            str | None: The slugified text, cut to fit the slug columns, suffixed by the end of the id,
+                or None if the input is not a string.
+        """
+        slug = cls.slugify(text)
+        if slug is None:
+            return None
+        # The end of the id is random whatever its version, its beginning being the timestamp of a uuid7
+        suffix = UUID(str(uuid)).hex[-12:]
+        return f"{slug[: SLUG_LENGTH - len(suffix) - 1].rstrip('-')}-{suffix}"
+
+    @classmethod
+    def uuid7(cls, timestamp_ms: int | None = None, random_bits: int | None = None) -> UUID:
+        """
+        Generates a time-ordered UUID (version 7, RFC 9562).
+
+        The 48 first bits are the Unix timestamp in milliseconds, followed by a 12 bits counter
+        (randomly seeded each millisecond and incremented within it, so the ids of a process are
+        strictly increasing) and 62 random bits. Consecutive inserts then land on the right-most
+        page of the primary-key index instead of a random one.
+
+        Args:
+            timestamp_ms (int | None): The timestamp to use (e.g. for reproducible datasets), now when None.
+            random_bits (int | None): The 74 random bits to use with an explicit timestamp, drawn when None.
+
+        Returns:
+            UUID: A version 7 UUID.
+        """
+        if timestamp_ms is not None:
+            bits = secrets.randbits(74) if random_bits is None else random_bits
+            counter, random_b = bits >> 62 & 0xFFF, bits & (1 << 62) - 1
+        else:
+            with cls.__uuid7_lock:
+                timestamp_ms, counter = time.time_ns() // 1_000_000, secrets.randbits(11)
+                last_ms, last_counter = cls.__uuid7_last
+                # Same millisecond (or clock going backwards): keep the last one and increment the counter
+                if timestamp_ms <= last_ms:
+                    timestamp_ms, counter = last_ms, last_counter + 1
+                    if counter > 0xFFF:
+                        timestamp_ms, counter = last_ms + 1, 0
+                cls.__uuid7_last = (timestamp_ms, counter)
+            random_b = secrets.randbits(62)
+        value = (timestamp_ms & (1 << 48) - 1) << 80 | 0x7 << 76 | counter << 64 | 0b10 << 62 | random_b
+        return UUID(int=value)
+
+    @classmethod
+    def new_id(cls, strategy: str | None = None) -> UUID:
+        """
+        Generates the id of a new resource with the configured strategy (`ID_STRATEGY`).
+
+        Ids of any version are accepted everywhere, so changing the strategy keeps the existing ids valid.
+
+        Args:
+            strategy (str | None): The strategy (`uuid4` or `uuid7`), the configured one when None.
+
+        Returns:
+            UUID: The new id.
+
+        Raises:
+            ValueError: If the strategy is unknown.
+        """
+        strategy = strategy or str(IDS["STRATEGY"])
+        if strategy == "uuid7":
+            return cls.uuid7()
+        if strategy == "uuid4":
+            return uuid4()
+        raise ValueError(f"Unknown id strategy {strategy}, expected one of {ID_STRATEGIES}")
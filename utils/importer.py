@@ -0,0 +1,251 @@
+"""
+Parallel bulk import utility.
+
+Loads a fixture file (JSON lines) through `COPY` from a pool of worker processes. Rows are
+partitioned by parent id and the levels of the hierarchy are committed in order, parents first.
+"""
+
+import json
+import multiprocessing
+import time
+from datetime import datetime, timezone
+from uuid import UUID
+
+import psycopg2
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import DeclarativeMeta
+from sqlalchemy.types import Enum as EnumType
+
+from models.event import EventModel
+from models.market import MarketModel
+from models.selection import SelectionModel
+from models.sport import SportModel
+
+from .bulk import BulkCopy
+from .db import DB
+from .helper import Helper
+
+# Levels of the hierarchy in commit order, with the column holding the parent id
+LEVELS: list[tuple[str, DeclarativeMeta, str | None]] = [
+    ("sport", SportModel, None),
+    ("event", EventModel, "sport_id"),
+    ("market", MarketModel, "event_id"),
+    ("selection", SelectionModel, "market_id"),
+]
+# Number of failures detailed in a report
+MAX_FAILURES = 10
+
+
+class BulkImporter:
+    """
+    A class importing fixtures with several processes.
+
+    The rows of a level are grouped by parent id and the groups packed into chunks, so all the
+    siblings of a parent are loaded (and fire the `is_active` triggers on that parent) from a
+    single worker. Each chunk is a transaction of its own, on the connection of its worker.
+    A level starts once every chunk of the previous one is committed.
+    """
+
+    def __init__(self, workers: int = 1, chunk_size: int = 5000):
+        """
+        Initializes the importer.
+
+        Args:
+            workers (int): Number of worker processes.
+            chunk_size (int): Number of rows above which a chunk is closed, the siblings of a parent are never split.
+        """
+        self.workers = max(1, workers)
+        self.chunk_size = max(1, chunk_size)
+
+    @classmethod
+    def read(cls, path: str) -> tuple[dict[str, list[tuple[int, str, dict]]], list[dict]]:
+        """
+        Reads a fixture file and groups its rows by type.
+
+        Each line is a JSON object with a `type`, an optional `id` (generated when missing) and the
+        `data` of the resource, including the id of its parent.
+
+        Args:
+            path (str): The path of the fixture file.
+
+        Returns:
+            tuple[dict, list[dict]]: The rows of each type (line number, id and data), and the invalid lines.
+        """
+        types = [name for name, _, _ in LEVELS]
+        rows: dict[str, list[tuple[int, str, dict]]] = {name: [] for name in types}
+        failures = []
+        with open(path, encoding="utf-8") as file:
+            for line_number, line in enumerate(file, start=1):
+                if line.strip() == "":
+                    continue
+                try:
+                    entry = json.loads(line)
+                    if entry.get("type") not in types:
+                        raise ValueError(f"unknown type {entry.get('type')}, expected one of {types}")
+                    rows[entry["type"]].append(
+                        (line_number, str(UUID(str(entry.get("id") or Helper.new_id()))), entry.get("data") or {})
+                    )
+                except (ValueError, TypeError, AttributeError) as error:
+                    failures.append({"line": line_number, "error": str(error)})
+        return rows, failures
+
+    def partition(self, rows: list[tuple[int, str, dict]], parent_key: str | None) -> list[list]:
+        """
+        Packs the rows of a level into chunks, keeping the siblings of a parent together.
+
+        Args:
+            rows (list[tuple[int, str, dict]]): The rows of the level.
+            parent_key (str | None): The column holding the parent id, None for the top level.
+
+        Returns:
+            list[list]: The chunks, in a deterministic order.
+        """
+        groups: dict[str, list] = {}
+        for row in rows:
+            key = row[1] if parent_key is None else str(row[2].get(parent_key))
+            groups.setdefault(key, []).append(row)
+
+        chunks, chunk = [], []
+        for group in groups.values():
+            chunk.extend(group)
+            if len(chunk) >= self.chunk_size:
+                chunks.append(chunk)
+                chunk = []
+        if len(chunk) > 0:
+            chunks.append(chunk)
+        return chunks
+
+    @classmethod
+    def prepare(cls, model: DeclarativeMeta, uuid: str, data: dict, now: str) -> list:
+        """
+        Validates a row and fills the values set by the application on insert.
+
+        The slug is the slugified name suffixed by the end of the id, slugs being unique.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model of the row.
+            uuid (str): The id of the row.
+            data (dict): The values of the row.
+            now (str): The timestamp of the import.
+
+        Returns:
+            list: The values in the order of the model columns.
+
+        Raises:
+            ValueError: If a required value is missing or an enum value is unknown.
+        """
+        values = []
+        for column in model.__table__.columns:
+            value = data.get(column.name)
+            if column.name == "id":
+                value = uuid
+            elif column.name == "slug" and value is None:
+                value = Helper.unique_slug(data.get("name"), uuid)
+            elif column.name in ["created_at", "updated_at"] and value is None:
+                value = now
+            elif column.name == "is_active" and value is None:
+                value = False
+            elif column.name == "version":
+                value = 1
+            if value is None and column.nullable is False:
+                raise ValueError(f"{column.name} is required")
+            if value is not None and isinstance(column.type, EnumType):
+                if str(value).upper() not in column.type.enums:
+                    raise ValueError(f"invalid {column.name} {value}, expected one of {column.type.enums}")
+                value = str(value).upper()
+            values.append(value)
+        return values
+
+    @staticmethod
+    def load_chunk(task: tuple[int, list]) -> dict:
+        """
+        Validates and loads a chunk in a single transaction, run by a worker.
+
+        Args:
+            task (tuple[int, list]): The index of the level and the rows of the chunk.
+
+        Returns:
+            dict: The rows loaded, the failures and the time spent.
+        """
+        started_at, cpu_started_at = time.perf_counter(), time.process_time()
+        level, rows = task
+        _, model, _ = LEVELS[level]
+        now = datetime.now(timezone.utc).isoformat()
+        values, failures = [], []
+        for line_number, uuid, data in rows:
+            try:
+                values.append(BulkImporter.prepare(model, uuid, data, now))
+            except ValueError as error:
+                failures.append({"line": line_number, "error": str(error)})
+
+        loaded, chunk_error = 0, None
+        try:
+            with DB.get_instance().get_raw_connection() as connection:
+                with connection.cursor() as cursor:
+                    loaded = BulkCopy.copy(cursor, model.__tablename__, model.__table__.columns.keys(), values)
+        # Errors of the raw connection are not wrapped by SQLAlchemy
+        except (SQLAlchemyError, psycopg2.Error) as error:
+            chunk_error = str(error).split("\n", maxsplit=1)[0]
+        if chunk_error is not None:
+            failures.append({"lines": [rows[0][0], rows[-1][0]], "error": chunk_error})
+
+        return {
+            "rows": loaded,
+            "failures": failures,
+            "failed": chunk_error is not None,
+            "busy": time.perf_counter() - started_at,
+            "cpu": time.process_time() - cpu_started_at,
+        }
+
+    def run(self, path: str) -> dict:
+        """
+        Imports a fixture file, level by level.
+
+        The import stops after a level with a failed chunk, as the children of its rows would fail.
+
+        Args:
+            path (str): The path of the fixture file.
+
+        Returns:
+            dict: The report with the rows loaded, the failures, and per level the wall time, the time spent
+                by the workers (busy, of which cpu on the Python side) and the resulting parallelism.
+        """
+        started_at = time.perf_counter()
+        rows, failures = self.read(path)
+        report: dict = {"workers": self.workers, "levels": {}}
+        pool = multiprocessing.Pool(self.workers) if self.workers > 1 else None
+        try:
+            for level, (name, _, parent_key) in enumerate(LEVELS):
+                if len(rows[name]) == 0:
+                    continue
+                level_started_at = time.perf_counter()
+                tasks = [(level, chunk) for chunk in self.partition(rows[name], parent_key)]
+                results = list(pool.imap_unordered(self.load_chunk, tasks) if pool else map(self.load_chunk, tasks))
+                elapsed = time.perf_counter() - level_started_at
+                busy = sum(result["busy"] for result in results)
+                cpu = sum(result["cpu"] for result in results)
+                failures += [failure for result in results for failure in result["failures"]]
+                report["levels"][name] = {
+                    "rows": sum(result["rows"] for result in results),
+                    "chunks": len(tasks),
+                    "elapsed": round(elapsed, 3),
+                    "busy": round(busy, 3),
+                    "cpu": round(cpu, 3),
+                    "parallelism": round(busy / max(elapsed, 1e-9), 2),
+                }
+                if any(result["failed"] for result in results):
+                    report["stopped_after"] = name
+                    break
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        elapsed = time.perf_counter() - started_at
+        loaded = sum(level["rows"] for level in report["levels"].values())
+        report["rows"] = loaded
+        report["elapsed"] = round(elapsed, 3)
+        report["rows_per_second"] = round(loaded / max(elapsed, 1e-9), 1)
+        report["errors"] = len(failures)
+        report["failures"] = failures[:MAX_FAILURES]
+        return report
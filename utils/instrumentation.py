@@ -0,0 +1,219 @@
+"""
+SQL instrumentation module.
+
+Hooks into SQLAlchemy engine events to count and time every statement, measure the
+pool checkout wait and write a structured slow-query log.
+"""
+
+import json
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from settings.base import SQL
+
+from .decorators import Singleton
+
+# Literals are replaced to group statements which only differ by their values
+LITERAL_PATTERN = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+LIST_PATTERN = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+# Maximum length of the parameters written in the slow-query log
+MAX_PARAMETERS_LENGTH = 1000
+
+
+# pylint: disable=too-many-instance-attributes
+@Singleton
+class SQLStats:
+    """
+    Singleton class collecting SQL statistics of the current process.
+
+    Statements are grouped by their normalized text, so a statement repeated many times
+    in a single command (the N+1 pattern of eager relationships or triggers) stands out.
+    """
+
+    def __init__(
+        self, slow_query_ms: float = float(SQL["SLOW_QUERY_MS"]), slow_query_log: str = str(SQL["SLOW_QUERY_LOG"])
+    ):
+        """
+        Initializes the statistics.
+
+        Args:
+            slow_query_ms (float): Duration above which a statement is written in the slow-query log.
+            slow_query_log (str): Path of the slow-query log, empty to disable it.
+        """
+        self.slow_query_ms = slow_query_ms
+        self.slow_query_log = slow_query_log
+        self.__lock = threading.Lock()
+        self.__engines: set[int] = set()
+        self.reset()
+
+    @staticmethod
+    def get_instance():
+        """
+        Returns the singleton instance of the SQLStats class.
+
+        Returns:
+            SQLStats: The singleton instance.
+        """
+
+    def reset(self) -> None:
+        """
+        Resets all the counters.
+        """
+        self.statements = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.checkouts = 0
+        self.checkout_wait_ms = 0.0
+        self.checkout_wait_max_ms = 0.0
+        self.per_statement: dict[str, dict[str, float]] = {}
+
+    def attach(self, engine: Engine) -> None:
+        """
+        Registers the statistics listeners on an engine, once per engine.
+
+        Args:
+            engine (Engine): The SQLAlchemy engine to instrument.
+        """
+        if id(engine) in self.__engines:
+            return
+        self.__engines.add(id(engine))
+        event.listen(engine, "before_cursor_execute", self.before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self.after_cursor_execute)
+        event.listen(engine, "handle_error", self.handle_error)
+        self.attach_pool(engine)
+        # The pool is recreated on dispose, instrument the new one as well
+        event.listen(engine, "engine_disposed", lambda _: self.attach_pool(engine))
+
+    def attach_pool(self, engine: Engine) -> None:
+        """
+        Wraps the `connect` method of the engine pool to measure how long a checkout waits.
+
+        The pool does not emit any event before a checkout, hence the wrapper.
+
+        Args:
+            engine (Engine): The SQLAlchemy engine whose pool must be instrumented.
+        """
+        pool = engine.pool
+        checkout = pool.connect
+
+        def timed_checkout():
+            started_at = time.perf_counter()
+            try:
+                return checkout()
+            finally:
+                waited_ms = (time.perf_counter() - started_at) * 1000
+                with self.__lock:
+                    self.checkouts += 1
+                    self.checkout_wait_ms += waited_ms
+                    self.checkout_wait_max_ms = max(self.checkout_wait_max_ms, waited_ms)
+
+        pool.connect = timed_checkout  # type: ignore[method-assign]
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments,unused-argument
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        """
+        Stores the start time of a statement on its connection.
+        """
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments,unused-argument
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        """
+        Records the duration and the number of rows of a statement.
+        """
+        elapsed_ms = (time.perf_counter() - conn.info["query_started_at"].pop()) * 1000
+        rows = max(cursor.rowcount, 0)
+        key = self.normalize(statement)
+        with self.__lock:
+            self.statements += 1
+            self.total_ms += elapsed_ms
+            self.max_ms = max(self.max_ms, elapsed_ms)
+            self.rows += rows
+            stats = self.per_statement.setdefault(key, {"count": 0, "total_ms": 0.0, "rows": 0})
+            stats["count"] += 1
+            stats["total_ms"] += elapsed_ms
+            stats["rows"] += rows
+
+        if self.slow_query_log != "" and elapsed_ms >= self.slow_query_ms:
+            self.log_slow_query(statement, parameters, elapsed_ms, rows)
+
+    def handle_error(self, context) -> None:
+        """
+        Drops the start time of a statement which failed, as `after_cursor_execute` is not called.
+
+        Args:
+            context: The SQLAlchemy exception context.
+        """
+        if context.connection is not None and context.connection.info.get("query_started_at"):
+            context.connection.info["query_started_at"].pop()
+
+    @classmethod
+    def normalize(cls, statement: str) -> str:
+        """
+        Normalizes a statement by replacing its literals with placeholders.
+
+        Args:
+            statement (str): The SQL statement.
+
+        Returns:
+            str: The statement with literals replaced by `?` and literal lists collapsed.
+        """
+        normalized = LITERAL_PATTERN.sub("?", " ".join(statement.split()))
+        return LIST_PATTERN.sub("(...)", normalized)
+
+    def log_slow_query(self, statement: str, parameters, elapsed_ms: float, rows: int) -> None:
+        """
+        Appends a slow statement to the slow-query log as a JSON line.
+
+        Args:
+            statement (str): The SQL statement.
+            parameters: The parameters bound to the statement.
+            elapsed_ms (float): The duration of the statement in milliseconds.
+            rows (int): The number of rows returned or affected.
+        """
+        entry = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "duration_ms": round(elapsed_ms, 3),
+            "rows": rows,
+            "statement": " ".join(statement.split()),
+            "parameters": repr(parameters)[:MAX_PARAMETERS_LENGTH],
+        }
+        with self.__lock:
+            with open(self.slow_query_log, "a", encoding="utf-8") as log:
+                log.write(json.dumps(entry) + "\n")
+
+    def report(self, top: int = 5) -> dict:
+        """
+        Returns the statistics collected since the last reset.
+
+        Args:
+            top (int): Number of statements to detail, the most executed first.
+
+        Returns:
+            dict: The counters and the most executed statements.
+        """
+        statements = sorted(self.per_statement.items(), key=lambda item: item[1]["count"], reverse=True)
+        return {
+            "statements": self.statements,
+            "total_ms": round(self.total_ms, 3),
+            "max_ms": round(self.max_ms, 3),
+            "rows": self.rows,
+            "pool_checkouts": self.checkouts,
+            "pool_wait_ms": round(self.checkout_wait_ms, 3),
+            "pool_wait_max_ms": round(self.checkout_wait_max_ms, 3),
+            "top_statements": [
+                {
+                    "statement": statement,
+                    "count": stats["count"],
+                    "total_ms": round(stats["total_ms"], 3),
+                    "rows": stats["rows"],
+                }
+                for statement, stats in statements[:top]
+            ],
+        }
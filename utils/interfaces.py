@@ -2,14 +2,37 @@
 Defines an interface to enforce the implementation of required methods for modules.
 
 This ensures that any module using this interface implements methods for upserting,
-deleting, and searching objects in the database.
+deleting, and searching objects in the storage backend.
 """
 
+import random
+import time
 from abc import ABCMeta, abstractmethod
-from collections.abc import Sequence
+from collections.abc import Callable, Sequence
+from typing import TextIO
 from uuid import UUID
 
 from models import JSON
+from settings.base import CONCURRENCY, STORAGE
+
+from .db import DB, VersionConflictError
+from .memory import MemoryStorage
+from .storage import StorageInterface
+
+STORAGE_BACKENDS = ["postgresql", "memory"]
+
+
+class UpsertJSON(JSON):
+    """
+    JSON structure for the result of an upsert.
+
+    Attributes:
+        id (str): Unique identifier of the upserted object.
+        written (bool): Whether the object has been inserted or updated, False when nothing changed.
+    """
+
+    id: str
+    written: bool
 
 
 class ModuleInterface(metaclass=ABCMeta):
@@ -18,20 +41,83 @@ class ModuleInterface(metaclass=ABCMeta):
 
     Classes implementing this interface must provide concrete implementations for
     upserting, deleting, and searching objects.
+
+    The objects are stored by the backend of the `STORAGE_BACKEND` setting (`get_storage`):
+    PostgreSQL, or memory for the tests, the dry runs and the benchmarks of the Python overhead.
     """
 
+    @classmethod
+    def get_storage(cls) -> StorageInterface:
+        """
+        Returns the storage backend of the modules.
+
+        Returns:
+            StorageInterface: The database, or the in-memory storage.
+
+        Raises:
+            ValueError: If the `STORAGE_BACKEND` setting is not a known backend.
+        """
+        if STORAGE["BACKEND"] == "postgresql":
+            return DB.get_instance()
+        if STORAGE["BACKEND"] == "memory":
+            return MemoryStorage.get_instance()
+        raise ValueError(f"Unknown storage backend {STORAGE['BACKEND']}, expected one of {STORAGE_BACKENDS}")
+
     @abstractmethod
-    def upsert(self, uuid: UUID, data: dict[str, str | int | float | bool]) -> UUID:
+    def upsert(self, uuid: UUID, data: dict[str, str | int | float | bool], version: int | None = None) -> UpsertJSON:
         """
-        Inserts or updates an object in the database.
+        Inserts or updates an object in the database, without writing it when nothing changed.
 
         Args:
             uuid (UUID): The unique identifier of the object to upsert.
             data (dict[str, Union[str, int, float, bool]]): The data to insert or update.
+            version (int | None): The version the object is expected to have, None to write whatever its version.
 
         Returns:
-            UUID: The unique identifier of the upserted object.
+            UpsertJSON: The unique identifier of the upserted object and whether it has been written.
+
+        Raises:
+            VersionConflictError: If the object does not have the expected version.
+        """
+
+    def modify(
+        self,
+        uuid: UUID,
+        change: Callable[[JSON], dict[str, str | int | float | bool]],
+        retries: int = int(CONCURRENCY["RETRIES"]),
+    ) -> UpsertJSON:
         """
+        Reads an object, computes its new data and writes it if its version did not change meanwhile.
+
+        On a version conflict the object is read again and the change recomputed, after a random
+        backoff doubling at each attempt, so concurrent writers of a same object never overwrite
+        each other nor hold a lock between their read and their write.
+
+        Args:
+            uuid (UUID): The unique identifier of the object to modify.
+            change (Callable[[JSON], dict]): The function computing the data to write from the object read.
+            retries (int): The number of attempts after a conflict.
+
+        Returns:
+            UpsertJSON: The unique identifier of the object and whether it has been written.
+
+        Raises:
+            ValueError: If the object does not exist.
+            VersionConflictError: If the object still changed concurrently at the last attempt.
+        """
+        for attempt in range(retries + 1):
+            # A replica may lag behind, the version read must be the latest one
+            with self.get_storage().read_from_primary():
+                results, _ = self.get_many([uuid])
+            if len(results) == 0:
+                raise ValueError(f"The resource {uuid} does not exist")
+            try:
+                return self.upsert(uuid, change(results[0]), results[0]["version"])
+            except VersionConflictError:
+                if attempt == retries:
+                    raise
+                time.sleep(random.uniform(0, float(CONCURRENCY["RETRY_BACKOFF_MS"]) * 2**attempt / 1000))
+        raise ValueError("The number of retries cannot be negative")
 
     @abstractmethod
     def delete(self, uuid: UUID) -> None:
@@ -43,13 +129,106 @@ class ModuleInterface(metaclass=ABCMeta):
         """
 
     @abstractmethod
-    def search(self, data: list[dict[str, str | int | float | bool]]) -> Sequence[JSON]:
+    def get_many(
+        self, ids: list[UUID], fields: list[str] | None = None, include_archived: bool = False
+    ) -> tuple[Sequence[JSON], list[UUID]]:
+        """
+        Retrieves objects from the database by their unique identifiers.
+
+        Args:
+            ids (list[UUID]): The unique identifiers of the objects to retrieve.
+            fields (list[str] | None): The fields to return, all of them when None.
+            include_archived (bool): Whether the archived objects are fetched too.
+
+        Returns:
+            tuple[Sequence[JSON], list[UUID]]: The objects found, in the order of the identifiers,
+                and the identifiers not found.
+        """
+
+    @abstractmethod
+    def search(
+        self,
+        data: list[dict[str, str | int | float | bool]],
+        fields: list[str] | None = None,
+        include_archived: bool = False,
+    ) -> Sequence[JSON]:
         """
         Retrieves object(s) from the database based on search criteria.
 
         Args:
             data (list[dict[str, Union[str, int, float, bool]]]): A list of search criteria.
+            fields (list[str] | None): The fields to return, all of them when None.
+            include_archived (bool): Whether the archived objects are searched too.
 
         Returns:
             Sequence[JSON]: A sequence of JSON objects matching the search criteria.
         """
+
+    @abstractmethod
+    def export(
+        self,
+        data: list[dict[str, str | int | float | bool]],
+        output: TextIO,
+        fields: list[str] | None = None,
+        include_archived: bool = False,
+    ) -> int:
+        """
+        Writes the objects matching the criteria to an output buffer as JSON lines.
+
+        Args:
+            data (list[dict[str, Union[str, int, float, bool]]]): A list of search criteria.
+            output (TextIO): The buffer to write to.
+            fields (list[str] | None): The fields to write, all of them when None.
+            include_archived (bool): Whether the archived objects are written too.
+
+        Returns:
+            int: The number of objects written.
+        """
+
+    @abstractmethod
+    def count(self, data: list[dict[str, str | int | float | bool]], approximate: bool = False) -> int:
+        """
+        Counts the objects matching the search criteria.
+
+        Args:
+            data (list[dict[str, Union[str, int, float, bool]]]): A list of search criteria.
+            approximate (bool): Whether to return an estimate instead of an exact count.
+
+        Returns:
+            int: The number of objects.
+        """
+
+    @abstractmethod
+    def aggregate(
+        self,
+        data: list[dict[str, str | int | float | bool]],
+        group_by: list[str],
+        metrics: list[tuple[str, str | None]],
+    ) -> Sequence[JSON]:
+        """
+        Computes grouped statistics over the objects matching the search criteria.
+
+        Args:
+            data (list[dict[str, Union[str, int, float, bool]]]): A list of search criteria.
+            group_by (list[str]): Columns of the object or ids of its ancestors.
+            metrics (list[tuple[str, str | None]]): The functions with their column, None for `count(*)`.
+
+        Returns:
+            Sequence[JSON]: One JSON object per group, with the grouped values and the aggregates.
+        """
+
+    @abstractmethod
+    def explain(
+        self, data: list[dict[str, str | int | float | bool]], analyze: bool = False, fields: list[str] | None = None
+    ) -> JSON:
+        """
+        Explains the query run by a search, without returning its results.
+
+        Args:
+            data (list[dict[str, Union[str, int, float, bool]]]): A list of search criteria.
+            analyze (bool): Whether to execute the query to get actual rows and timings.
+            fields (list[str] | None): The fields selected by the search, all of them when None.
+
+        Returns:
+            JSON: The plan of the query with its findings and index suggestions.
+        """
@@ -0,0 +1,345 @@
+"""
+Load testing utility.
+
+Drives the `modules` API from several worker processes with a mixed read/write workload,
+and reports latency percentiles, throughput, deadlocks and lock waits.
+"""
+
+import math
+import multiprocessing
+import random
+import time
+from decimal import Decimal
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, SQLAlchemyError
+
+from models.selection import SelectionOutcome
+from modules import Selection
+
+from .db import DB, VersionConflictError
+
+# Latencies are bucketed on a logarithmic scale, each bucket being 5% wider than the previous one
+BUCKET_GROWTH = math.log(1.05)
+# PostgreSQL error codes reported with a readable name, others are reported by code
+ERROR_NAMES = {"40P01": "deadlock", "55P03": "lock_not_available", "40001": "serialization_failure"}
+OPERATIONS = ["price", "settle", "search"]
+
+
+class LatencyHistogram:
+    """
+    A mergeable histogram of latencies with logarithmic buckets.
+
+    Only bucket counts are stored, so histograms are cheap to send back from worker processes.
+    """
+
+    def __init__(self, counts: dict[int, int] | None = None):
+        """
+        Initializes the histogram.
+
+        Args:
+            counts (dict[int, int] | None): Existing bucket counts, keyed by bucket index.
+        """
+        self.counts: dict[int, int] = counts or {}
+
+    def record(self, seconds: float) -> None:
+        """
+        Records a latency.
+
+        Args:
+            seconds (float): The latency in seconds.
+        """
+        bucket = int(math.log(max(seconds * 1_000_000, 1.0)) / BUCKET_GROWTH)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        """
+        Adds the counts of another histogram to this one.
+
+        Args:
+            other (LatencyHistogram): The histogram to merge.
+        """
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+
+    @property
+    def total(self) -> int:
+        """
+        Returns the number of recorded latencies.
+
+        Returns:
+            int: The number of latencies.
+        """
+        return sum(self.counts.values())
+
+    @classmethod
+    def upper_bound(cls, bucket: int) -> float:
+        """
+        Returns the upper bound of a bucket.
+
+        Args:
+            bucket (int): The bucket index.
+
+        Returns:
+            float: The upper bound in milliseconds.
+        """
+        return math.exp((bucket + 1) * BUCKET_GROWTH) / 1000
+
+    def percentile(self, percent: float) -> float:
+        """
+        Returns the latency below which the given percentage of the latencies fall.
+
+        Args:
+            percent (float): The percentile to compute, between 0 and 100.
+
+        Returns:
+            float: The upper bound of the matching bucket in milliseconds, 0 if the histogram is empty.
+        """
+        total = self.total
+        if total == 0:
+            return 0.0
+        threshold = math.ceil(total * percent / 100)
+        cumulated = 0
+        for bucket in sorted(self.counts):
+            cumulated += self.counts[bucket]
+            if cumulated >= threshold:
+                return round(self.upper_bound(bucket), 3)
+        return round(self.upper_bound(max(self.counts)), 3)
+
+    def render(self, width: int = 40) -> str:
+        """
+        Renders the histogram as text bars.
+
+        Args:
+            width (int): The width of the longest bar.
+
+        Returns:
+            str: One line per non-empty bucket.
+        """
+        if self.total == 0:
+            return ""
+        peak = max(self.counts.values())
+        lines = []
+        for bucket in sorted(self.counts):
+            count = self.counts[bucket]
+            bar = "#" * max(1, round(count * width / peak))
+            lines.append(f"{self.upper_bound(bucket):>10.3f} ms | {bar} {count}")
+        return "\n".join(lines)
+
+
+class LoadTester:
+    """
+    A class running a mixed workload against the `modules` API from several processes.
+
+    Writes (`price`, `settle`) target a random sample of existing selections, so the
+    `is_active` triggers and the row locks on their parents are exercised concurrently
+    with the reads (`search` of the selections of a market).
+    """
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(
+        self,
+        workers: int = 4,
+        duration: float = 30.0,
+        rate: float = 0.0,
+        mix: dict[str, int] | None = None,
+        sample: int = 1000,
+        seed: int = 42,
+        optimistic: bool = False,
+    ):
+        """
+        Initializes the load tester.
+
+        Args:
+            workers (int): Number of worker processes.
+            duration (float): Duration of the test in seconds.
+            rate (float): Target number of operations per second for all workers, 0 for no limit.
+            mix (dict[str, int] | None): Weight of each operation (`price`, `settle`, `search`).
+            sample (int): Number of selections targeted by the workload.
+            seed (int): Seed of the random generators.
+            optimistic (bool): Whether the writes check the version of the selection and retry on a conflict.
+
+        Raises:
+            ValueError: If the mix contains an unknown operation.
+        """
+        unknown = set(mix or {}) - set(OPERATIONS)
+        if len(unknown) > 0:
+            raise ValueError(f"Unknown operation(s) {sorted(unknown)}, expected some of {OPERATIONS}")
+        self.workers = max(1, workers)
+        self.duration = duration
+        self.rate = rate
+        self.mix = mix or {"price": 60, "settle": 10, "search": 30}
+        self.sample = sample
+        self.seed = seed
+        self.optimistic = optimistic
+        self.histograms: dict[str, LatencyHistogram] = {}
+
+    def get_targets(self) -> list[tuple[UUID, UUID]]:
+        """
+        Picks a random sample of selections to target.
+
+        Returns:
+            list[tuple[UUID, UUID]]: The selection ids with their market id.
+        """
+        with DB.get_instance().get_session() as session:
+            rows = session.execute(
+                text("SELECT s.id, s.market_id FROM selection s ORDER BY random() LIMIT :limit"),
+                {"limit": self.sample},
+            ).all()
+        return [(row.id, row.market_id) for row in rows]
+
+    @staticmethod
+    def run_operation(operation: str, rng: random.Random, target: tuple[UUID, UUID], optimistic: bool = False) -> None:
+        """
+        Runs a single operation through the `modules` API.
+
+        Args:
+            operation (str): The operation to run (`price`, `settle` or `search`).
+            rng (random.Random): The random generator of the worker.
+            target (tuple[UUID, UUID]): The selection id and its market id.
+            optimistic (bool): Whether the writes check the version of the selection and retry on a conflict.
+        """
+        selection_id, market_id = target
+        data: dict | None = None
+        if operation == "price":
+            data = {"price": Decimal(f"{1.01 + rng.expovariate(0.25):.2f}"), "is_active": True}
+        elif operation == "settle":
+            data = {"outcome": rng.choice([outcome.value for outcome in SelectionOutcome]), "is_active": False}
+        if data is not None and optimistic:
+            Selection().modify(selection_id, lambda _: data)
+        elif data is not None:
+            Selection().upsert(selection_id, data)
+        else:
+            Selection().search([{"field": "market_id", "operator": "=", "value": str(market_id)}])
+
+    @staticmethod
+    def run_worker(config: dict) -> dict:
+        """
+        Runs the workload of a worker process until the end of the test.
+
+        Args:
+            config (dict): The worker settings (`index`, `seed`, `duration`, `interval`, `mix`, `targets`,
+                `optimistic`).
+
+        Returns:
+            dict: The histograms counts and error counters per operation.
+        """
+        rng = random.Random(config["seed"] + config["index"])
+        operations = list(config["mix"])
+        weights = list(config["mix"].values())
+        histograms = {operation: LatencyHistogram() for operation in operations}
+        errors: dict[str, dict[str, int]] = {operation: {} for operation in operations}
+        started_at = time.perf_counter()
+        next_at = started_at
+        while time.perf_counter() - started_at < config["duration"]:
+            if config["interval"] > 0:
+                # Open-loop pacing: keep the schedule even if an operation was slow
+                next_at += config["interval"]
+                delay = next_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            operation = rng.choices(operations, weights=weights)[0]
+            operation_started_at = time.perf_counter()
+            try:
+                LoadTester.run_operation(operation, rng, rng.choice(config["targets"]), config["optimistic"])
+            except VersionConflictError:
+                errors[operation]["version_conflict"] = errors[operation].get("version_conflict", 0) + 1
+            except SQLAlchemyError as error:
+                code = "other"
+                if isinstance(error, DBAPIError):
+                    code = getattr(error.orig, "pgcode", None) or "other"
+                    code = ERROR_NAMES.get(code, code)
+                errors[operation][code] = errors[operation].get(code, 0) + 1
+            histograms[operation].record(time.perf_counter() - operation_started_at)
+
+        return {
+            "histograms": {operation: histogram.counts for operation, histogram in histograms.items()},
+            "errors": errors,
+        }
+
+    def get_lock_stats(self) -> tuple[int, int]:
+        """
+        Reads the current lock waits and the cumulated deadlocks of the database.
+
+        Returns:
+            tuple[int, int]: The number of ungranted locks in `pg_locks` and the deadlock counter.
+        """
+        with DB.get_instance().get_session() as session:
+            row = session.execute(
+                text(
+                    "SELECT "
+                    "(SELECT count(*) FROM pg_locks l WHERE NOT l.granted AND l.database = d.oid) AS waiting, "
+                    "(SELECT s.deadlocks FROM pg_stat_database s WHERE s.datid = d.oid) AS deadlocks "
+                    "FROM pg_database d WHERE d.datname = current_database()"
+                )
+            ).one()
+        return row.waiting, row.deadlocks
+
+    def run(self) -> dict:
+        """
+        Runs the load test and aggregates the results of all workers.
+
+        Returns:
+            dict: The report with latency percentiles per operation, throughput, deadlocks and lock waits.
+                The full histograms are kept in `histograms`.
+
+        Raises:
+            ValueError: If there is no selection to target.
+        """
+        targets = self.get_targets()
+        if len(targets) == 0:
+            raise ValueError("No selection to target, load some data first (see the `generate` command)")
+
+        interval = self.workers / self.rate if self.rate > 0 else 0.0
+        configs = [
+            {
+                "index": index,
+                "seed": self.seed,
+                "duration": self.duration,
+                "interval": interval,
+                "mix": self.mix,
+                "targets": targets,
+                "optimistic": self.optimistic,
+            }
+            for index in range(self.workers)
+        ]
+        _, deadlocks_before = self.get_lock_stats()
+        lock_samples = []
+        started_at = time.perf_counter()
+        with multiprocessing.Pool(self.workers) as pool:
+            pending = pool.map_async(LoadTester.run_worker, configs)
+            # Sample pg_locks while the workers are running
+            while pending.ready() is False:
+                lock_samples.append(self.get_lock_stats()[0])
+                pending.wait(0.5)
+            results = pending.get()
+        elapsed = time.perf_counter() - started_at
+        _, deadlocks_after = self.get_lock_stats()
+
+        report: dict = {"operations": {}}
+        total = 0
+        for operation in self.mix:
+            histogram = LatencyHistogram()
+            errors: dict[str, int] = {}
+            for result in results:
+                histogram.merge(LatencyHistogram(result["histograms"][operation]))
+                for code, count in result["errors"][operation].items():
+                    errors[code] = errors.get(code, 0) + count
+            total += histogram.total
+            report["operations"][operation] = {
+                "count": histogram.total,
+                "errors": errors,
+                "p50_ms": histogram.percentile(50),
+                "p95_ms": histogram.percentile(95),
+                "p99_ms": histogram.percentile(99),
+            }
+            self.histograms[operation] = histogram
+        report["elapsed"] = round(elapsed, 2)
+        report["throughput"] = round(total / elapsed, 1)
+        report["deadlocks"] = deadlocks_after - deadlocks_before
+        report["lock_waits"] = {
+            "max": max(lock_samples, default=0),
+            "avg": round(sum(lock_samples) / max(len(lock_samples), 1), 2),
+        }
+        return report
@@ -0,0 +1,587 @@
+"""
+In-memory storage module.
+
+Implements the storage interface with dicts and indexes instead of a database, so the
+modules run without any I/O: for fast test suites, dry runs of the feeds and benchmarks
+measuring the Python overhead apart from the database time. Nothing is persisted, the
+data lives as long as the process.
+"""
+
+import re
+import threading
+from collections.abc import Callable, Iterable
+from datetime import datetime, timezone
+from decimal import ROUND_HALF_UP, Decimal
+from enum import Enum
+from typing import Any, TextIO
+from uuid import UUID
+
+from sqlalchemy import Column
+from sqlalchemy.orm import DeclarativeMeta
+from sqlalchemy.types import Boolean, DateTime
+from sqlalchemy.types import Enum as EnumType
+from sqlalchemy.types import Integer, Numeric, String, Uuid
+
+from .db import VersionConflictError
+from .decorators import Singleton
+from .serializers import RowSerializer
+from .storage import StorageInterface
+
+# Spellings of the booleans accepted by PostgreSQL
+TRUE_VALUES = ["t", "true", "y", "yes", "on", "1"]
+FALSE_VALUES = ["f", "false", "n", "no", "off", "0"]
+
+Row = dict[str, Any]  # A stored row, by column name
+
+
+def like_to_regex(pattern: str, flags: int = 0) -> re.Pattern:
+    """
+    Compiles a LIKE pattern to a regular expression.
+
+    Args:
+        pattern (str): The LIKE pattern, `%` matching any string, `_` any character and `\\` escaping them.
+        flags (int): The flags of the regular expression, `re.IGNORECASE` for ILIKE.
+
+    Returns:
+        re.Pattern: The regular expression matching the whole value.
+    """
+    parts = []
+    escaped = False
+    for char in pattern:
+        if escaped:
+            parts.append(re.escape(char))
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == "%":
+            parts.append(".*")
+        elif char == "_":
+            parts.append(".")
+        else:
+            parts.append(re.escape(char))
+    return re.compile("".join(parts), flags | re.DOTALL)
+
+
+@Singleton
+class MemoryStorage(StorageInterface):
+    """
+    Singleton class storing the rows of the models in memory.
+
+    The rows of a table are held in a dict by id, next to an index per unique column (the
+    slugs) and an index of the children ids per parent id. The constraints of the schema are
+    checked on write (types, lengths, not null, unique and foreign keys), and the triggers of
+    `init_db.py` are emulated: a parent without an active child left is deactivated, and the
+    children of a deactivated resource are deactivated, both rules cascading along the hierarchy.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty storage.
+        """
+        self.__lock = threading.RLock()
+        self.__models: dict[str, DeclarativeMeta] = {}
+        # Child tables of each table, with the column holding the id of the parent
+        self.__children: dict[str, list[tuple[str, str]]] = {}
+        # Parent table of each table, with the column holding the id of the parent, None for a sport
+        self.__parents: dict[str, tuple[str, str] | None] = {}
+        self.__rows: dict[str, dict[UUID, Row]] = {}
+        # Ids by value, per table and unique column
+        self.__unique: dict[str, dict[str, dict[Any, UUID]]] = {}
+        # Ids of the children by parent id, per child table (a dict keeps the insertion order)
+        self.__by_parent: dict[str, dict[UUID, dict[UUID, None]]] = {}
+
+    @staticmethod
+    def get_instance():
+        """
+        Returns the singleton instance of the MemoryStorage class.
+
+        Returns:
+            MemoryStorage: The singleton instance.
+        """
+
+    def clear(self) -> None:
+        """
+        Deletes every row, e.g. between two tests.
+        """
+        with self.__lock:
+            for table, rows in self.__rows.items():
+                rows.clear()
+                self.__by_parent[table].clear()
+                for index in self.__unique[table].values():
+                    index.clear()
+
+    def register(self, model: DeclarativeMeta) -> str:
+        """
+        Registers a model, creating its table and indexes on first use.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model.
+
+        Returns:
+            str: The name of the table.
+        """
+        table = model.__tablename__
+        if table in self.__models:
+            return table
+        with self.__lock:
+            if table not in self.__models:
+                self.__children.setdefault(table, [])
+                self.__rows[table] = {}
+                self.__by_parent[table] = {}
+                self.__unique[table] = {column.name: {} for column in model.__table__.columns if column.unique}
+                foreign_key = next(iter(model.__table__.foreign_keys), None)
+                parent = None if foreign_key is None else (foreign_key.column.table.name, foreign_key.parent.name)
+                self.__parents[table] = parent
+                if parent is not None:
+                    parent_table, key = parent
+                    self.__children.setdefault(parent_table, []).append((table, key))
+                # Registered last, a table being used once it is complete
+                self.__models[table] = model
+        return table
+
+    @classmethod
+    def convert(cls, column: Column, value: Any) -> Any:
+        """
+        Converts a value to the type of a column, as PostgreSQL casts a parameter.
+
+        Args:
+            column (Column): The column.
+            value (Any): The value.
+
+        Returns:
+            Any: The value as stored: UUID, name of the enum, Decimal at the scale of the column, int, bool, aware
+                datetime or str.
+
+        Raises:
+            ValueError: If the value cannot be converted.
+        """
+        if value is None:
+            return None
+        column_type = column.type
+        try:
+            if isinstance(column_type, Uuid):
+                return value if isinstance(value, UUID) else UUID(str(value))
+            if isinstance(column_type, EnumType):
+                name = value.name if isinstance(value, Enum) else str(value)
+                if name not in column_type.enums:
+                    raise ValueError(f"expected one of {column_type.enums}")
+                return name
+            if isinstance(column_type, Numeric):
+                number = Decimal(str(value))
+                return (
+                    number
+                    if column_type.scale is None
+                    else number.quantize(Decimal(1).scaleb(-column_type.scale), ROUND_HALF_UP)
+                )
+            if isinstance(column_type, Boolean):
+                if isinstance(value, bool):
+                    return value
+                if str(value).strip().lower() not in TRUE_VALUES + FALSE_VALUES:
+                    raise ValueError("expected a boolean")
+                return str(value).strip().lower() in TRUE_VALUES
+            if isinstance(column_type, Integer):
+                return int(value)
+            if isinstance(column_type, DateTime):
+                moment = value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+                # A timestamp without time zone is read as UTC, the time zone of the sessions
+                return moment.replace(tzinfo=timezone.utc) if moment.tzinfo is None else moment.astimezone(timezone.utc)
+            if isinstance(column_type, String):
+                return str(value)
+        except (ValueError, TypeError, ArithmeticError) as error:
+            raise ValueError(f"Invalid value {value!r} for {column.table.name}.{column.name}: {error}") from error
+        return value
+
+    def get_condition(self, column: Column, operator: str, value: Any) -> Callable[[Row], bool]:
+        """
+        Builds the predicate of a search criterion, with the semantics of the SQL condition built by `DB`.
+
+        Args:
+            column (Column): The column filtered.
+            operator (str): The SQL operator, as returned by `get_operators`.
+            value (Any): The value compared, a list for `in` and `not in`.
+
+        Returns:
+            Callable[[Row], bool]: The predicate, False when the stored value is NULL.
+
+        Raises:
+            ValueError: If the operator is not supported or the value cannot be converted.
+        """
+        name = column.name
+        if operator in ["in", "not in"]:
+            values = {self.convert(column, item) for item in (value if isinstance(value, list) else [value])}
+            negated = operator == "not in"
+            return lambda row: row[name] is not None and (row[name] in values) is not negated
+        if operator in ["like", "ilike", "not like", "not ilike"]:
+            pattern = like_to_regex(f"%{value}%", re.IGNORECASE if "ilike" in operator else 0)
+            negated = operator.startswith("not")
+            return lambda row: row[name] is not None and (pattern.fullmatch(str(row[name])) is None) is negated
+        if operator in ["~", "~*", "!~", "!~*"]:
+            regex = re.compile(str(value), re.IGNORECASE if operator.endswith("*") else 0)
+            negated = operator.startswith("!")
+            return lambda row: row[name] is not None and (regex.search(str(row[name])) is None) is negated
+        comparisons: dict[str, Callable[[Any, Any], bool]] = {
+            "=": lambda stored, expected: stored == expected,
+            ">": lambda stored, expected: stored > expected,
+            "<": lambda stored, expected: stored < expected,
+            ">=": lambda stored, expected: stored >= expected,
+            "<=": lambda stored, expected: stored <= expected,
+        }
+        if operator not in comparisons:
+            raise ValueError(f"Unsupported operator {operator} on {column.table.name}.{name}")
+        compare, expected = comparisons[operator], self.convert(column, value)
+        if isinstance(column.type, EnumType):
+            # The values of an enum are ordered as declared, not alphabetically
+            order = {item: position for position, item in enumerate(column.type.enums)}
+            return lambda row: row[name] is not None and compare(order[row[name]], order[expected])
+        return lambda row: row[name] is not None and compare(row[name], expected)
+
+    def select(self, model: DeclarativeMeta, data: list[dict[str, str | int | float | bool]]) -> list[Row]:
+        """
+        Selects the rows matching search criteria.
+
+        The criteria are skipped as by `DB.build_where`: unknown field, NULL value or unknown operator. An
+        equality on the id, a unique column or the parent id narrows the rows read through its index.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model.
+            data (list[dict]): The data to filter by.
+
+        Returns:
+            list[Row]: The matching rows, in insertion order.
+        """
+        table = self.register(model)
+        columns = model.__table__.columns
+        parent = self.__parents[table]
+        conditions = []
+        candidates: Iterable[UUID] | None = None
+        for obj in data:
+            if obj.get("field", None) not in columns.keys() or obj.get("value", None) is None:
+                continue
+            operator = self.get_operators(obj.get("operator", None))
+            if operator is None:
+                continue
+            column = columns[obj["field"]]
+            conditions.append(self.get_condition(column, operator, obj["value"]))
+            if candidates is not None or operator != "=":
+                continue
+            if column.name == "id":
+                candidates = [self.convert(column, obj["value"])]
+            elif column.name in self.__unique[table]:
+                uuid = self.__unique[table][column.name].get(self.convert(column, obj["value"]))
+                candidates = [] if uuid is None else [uuid]
+            elif parent is not None and column.name == parent[1]:
+                candidates = self.__by_parent[table].get(self.convert(column, obj["value"]), {})
+
+        rows = self.__rows[table]
+        if candidates is None:
+            selected: Iterable[Row] = rows.values()
+        else:
+            selected = (rows[uuid] for uuid in candidates if uuid in rows)
+        return [row for row in selected if all(condition(row) for condition in conditions)]
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments,unused-argument
+    def search(
+        self,
+        model: DeclarativeMeta,
+        prefix: str,
+        data: list[dict[str, str | int | float | bool]],
+        fields: list[str] | None = None,
+        include_archived: bool = False,
+    ) -> list:
+        """
+        Runs a search and converts its rows to JSON objects, with the serializer of `DB.search`.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model to search.
+            prefix (str): Ignored, no SQL is built.
+            data (list[dict]): The data to filter by.
+            fields (list[str] | None): The columns to serialize, all of them when None.
+            include_archived (bool): Ignored, nothing is archived in memory.
+
+        Returns:
+            list: The JSON objects of the matching rows.
+
+        Raises:
+            ValueError: If a field is not a column of the model.
+        """
+        serializer = RowSerializer.get(model, fields)
+        with self.__lock:
+            rows = [tuple(map(row.__getitem__, serializer.fields)) for row in self.select(model, data)]
+        return serializer.serialize(rows, serializer.fields)
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments,unused-argument
+    def export(
+        self,
+        model: DeclarativeMeta,
+        prefix: str,
+        data: list[dict[str, str | int | float | bool]],
+        output: TextIO,
+        fields: list[str] | None = None,
+        include_archived: bool = False,
+    ) -> int:
+        """
+        Runs a search and writes its rows to an output buffer as JSON lines.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model to search.
+            prefix (str): Ignored, no SQL is built.
+            data (list[dict]): The data to filter by.
+            output (TextIO): The buffer to write to.
+            fields (list[str] | None): The columns to write, all of them when None.
+            include_archived (bool): Ignored, nothing is archived in memory.
+
+        Returns:
+            int: The number of rows written.
+
+        Raises:
+            ValueError: If a field is not a column of the model.
+        """
+        serializer = RowSerializer.get(model, fields)
+        with self.__lock:
+            rows = [tuple(map(row.__getitem__, serializer.fields)) for row in self.select(model, data)]
+        return serializer.write(rows, serializer.fields, output)
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments,unused-argument
+    def get_many(
+        self,
+        model: DeclarativeMeta,
+        prefix: str,
+        ids: list[UUID],
+        fields: list[str] | None = None,
+        include_archived: bool = False,
+    ) -> tuple[list, list[UUID]]:
+        """
+        Fetches resources by their UUIDs.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model to fetch.
+            prefix (str): Ignored, no SQL is built.
+            ids (list[UUID]): The UUIDs to fetch.
+            fields (list[str] | None): The columns to serialize, all of them when None.
+            include_archived (bool): Ignored, nothing is archived in memory.
+
+        Returns:
+            tuple[list, list[UUID]]: The JSON objects found, in the order of the UUIDs, and the UUIDs not found.
+
+        Raises:
+            ValueError: If a field is not a column of the model.
+        """
+        serializer = RowSerializer.get(model, fields)
+        convert = serializer.get_converter(serializer.fields)
+        table = self.register(model)
+        with self.__lock:
+            rows = self.__rows[table]
+            results = [convert(tuple(map(rows[uuid].__getitem__, serializer.fields))) for uuid in ids if uuid in rows]
+            missing = [uuid for uuid in dict.fromkeys(ids) if uuid not in rows]
+        return results, missing
+
+    # pylint: disable=unused-argument
+    def count(
+        self,
+        model: DeclarativeMeta,
+        prefix: str,
+        data: list[dict[str, str | int | float | bool]],
+        approximate: bool = False,
+    ) -> int:
+        """
+        Counts the rows matching the search criteria.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model to count.
+            prefix (str): Ignored, no SQL is built.
+            data (list[dict]): The data to filter by.
+            approximate (bool): Ignored, the count is always exact.
+
+        Returns:
+            int: The number of matching rows.
+        """
+        with self.__lock:
+            return len(self.select(model, data))
+
+    def check(self, table: str, row: Row, changed: Iterable[str]) -> None:
+        """
+        Checks the constraints of the schema on the changed columns of a row.
+
+        Args:
+            table (str): The name of the table.
+            row (Row): The row as it would be stored.
+            changed (Iterable[str]): The columns written.
+
+        Raises:
+            ValueError: If a value is too long, NULL in a NOT NULL column, already used in a unique column,
+                or references a parent which does not exist.
+        """
+        columns = self.__models[table].__table__.columns
+        for name in changed:
+            column, value = columns[name], row[name]
+            if value is None and column.nullable is False:
+                raise ValueError(f"The column {table}.{name} cannot be null")
+            length = getattr(column.type, "length", None)
+            if isinstance(value, str) and length is not None and len(value) > length:
+                raise ValueError(f"The value of {table}.{name} is longer than {length} characters")
+            if name in self.__unique[table] and self.__unique[table][name].get(value, row["id"]) != row["id"]:
+                raise ValueError(f"The {name} {value} is already used by another {table}")
+            for foreign_key in column.foreign_keys:
+                if value not in self.__rows.get(foreign_key.column.table.name, {}):
+                    raise ValueError(f"The {foreign_key.column.table.name} {value} of the {table} does not exist")
+
+    def index(self, table: str, row: Row, indexed: bool) -> None:
+        """
+        Adds a row to the indexes of its table, or removes it.
+
+        Args:
+            table (str): The name of the table.
+            row (Row): The row.
+            indexed (bool): Whether the row is added, otherwise removed.
+        """
+        for name, index in self.__unique[table].items():
+            if indexed and row[name] is not None:
+                index[row[name]] = row["id"]
+            elif indexed is False:
+                index.pop(row[name], None)
+        parent = self.__parents[table]
+        if parent is not None and indexed:
+            self.__by_parent[table].setdefault(row[parent[1]], {})[row["id"]] = None
+        elif parent is not None:
+            children = self.__by_parent[table].get(row[parent[1]], {})
+            children.pop(row["id"], None)
+            if len(children) == 0:
+                self.__by_parent[table].pop(row[parent[1]], None)
+
+    def set_active(self, table: str, uuid: UUID, is_active: bool) -> None:
+        """
+        Sets the `is_active` of a resource as the triggers do: a version but no `updated_at` bump.
+
+        Args:
+            table (str): The name of the table.
+            uuid (UUID): The UUID of the resource.
+            is_active (bool): The new value.
+        """
+        row = self.__rows[table].get(uuid)
+        if row is not None and row["is_active"] != is_active:
+            row["is_active"] = is_active
+            row["version"] += 1
+            self.cascade(table, row, False)
+
+    def cascade(self, table: str, row: Row, inserted: bool) -> None:
+        """
+        Applies the `is_active` rules of the triggers after a row is inserted or its `is_active` changed.
+
+        Args:
+            table (str): The name of the table.
+            row (Row): The row written.
+            inserted (bool): Whether the row has been inserted, the children being only deactivated on update.
+        """
+        parent = self.__parents[table]
+        if parent is not None:
+            parent_table, key = parent
+            siblings = self.__by_parent[table].get(row[key], {})
+            if not any(self.__rows[table][uuid]["is_active"] is True for uuid in siblings):
+                self.set_active(parent_table, row[key], False)
+        if inserted is False and row["is_active"] is False:
+            for child_table, key in self.__children[table]:
+                for uuid in list(self.__by_parent[child_table].get(row["id"], {})):
+                    self.set_active(child_table, uuid, False)
+
+    def insert(self, model: DeclarativeMeta, uuid: UUID, values: dict) -> None:
+        """
+        Inserts a row, the missing columns taking the defaults of the model.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model.
+            uuid (UUID): The UUID of the resource.
+            values (dict): The converted values by column name.
+
+        Raises:
+            ValueError: If a constraint of the schema is not met.
+        """
+        table = model.__tablename__
+        now = datetime.now(timezone.utc)
+        row: Row = {}
+        for column in model.__table__.columns:
+            default = column.default
+            if column.name in values:
+                row[column.name] = values[column.name]
+            elif default is not None and default.is_scalar:
+                row[column.name] = default.arg
+            elif default is not None and default.is_clause_element:
+                # The SQL defaults of the models are all `now()`
+                row[column.name] = now
+            else:
+                row[column.name] = None
+        row["id"] = uuid
+        self.check(table, row, row.keys())
+        self.__rows[table][uuid] = row
+        self.index(table, row, True)
+        self.cascade(table, row, True)
+
+    def upsert(self, model: DeclarativeMeta, uuid: UUID, values: dict, version: int | None = None) -> bool:
+        """
+        Upserts a resource, skipping the write when nothing changed, with the semantics of `DB.upsert`.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model.
+            uuid (UUID): The UUID of the resource.
+            values (dict): The values by column name, as returned by `get_upsert_values`.
+            version (int | None): The version the resource is expected to have, None to write whatever its version.
+
+        Returns:
+            bool: Whether the resource has been inserted or updated.
+
+        Raises:
+            VersionConflictError: If the stored version is not the expected one, or the resource does not exist.
+            ValueError: If a value is invalid or a constraint of the schema is not met.
+        """
+        table = self.register(model)
+        columns = model.__table__.columns
+        converted = {key: self.convert(columns[key], value) for key, value in values.items()}
+        with self.__lock:
+            row = self.__rows[table].get(uuid)
+            current = None if row is None else row["version"]
+            if version is not None and current != version:
+                raise VersionConflictError(table, uuid, version, current)
+            if row is None:
+                self.insert(model, uuid, converted)
+                return True
+            changed = [key for key, value in converted.items() if row[key] != value]
+            if len(changed) == 0:
+                return False
+            updated = {**row, **converted, "version": current + 1}
+            if "updated_at" not in converted:
+                updated["updated_at"] = datetime.now(timezone.utc)
+            self.check(table, updated, changed)
+            self.index(table, row, False)
+            was_active = row["is_active"]
+            row.update(updated)
+            self.index(table, row, True)
+            if row["is_active"] != was_active:
+                self.cascade(table, row, False)
+        return True
+
+    def remove(self, table: str, uuid: UUID) -> None:
+        """
+        Removes a row and its descendants, as the foreign keys cascade.
+
+        Args:
+            table (str): The name of the table.
+            uuid (UUID): The UUID of the row.
+        """
+        row = self.__rows[table].pop(uuid, None)
+        if row is None:
+            return
+        self.index(table, row, False)
+        for child_table, _ in self.__children[table]:
+            for child in list(self.__by_parent[child_table].get(uuid, {})):
+                self.remove(child_table, child)
+
+    def delete(self, model: DeclarativeMeta, uuid: UUID) -> None:
+        """
+        Deletes a resource by its UUID, with its descendants.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model.
+            uuid (UUID): The UUID of the resource to delete.
+        """
+        table = self.register(model)
+        with self.__lock:
+            self.remove(table, uuid)
@@ -5,6 +5,7 @@ Provides methods to validate UUIDs, JSON strings, and specific argument types.
 """
 
 import json
+import sys
 from argparse import ArgumentTypeError
 from uuid import UUID
 
@@ -69,3 +70,130 @@ class TypeParser:
         if arg_type not in ["sport", "event", "selection", "market"]:
             raise ArgumentTypeError("Invalid type")
         return arg_type
+
+    @classmethod
+    def check_types(cls, arg_types: str) -> list[str]:
+        """
+        Validates a list of comma-separated types.
+
+        Args:
+            arg_types (str): The input types to validate, e.g. `sport,event,market`.
+
+        Returns:
+            list[str]: The validated types, without duplicates.
+
+        Raises:
+            ArgumentTypeError: If a type is not in the allowed scope.
+        """
+        return list(dict.fromkeys(cls.check_type(arg_type.strip()) for arg_type in arg_types.split(",")))
+
+    @classmethod
+    def check_mix(cls, mix_str: str) -> dict[str, int]:
+        """
+        Validates a workload mix formatted as comma-separated `operation=weight` pairs.
+
+        Args:
+            mix_str (str): The input string to validate, e.g. `price=60,settle=10,search=30`.
+
+        Returns:
+            dict[str, int]: The weight of each operation.
+
+        Raises:
+            ArgumentTypeError: If a pair is malformed or a weight is not a positive integer.
+        """
+        mix = {}
+        for pair in mix_str.split(","):
+            operation, _, weight = pair.partition("=")
+            if weight.strip().isdigit() is False or int(weight) <= 0:
+                raise ArgumentTypeError(f"Invalid mix entry: {pair}")
+            mix[operation.strip()] = int(weight)
+        return mix
+
+    @classmethod
+    def check_fields(cls, fields_str: str) -> list[str]:
+        """
+        Validates a list of fields formatted as comma-separated names.
+
+        Args:
+            fields_str (str): The input string to validate, e.g. `name,price`.
+
+        Returns:
+            list[str]: The field names, without duplicates.
+
+        Raises:
+            ArgumentTypeError: If a field name is empty.
+        """
+        fields = [field.strip() for field in fields_str.split(",")]
+        if "" in fields:
+            raise ArgumentTypeError(f"Invalid fields: {fields_str}")
+        return list(dict.fromkeys(fields))
+
+    @classmethod
+    def check_metrics(cls, metrics_str: str) -> list[tuple[str, str | None]]:
+        """
+        Validates a list of aggregates formatted as comma-separated `function[:column]` entries.
+
+        Args:
+            metrics_str (str): The input string to validate, e.g. `count,min:price,avg:price`.
+
+        Returns:
+            list[tuple[str, str | None]]: Each function with its column, None when there is no column.
+
+        Raises:
+            ArgumentTypeError: If an entry is malformed.
+        """
+        metrics = []
+        for entry in metrics_str.split(","):
+            function, _, column = entry.strip().partition(":")
+            if function == "" or (_ != "" and column == ""):
+                raise ArgumentTypeError(f"Invalid metric: {entry}")
+            metrics.append((function.lower(), column or None))
+        return metrics
+
+    @classmethod
+    def check_uuid_file(cls, path: str) -> list[UUID]:
+        """
+        Reads and validates UUIDs from a file, one per line, `-` standing for the standard input.
+
+        Args:
+            path (str): The path of the file.
+
+        Returns:
+            list[UUID]: The UUIDs, blank lines being ignored.
+
+        Raises:
+            ArgumentTypeError: If the file cannot be read or a line is not a valid UUID.
+        """
+        try:
+            if path == "-":
+                lines = sys.stdin.readlines()
+            else:
+                with open(path, encoding="utf-8") as file:
+                    lines = file.readlines()
+        except OSError as error:
+            raise ArgumentTypeError(f"Cannot read {path}: {error}") from error
+        return [cls.check_uuid(line) for line in lines if line.strip() != ""]
+
+    @classmethod
+    def check_json_file(cls, path: str) -> dict | list:
+        """
+        Reads and parses a JSON file, `-` standing for the standard input.
+
+        Args:
+            path (str): The path of the file.
+
+        Returns:
+            dict | list: The parsed JSON object.
+
+        Raises:
+            ArgumentTypeError: If the file cannot be read or is not valid JSON.
+        """
+        try:
+            if path == "-":
+                return json.load(sys.stdin)
+            with open(path, encoding="utf-8") as file:
+                return json.load(file)
+        except OSError as error:
+            raise ArgumentTypeError(f"Cannot read {path}: {error}") from error
+        except json.JSONDecodeError as error:
+            raise ArgumentTypeError(f"Invalid JSON in {path}: {error}") from error
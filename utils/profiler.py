@@ -0,0 +1,139 @@
+"""
+Profiling utility.
+
+Attributes the wall time of a command to its phases (import, parse, connect, execute,
+serialize, output) and optionally collects cProfile statistics and peak memory.
+"""
+
+import cProfile
+import threading
+import time
+import tracemalloc
+from collections.abc import Generator
+from contextlib import contextmanager
+
+from .decorators import Singleton
+
+PHASES = ["import", "parse", "connect", "execute", "serialize", "output"]
+# Number of allocation sites written in the memory dump
+TOP_ALLOCATIONS = 20
+
+
+@Singleton
+class Profiler:
+    """
+    Singleton class measuring the time spent in each phase of a command.
+
+    Phases are always measured since it only costs two clock reads; nested phases are
+    subtracted from their parent, so the time of each phase is exclusive.
+    """
+
+    def __init__(self):
+        """
+        Initializes the profiler with no phase recorded.
+        """
+        self.phases: dict[str, float] = {}
+        self.peak_memory: int | None = None
+        self.__lock = threading.Lock()
+        self.__local = threading.local()
+        self.__profile: cProfile.Profile | None = None
+        self.__output: str | None = None
+
+    @staticmethod
+    def get_instance():
+        """
+        Returns the singleton instance of the Profiler class.
+
+        Returns:
+            Profiler: The singleton instance.
+        """
+
+    def add(self, name: str, seconds: float) -> None:
+        """
+        Adds time to a phase.
+
+        Args:
+            name (str): The name of the phase.
+            seconds (float): The time to add, in seconds.
+        """
+        with self.__lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name: str) -> Generator[None, None, None]:
+        """
+        Context manager measuring the exclusive time of a phase.
+
+        Args:
+            name (str): The name of the phase.
+        """
+        # Each thread keeps its own stack of the time spent in nested phases
+        if hasattr(self.__local, "stack") is False:
+            self.__local.stack = []
+        stack = self.__local.stack
+        started_at = time.perf_counter()
+        stack.append(0.0)
+        try:
+            yield
+        finally:
+            nested = stack.pop()
+            elapsed = time.perf_counter() - started_at
+            if len(stack) > 0:
+                stack[-1] += elapsed
+            self.add(name, elapsed - nested)
+
+    def start(self, output: str | None = None, memory: bool = False) -> None:
+        """
+        Starts the optional collectors.
+
+        Args:
+            output (str | None): Path where the cProfile statistics are dumped, None to disable cProfile.
+            memory (bool): Whether to trace the memory allocations with tracemalloc.
+        """
+        self.__output = output
+        if memory:
+            tracemalloc.start()
+        if output is not None:
+            self.__profile = cProfile.Profile()
+            self.__profile.enable()
+
+    def stop(self) -> None:
+        """
+        Stops the collectors and dumps their results.
+
+        The cProfile statistics are written to the output path (readable with `pstats`) and,
+        when memory is traced, the top allocation sites to the same path suffixed by `.memory`.
+        """
+        if self.__profile is not None:
+            self.__profile.disable()
+            self.__profile.dump_stats(self.__output)
+        if tracemalloc.is_tracing():
+            self.peak_memory = tracemalloc.get_traced_memory()[1]
+            if self.__output is not None:
+                statistics = tracemalloc.take_snapshot().statistics("lineno")[:TOP_ALLOCATIONS]
+                with open(f"{self.__output}.memory", "w", encoding="utf-8") as dump:
+                    dump.write(f"Peak memory: {self.peak_memory} bytes\n")
+                    dump.writelines(f"{statistic}\n" for statistic in statistics)
+            tracemalloc.stop()
+
+    def report(self, total: float) -> str:
+        """
+        Formats the time spent per phase.
+
+        Args:
+            total (float): The wall time of the whole command, in seconds.
+
+        Returns:
+            str: A table with the time and share of each phase.
+        """
+        names = PHASES + [name for name in self.phases if name not in PHASES]
+        lines = [f"{'phase':<12}{'ms':>12}{'%':>8}"]
+        for name in names:
+            seconds = self.phases.get(name, 0.0)
+            lines.append(f"{name:<12}{seconds * 1000:>12.3f}{seconds * 100 / max(total, 1e-9):>8.1f}")
+        other = total - sum(self.phases.values())
+        lines.append(f"{'other':<12}{other * 1000:>12.3f}{other * 100 / max(total, 1e-9):>8.1f}")
+        lines.append(f"{'total':<12}{total * 1000:>12.3f}{100:>8.1f}")
+        if self.peak_memory is not None:
+            lines.append(f"peak memory: {self.peak_memory / 1024 / 1024:.2f} MiB")
+        return "\n".join(lines)
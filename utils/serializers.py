@@ -0,0 +1,234 @@
+"""
+Row serialization module.
+
+Builds, once per model and projection, a converter turning raw cursor tuples into JSON
+objects, without building ORM objects nor formatting the same timestamp twice.
+"""
+
+import json
+from collections.abc import Callable, Iterable, Sequence
+from datetime import datetime
+from enum import Enum
+from operator import itemgetter
+from typing import TextIO
+
+from sqlalchemy.orm import DeclarativeMeta
+from sqlalchemy.types import DateTime
+from sqlalchemy.types import Enum as EnumType
+from sqlalchemy.types import Numeric, Uuid
+
+# Format of the timestamps, same as the `obj_to_json` methods of the models
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M"
+# Maximum number of formatted timestamps kept in cache (one per minute)
+TIMESTAMP_CACHE_SIZE = 100_000
+# Number of lines joined before each write to the output buffer
+WRITE_BATCH_SIZE = 1000
+
+
+class TimestampCache:
+    """
+    Caches the formatting of timestamps at the minute precision of `TIMESTAMP_FORMAT`.
+
+    Rows written in the same minute share their formatted timestamp, so `strftime` is only
+    called once per distinct minute.
+    """
+
+    cache: dict[int, str] = {}
+
+    @classmethod
+    def format(cls, value: datetime) -> str:
+        """
+        Formats a timestamp.
+
+        Args:
+            value (datetime): The timestamp to format.
+
+        Returns:
+            str: The formatted timestamp.
+        """
+        key = value.toordinal() * 1440 + value.hour * 60 + value.minute
+        formatted = cls.cache.get(key)
+        if formatted is None:
+            if len(cls.cache) >= TIMESTAMP_CACHE_SIZE:
+                cls.cache.clear()
+            formatted = cls.cache[key] = value.strftime(TIMESTAMP_FORMAT)
+        return formatted
+
+
+def to_enum_value(value: Enum | str) -> str:
+    """
+    Converts an enum to its value, raw cursors already return the value.
+
+    Args:
+        value (Enum | str): The enum or its value.
+
+    Returns:
+        str: The value of the enum.
+    """
+    return value.value if isinstance(value, Enum) else value
+
+
+class RowSerializer:
+    """
+    A serializer converting the rows of a model to JSON objects.
+
+    The converter of each row is built from `__table__.columns`: every column gets a
+    dedicated conversion (UUID to `str`, timestamp to cached string, numeric to `float`,
+    enum to its value) and the columns which cannot be null skip the `None` check.
+    """
+
+    __serializers: dict[tuple[str, tuple[str, ...]], "RowSerializer"] = {}
+
+    def __init__(self, model: DeclarativeMeta, fields: Sequence[str] | None = None):
+        """
+        Initializes the serializer of a model.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model of the rows.
+            fields (Sequence[str] | None): The columns to keep, all of them when None.
+
+        Raises:
+            ValueError: If a field is not a column of the model.
+        """
+        columns = model.__table__.columns
+        unknown = [field for field in fields or [] if field not in columns]
+        if len(unknown) > 0:
+            raise ValueError(f"Unknown field(s) {unknown} for {model.__tablename__}, expected some of {columns.keys()}")
+        self.model = model
+        self.fields = list(fields or columns.keys())
+        self.__converters: dict[tuple[str, ...], Callable[[Sequence], dict]] = {}
+
+    @classmethod
+    def get(cls, model: DeclarativeMeta, fields: Sequence[str] | None = None) -> "RowSerializer":
+        """
+        Returns the serializer of a model and projection, creating it once.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model of the rows.
+            fields (Sequence[str] | None): The columns to keep, all of them when None.
+
+        Returns:
+            RowSerializer: The serializer.
+        """
+        key = (model.__tablename__, tuple(fields or []))
+        if key not in cls.__serializers:
+            cls.__serializers[key] = cls(model, fields)
+        return cls.__serializers[key]
+
+    @classmethod
+    def get_conversion(cls, column_type) -> Callable | None:
+        """
+        Returns the conversion of a column type.
+
+        Args:
+            column_type: The SQLAlchemy type of the column.
+
+        Returns:
+            Callable | None: The function converting a value, None when the value is kept as is.
+        """
+        if isinstance(column_type, Uuid):
+            return str
+        if isinstance(column_type, DateTime):
+            return TimestampCache.format
+        if isinstance(column_type, EnumType):
+            return to_enum_value
+        if isinstance(column_type, Numeric):
+            return float
+        return None
+
+    def compile(self, keys: Sequence[str]) -> Callable[[Sequence], dict]:
+        """
+        Builds the converter of the rows returned with the given columns.
+
+        Args:
+            keys (Sequence[str]): The names of the columns of the rows, in cursor order.
+
+        Returns:
+            Callable[[Sequence], dict]: The function converting a row to a JSON object.
+
+        Raises:
+            ValueError: If a field of the serializer is missing from the rows.
+        """
+        positions = {key: index for index, key in enumerate(keys)}
+        missing = [field for field in self.fields if field not in positions]
+        if len(missing) > 0:
+            raise ValueError(f"Field(s) {missing} missing from the rows")
+
+        names = tuple(self.fields)
+        indexes = [positions[field] for field in names]
+        # A single item getter returns the value instead of a tuple
+        pick = itemgetter(*indexes) if len(indexes) > 1 else lambda row: (row[indexes[0]],)
+        # Conversions by position in the JSON object, the columns which cannot be null skipping the None check
+        conversions: list[tuple[int, Callable]] = []
+        nullable_conversions: list[tuple[int, Callable]] = []
+        for index, field in enumerate(names):
+            column = self.model.__table__.columns[field]
+            conversion = self.get_conversion(column.type)
+            if conversion is not None:
+                (conversions if column.nullable is False else nullable_conversions).append((index, conversion))
+
+        def convert(row: Sequence) -> dict:
+            values = list(pick(row))
+            for index, conversion in conversions:
+                values[index] = conversion(values[index])
+            for index, conversion in nullable_conversions:
+                if values[index] is not None:
+                    values[index] = conversion(values[index])
+            return dict(zip(names, values))
+
+        return convert
+
+    def get_converter(self, keys: Sequence[str]) -> Callable[[Sequence], dict]:
+        """
+        Returns the converter of the rows returned with the given columns, compiling it once.
+
+        Args:
+            keys (Sequence[str]): The names of the columns of the rows, in cursor order.
+
+        Returns:
+            Callable[[Sequence], dict]: The function converting a row to a JSON object.
+        """
+        keys = tuple(keys)
+        if keys not in self.__converters:
+            self.__converters[keys] = self.compile(keys)
+        return self.__converters[keys]
+
+    def serialize(self, rows: Iterable[Sequence], keys: Sequence[str]) -> list[dict]:
+        """
+        Converts rows to JSON objects.
+
+        Args:
+            rows (Iterable[Sequence]): The rows, as tuples.
+            keys (Sequence[str]): The names of the columns of the rows, in cursor order.
+
+        Returns:
+            list[dict]: The JSON objects.
+        """
+        return list(map(self.get_converter(keys), rows))
+
+    def write(self, rows: Iterable[Sequence], keys: Sequence[str], output: TextIO) -> int:
+        """
+        Writes rows to an output buffer as JSON lines.
+
+        Args:
+            rows (Iterable[Sequence]): The rows, as tuples.
+            keys (Sequence[str]): The names of the columns of the rows, in cursor order.
+            output (TextIO): The buffer to write to.
+
+        Returns:
+            int: The number of rows written.
+        """
+        convert = self.get_converter(keys)
+        encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+        count = 0
+        lines = []
+        for row in rows:
+            lines.append(encode(convert(row)))
+            if len(lines) == WRITE_BATCH_SIZE:
+                output.write("\n".join(lines) + "\n")
+                count += len(lines)
+                lines = []
+        if len(lines) > 0:
+            output.write("\n".join(lines) + "\n")
+            count += len(lines)
+        return count
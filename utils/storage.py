@@ -0,0 +1,207 @@
+"""
+Storage interface.
+
+Defines the operations the modules need from a storage backend, implemented by the
+PostgreSQL database (`utils.db.DB`) and by an in-memory store (`utils.memory.MemoryStorage`).
+"""
+
+from abc import ABCMeta, abstractmethod
+from contextlib import contextmanager
+from typing import Generator, TextIO
+from uuid import UUID
+
+from sqlalchemy.orm import DeclarativeMeta
+
+
+class StorageInterface(metaclass=ABCMeta):
+    """
+    Abstract base class of the storage backends of the modules.
+
+    Search criteria use the same operators (`get_operators`) whatever the backend, and the
+    same `is_active` cascade rules apply: enforced by the triggers of `init_db.py` in the
+    database, emulated by the in-memory store.
+    """
+
+    # pylint: disable=no-self-use
+    def get_operators(self, operator: str) -> str | None:
+        """
+        Gets the SQL operator corresponding to the given string.
+
+        Args:
+            operator (str): The input operator.
+
+        Returns:
+            str | None: The SQL operator if valid, otherwise None.
+        """
+        sql_operator = None
+        if operator in ["=", ">", "<", ">=", "<=", "like", "ilike", "in"]:
+            sql_operator = operator
+        elif "regex" in operator:
+            sql_operator = "~"
+            if "not" in operator:
+                sql_operator = "!~"
+            if "i" in operator:
+                sql_operator += "*"
+        elif operator.startswith("not") is True:
+            sql_operator = f"not {operator[3:]}"
+
+        return sql_operator
+
+    # pylint: disable=no-self-use
+    def get_upsert_values(self, model: DeclarativeMeta, data: dict[str, str | int | float | bool]) -> dict:
+        """
+        Keeps the given data matching the columns of a model for upsert operations.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model.
+            data (dict): The data to upsert.
+
+        Returns:
+            dict: The values by column name, without the id and the version which are managed by `upsert`.
+        """
+        model_keys = model.__table__.columns.keys()
+        return {key: value for key, value in data.items() if key in model_keys and key not in ["id", "version"]}
+
+    # pylint: disable=no-self-use
+    def get_read_concurrency(self) -> int:
+        """
+        Returns the number of read-only operations worth running at once, e.g. by a cross-type search.
+
+        A backend without I/O gains nothing from running them on several threads.
+
+        Returns:
+            int: The number of concurrent reads.
+        """
+        return 1
+
+    @contextmanager
+    def read_from_primary(self) -> Generator[None, None, None]:
+        """
+        Context manager sending the read-only operations of the current thread to the primary.
+
+        Nothing to do for a backend without replicas.
+        """
+        yield
+
+    @abstractmethod
+    def upsert(self, model: DeclarativeMeta, uuid: UUID, values: dict, version: int | None = None) -> bool:
+        """
+        Upserts a resource, skipping the write when nothing changed.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model.
+            uuid (UUID): The UUID of the resource.
+            values (dict): The values by column name, as returned by `get_upsert_values`.
+            version (int | None): The version the resource is expected to have, None to write whatever its version.
+
+        Returns:
+            bool: Whether the resource has been inserted or updated.
+
+        Raises:
+            VersionConflictError: If the stored version is not the expected one, or the resource does not exist.
+        """
+
+    @abstractmethod
+    def delete(self, model: DeclarativeMeta, uuid: UUID) -> None:
+        """
+        Deletes a resource by its UUID, with its descendants.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model.
+            uuid (UUID): The UUID of the resource to delete.
+        """
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    @abstractmethod
+    def get_many(
+        self,
+        model: DeclarativeMeta,
+        prefix: str,
+        ids: list[UUID],
+        fields: list[str] | None = None,
+        include_archived: bool = False,
+    ) -> tuple[list, list[UUID]]:
+        """
+        Fetches resources by their UUIDs.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model to fetch.
+            prefix (str): The table prefix.
+            ids (list[UUID]): The UUIDs to fetch.
+            fields (list[str] | None): The columns to select and serialize, all of them when None.
+            include_archived (bool): Whether the archived rows are fetched too.
+
+        Returns:
+            tuple[list, list[UUID]]: The JSON objects found, in the order of the UUIDs, and the UUIDs not found.
+        """
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    @abstractmethod
+    def search(
+        self,
+        model: DeclarativeMeta,
+        prefix: str,
+        data: list[dict[str, str | int | float | bool]],
+        fields: list[str] | None = None,
+        include_archived: bool = False,
+    ) -> list:
+        """
+        Runs a search and converts its rows to JSON objects.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model to search.
+            prefix (str): The table prefix.
+            data (list[dict]): The data to filter by.
+            fields (list[str] | None): The columns to select and serialize, all of them when None.
+            include_archived (bool): Whether the archived rows are searched too.
+
+        Returns:
+            list: The JSON objects of the matching rows.
+        """
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    @abstractmethod
+    def export(
+        self,
+        model: DeclarativeMeta,
+        prefix: str,
+        data: list[dict[str, str | int | float | bool]],
+        output: TextIO,
+        fields: list[str] | None = None,
+        include_archived: bool = False,
+    ) -> int:
+        """
+        Runs a search and writes its rows to an output buffer as JSON lines.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model to search.
+            prefix (str): The table prefix.
+            data (list[dict]): The data to filter by.
+            output (TextIO): The buffer to write to.
+            fields (list[str] | None): The columns to select and serialize, all of them when None.
+            include_archived (bool): Whether the archived rows are exported too.
+
+        Returns:
+            int: The number of rows written.
+        """
+
+    @abstractmethod
+    def count(
+        self,
+        model: DeclarativeMeta,
+        prefix: str,
+        data: list[dict[str, str | int | float | bool]],
+        approximate: bool = False,
+    ) -> int:
+        """
+        Counts the rows matching the search criteria.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model to count.
+            prefix (str): The table prefix.
+            data (list[dict]): The data to filter by.
+            approximate (bool): Whether an estimate is enough.
+
+        Returns:
+            int: The number of matching rows.
+        """
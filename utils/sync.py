@@ -0,0 +1,365 @@
+"""
+Snapshot reconciliation utility.
+
+Diffs the snapshot of a subtree (e.g. the markets and selections of an event) against the
+database using per-row content hashes, and only writes the rows which changed, one set-based
+statement per level and kind of change.
+"""
+
+import hashlib
+import json
+import time
+from decimal import Decimal
+from enum import Enum
+from uuid import UUID
+
+from sqlalchemy import Column, Table, bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import DeclarativeMeta, Session
+from sqlalchemy.types import Boolean
+from sqlalchemy.types import Enum as EnumType
+from sqlalchemy.types import Integer, Numeric, Uuid
+
+from .db import DB, ShardRouter
+from .helper import Helper
+from .importer import LEVELS
+
+# Columns managed by the application, which are not part of the content of a row
+MANAGED_COLUMNS = ["id", "slug", "version", "created_at", "updated_at"]
+
+
+class SnapshotSync:
+    """
+    A class reconciling the descendants of a resource with a snapshot.
+
+    The snapshot is the parsed JSON list of the children of the root, each child holding its own
+    children under the plural of their type (`{"id": ..., "name": ..., "selections": [...]}`).
+    Ids are required and the parent ids are taken from the nesting. Resources missing from
+    the snapshot are deleted, the others are inserted or updated when their content differs.
+    """
+
+    def __init__(self, model: DeclarativeMeta):
+        """
+        Initializes the reconciliation of the descendants of a model.
+
+        Args:
+            model (DeclarativeMeta): The SQLAlchemy model of the root of the subtree.
+
+        Raises:
+            ValueError: If the model has no descendants.
+        """
+        depth = next(depth for depth, (_, level_model, _) in enumerate(LEVELS) if level_model is model)
+        # Each level with the table and the foreign key column referencing the level above
+        self.levels: list[tuple[str, Table, Column]] = [
+            (name, level_model.__table__, level_model.__table__.columns[parent_key])
+            for name, level_model, parent_key in LEVELS[depth + 1 :]
+            if parent_key is not None
+        ]
+        if len(self.levels) == 0:
+            raise ValueError(f"Nothing to sync under a {model.__tablename__}, it has no children")
+        self.root = model.__table__
+
+    @classmethod
+    def get_compared_columns(cls, table: Table) -> list[Column]:
+        """
+        Lists the columns making the content of a row.
+
+        Args:
+            table (Table): The table of the rows.
+
+        Returns:
+            list[Column]: The columns, in table order, without the ones managed by the application.
+        """
+        return [column for column in table.columns if column.name not in MANAGED_COLUMNS]
+
+    @classmethod
+    def normalize(cls, column: Column, value):
+        """
+        Converts a value to its canonical form, so a snapshot value and a database value compare equal.
+
+        Args:
+            column (Column): The column of the value.
+            value: The value, from the snapshot or from the database.
+
+        Returns:
+            The canonical value (str, int, bool or None).
+
+        Raises:
+            ValueError: If the value does not fit the column.
+        """
+        if value is None:
+            return None
+        if isinstance(column.type, Boolean):
+            return bool(value)
+        if isinstance(column.type, Integer):
+            return int(value)
+        if isinstance(column.type, Numeric):
+            # Stored with the scale of the column, e.g. 2.5 and 2.50 are the same price
+            return str(Decimal(str(value)).quantize(Decimal(1).scaleb(-(column.type.scale or 0))))
+        if isinstance(column.type, EnumType):
+            value = str(value.value if isinstance(value, Enum) else value).upper()
+            if value not in column.type.enums:
+                raise ValueError(f"invalid {column.name} {value}, expected one of {column.type.enums}")
+            return value
+        if isinstance(column.type, Uuid):
+            return str(UUID(str(value)))
+        return str(value)
+
+    @classmethod
+    def get_hash(cls, values: list) -> bytes:
+        """
+        Hashes the canonical values of a row.
+
+        Args:
+            values (list): The canonical values, in the order of the compared columns.
+
+        Returns:
+            bytes: The digest of the content of the row.
+        """
+        return hashlib.blake2b(json.dumps(values, separators=(",", ":")).encode(), digest_size=16).digest()
+
+    def flatten(self, snapshot: list[dict], root: UUID) -> list[dict[str, dict]]:
+        """
+        Validates a snapshot and flattens it per level.
+
+        Args:
+            snapshot (list[dict]): The children of the root, as parsed from JSON.
+            root (UUID): The id of the root of the subtree.
+
+        Returns:
+            list[dict[str, dict]]: The rows of each level by id, with their canonical values and their name.
+
+        Raises:
+            ValueError: If the snapshot is not valid.
+        """
+        rows: list[dict[str, dict]] = [{} for _ in self.levels]
+        pending = [(0, str(root), snapshot)]
+        while len(pending) > 0:
+            depth, parent_id, children = pending.pop()
+            name, table, parent_key = self.levels[depth]
+            if isinstance(children, list) is False:
+                raise ValueError(f"Invalid snapshot, the {name}s of {parent_id} must be a list")
+            for child in children:
+                if isinstance(child, dict) is False:
+                    raise ValueError(f"Invalid snapshot, a {name} of {parent_id} must be an object")
+                try:
+                    uuid = str(UUID(str(child["id"])))
+                except (KeyError, ValueError) as error:
+                    raise ValueError(f"Invalid snapshot, a {name} of {parent_id} has no valid id") from error
+                if any(uuid in level for level in rows):
+                    raise ValueError(f"Invalid snapshot, {name} {uuid} appears twice")
+                data = {**child, parent_key.name: parent_id}
+                if data.get("is_active") is None:
+                    data["is_active"] = False
+                values = []
+                for column in self.get_compared_columns(table):
+                    if data.get(column.name) is None and column.nullable is False:
+                        raise ValueError(f"Invalid snapshot, {column.name} of {name} {uuid} is required")
+                    try:
+                        values.append(self.normalize(column, data.get(column.name)))
+                    except (ValueError, ArithmeticError) as error:
+                        raise ValueError(f"Invalid snapshot, {name} {uuid}: {error}") from error
+                rows[depth][uuid] = {"values": values, "name": data.get("name")}
+                if depth + 1 < len(self.levels):
+                    pending.append((depth + 1, uuid, child.get(f"{self.levels[depth + 1][0]}s", [])))
+        return rows
+
+    def load(self, session: Session, root: UUID) -> list[dict[str, dict]]:
+        """
+        Loads the current state of the subtree in a single query.
+
+        The root row is locked first, so concurrent reconciliations of a same subtree run one after the other.
+
+        Args:
+            session (Session): The session of the reconciliation.
+            root (UUID): The id of the root of the subtree.
+
+        Returns:
+            list[dict[str, dict]]: The rows of each level by id, with their canonical values, name and slug.
+
+        Raises:
+            ValueError: If the root does not exist.
+        """
+        locked = session.execute(text(f"SELECT id FROM {self.root.name} WHERE id = :root FOR UPDATE"), {"root": root})
+        if locked.first() is None:
+            raise ValueError(f"The {self.root.name} {root} does not exist")
+
+        selected, joins = [], []
+        for depth, (_, table, parent_key) in enumerate(self.levels):
+            alias = f"a{depth + 1}"
+            selected += [f'{alias}."{column.name}"' for column in self.get_compared_columns(table)]
+            selected += [f"{alias}.id", f"{alias}.slug"]
+            if depth == 0:
+                joins.append(f"FROM {table.name} {alias}")
+            else:
+                joins.append(f'LEFT JOIN {table.name} {alias} ON {alias}."{parent_key.name}" = a{depth}.id')
+        query = f"SELECT {', '.join(selected)} {' '.join(joins)} WHERE a1.\"{self.levels[0][2].name}\" = :root"
+
+        rows: list[dict[str, dict]] = [{} for _ in self.levels]
+        result = session.execute(text(query), {"root": root})
+        # Each row is the path from a child of the root to a leaf, the ancestors are repeated
+        for row in result.cursor.fetchall():
+            position = 0
+            for depth, (_, table, _) in enumerate(self.levels):
+                columns = self.get_compared_columns(table)
+                values = row[position : position + len(columns)]
+                uuid, slug = row[position + len(columns)], row[position + len(columns) + 1]
+                position += len(columns) + 2
+                if uuid is None or str(uuid) in rows[depth]:
+                    continue
+                rows[depth][str(uuid)] = {
+                    "values": [self.normalize(column, value) for column, value in zip(columns, values)],
+                    "name": values[[column.name for column in columns].index("name")],
+                    "slug": slug,
+                }
+        result.close()
+        return rows
+
+    def diff(self, snapshot: list[dict[str, dict]], current: list[dict[str, dict]]) -> list[dict[str, list]]:
+        """
+        Compares the snapshot with the current state, level by level.
+
+        Args:
+            snapshot (list[dict[str, dict]]): The rows of the snapshot, as returned by `flatten`.
+            current (list[dict[str, dict]]): The rows of the database, as returned by `load`.
+
+        Returns:
+            list[dict[str, list]]: The ids to insert, update and delete, and the number of unchanged rows, per level.
+        """
+        changes = []
+        for wanted, existing in zip(snapshot, current):
+            level: dict = {"insert": [], "update": [], "delete": [], "unchanged": 0}
+            for uuid, row in wanted.items():
+                if uuid not in existing:
+                    level["insert"].append(uuid)
+                elif self.get_hash(row["values"]) != self.get_hash(existing[uuid]["values"]):
+                    level["update"].append(uuid)
+                else:
+                    level["unchanged"] += 1
+            level["delete"] = [uuid for uuid in existing if uuid not in wanted]
+            changes.append(level)
+        return changes
+
+    @classmethod
+    def get_recordset(cls, table: Table, columns: list[Column]) -> str:
+        """
+        Builds the `jsonb_to_recordset` expression turning a JSON array parameter into typed rows.
+
+        Args:
+            table (Table): The table of the rows.
+            columns (list[Column]): The columns of the rows.
+
+        Returns:
+            str: The SQL expression, aliased `v`, reading the `:rows` parameter.
+        """
+        dialect = DB.get_instance().get_engine().dialect
+        definitions = ", ".join(f'"{column.name}" {column.type.compile(dialect=dialect)}' for column in columns)
+        return f"jsonb_to_recordset(CAST(:rows AS jsonb)) AS v({definitions})"
+
+    def apply(
+        self,
+        session: Session,
+        snapshot: list[dict[str, dict]],
+        current: list[dict[str, dict]],
+        changes: list[dict[str, list]],
+    ) -> list[dict[str, int]]:
+        """
+        Applies the changes with one statement per level and kind of change.
+
+        Insertions and updates go from the root down, then deletions from the leaves up, so the
+        foreign keys always hold and a row moved by the snapshot out of a deleted parent is
+        re-parented before the delete of its old parent, whose cascade would otherwise remove it.
+        The slug of a row is only recomputed when its name changes.
+
+        Args:
+            session (Session): The session of the reconciliation.
+            snapshot (list[dict[str, dict]]): The rows of the snapshot, as returned by `flatten`.
+            current (list[dict[str, dict]]): The rows of the database, as returned by `load`.
+            changes (list[dict[str, list]]): The changes, as returned by `diff`.
+
+        Returns:
+            list[dict[str, int]]: The number of rows inserted, updated and deleted per level, as written by the statements.
+        """
+        written = [{"inserted": 0, "updated": 0, "deleted": 0} for _ in self.levels]
+        for (_, table, _), wanted, existing, level, counts in zip(self.levels, snapshot, current, changes, written):
+            compared = self.get_compared_columns(table)
+            columns = [table.columns["id"], table.columns["slug"]] + compared
+            names = ", ".join(f'"{column.name}"' for column in columns)
+            values = ", ".join(f'v."{column.name}"' for column in columns)
+            if len(level["insert"]) > 0:
+                rows = [
+                    dict(
+                        zip(
+                            [column.name for column in columns],
+                            [uuid, Helper.unique_slug(wanted[uuid]["name"], uuid)] + wanted[uuid]["values"],
+                        )
+                    )
+                    for uuid in level["insert"]
+                ]
+                counts["inserted"] = session.execute(
+                    text(
+                        f"INSERT INTO {table.name} ({names}, created_at, updated_at) "
+                        f"SELECT {values}, now(), now() FROM {self.get_recordset(table, columns)}"
+                    ),
+                    {"rows": json.dumps(rows)},
+                ).rowcount
+            if len(level["update"]) > 0:
+                rows = []
+                for uuid in level["update"]:
+                    slug = existing[uuid]["slug"]
+                    if wanted[uuid]["name"] != existing[uuid]["name"]:
+                        slug = Helper.unique_slug(wanted[uuid]["name"], uuid)
+                    rows.append(dict(zip([column.name for column in columns], [uuid, slug] + wanted[uuid]["values"])))
+                assignments = ", ".join(f'"{column.name}" = v."{column.name}"' for column in columns[1:])
+                counts["updated"] = session.execute(
+                    text(
+                        f"UPDATE {table.name} t SET {assignments}, updated_at = now() "
+                        f"FROM {self.get_recordset(table, columns)} WHERE t.id = v.id"
+                    ),
+                    {"rows": json.dumps(rows)},
+                ).rowcount
+
+        for (_, table, _), level, counts in reversed(list(zip(self.levels, changes, written))):
+            if len(level["delete"]) > 0:
+                query = text(f"DELETE FROM {table.name} WHERE id = ANY(:ids)").bindparams(
+                    bindparam("ids", type_=ARRAY(table.columns["id"].type))
+                )
+                counts["deleted"] = session.execute(query, {"ids": [UUID(uuid) for uuid in level["delete"]]}).rowcount
+        return written
+
+    def run(self, root: UUID, snapshot: list[dict], dry_run: bool = False) -> dict:
+        """
+        Reconciles the subtree of a resource with a snapshot, in a single transaction.
+
+        Args:
+            root (UUID): The id of the root of the subtree.
+            snapshot (list[dict]): The children of the root, as parsed from JSON.
+            dry_run (bool): Only compute the diff, without writing anything.
+
+        Returns:
+            dict: The report with the number of rows inserted, updated, deleted and unchanged per level, the rows
+                written by the statements unless it is a dry run.
+
+        Raises:
+            ValueError: If the snapshot is not valid or the root does not exist.
+        """
+        started_at = time.perf_counter()
+        rows = self.flatten(snapshot, root)
+        # The subtree lives on the shard of its root
+        with ShardRouter.get_instance().route(self.root.name, root), DB.get_instance().get_session() as session:
+            current = self.load(session, root)
+            changes = self.diff(rows, current)
+            written = None if dry_run else self.apply(session, rows, current, changes)
+
+        report: dict = {"dry_run": dry_run, "levels": {}}
+        for index, ((name, _, _), level) in enumerate(zip(self.levels, changes)):
+            report["levels"][name] = (
+                {"inserted": len(level["insert"]), "updated": len(level["update"]), "deleted": len(level["delete"])}
+                if written is None
+                else written[index]
+            ) | {"unchanged": level["unchanged"]}
+        report["written"] = sum(
+            level["inserted"] + level["updated"] + level["deleted"] for level in report["levels"].values()
+        )
+        report["elapsed"] = round(time.perf_counter() - started_at, 3)
+        return report